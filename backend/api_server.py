@@ -3,9 +3,8 @@ Flask API Server for AI Diet and Workout Recommendation System
 VS Code optimized version with proper error handling, logging, and configuration
 """
 
-from flask import Flask, request, jsonify, session
+from flask import Flask, Response, request, jsonify, session, stream_with_context
 from flask_cors import CORS
-import psycopg2
 import json
 import os
 import sys
@@ -18,7 +17,13 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 # Import our modules
 from backend.ml_models import DietRecommendationSystem, WorkoutRecommendationSystem, CalorieBurnPredictor
-from backend.database_setup import DatabaseManager
+from backend.database_setup import DatabaseManager, SchemaOutdatedError
+from backend.job_queue import JobQueue
+from backend.metrics import get_metrics_registry
+from backend.gemini_service import get_circuit_breaker, submit_llm_task, llm_stats
+from backend.model_store import get_model_store
+from backend.plan_schemas import CustomWorkout
+from backend.plan_cache import get_plan_cache
 from backend.config import get_config
 
 # Setup logging
@@ -28,6 +33,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 def create_app(config=None):
     """Application factory pattern"""
     app = Flask(__name__)
@@ -48,16 +57,50 @@ def create_app(config=None):
     CORS(app, supports_credentials=True, origins=config.CORS_ORIGINS)
     
     # Initialize systems
-    db = DatabaseManager(config.DATABASE_URL)
+    db = DatabaseManager.from_config(config)
     diet_system = DietRecommendationSystem(config)
     workout_system = WorkoutRecommendationSystem(config)
     calorie_predictor = CalorieBurnPredictor(config)
+    plan_cache = get_plan_cache(config)
+    model_store = get_model_store(config.MODELS_PATH)
+    job_queue = JobQueue.from_config(db, config)
+    single_flight = diet_system.gemini_service.single_flight
+    
+    # Component stats are exported as gauges on /api/metrics
+    metrics = get_metrics_registry()
+    metrics.register_gauges('db_pool', db.pool_stats)
+    metrics.register_gauges('llm', llm_stats)
+    metrics.register_gauges('plan_cache', lambda: plan_cache.stats() if plan_cache else None)
+    metrics.register_gauges('jobs', job_queue.stats)
+    metrics.register_gauges('llm_circuit', lambda: get_circuit_breaker(config).stats())
+    metrics.register_gauges('single_flight', lambda: single_flight.stats() if single_flight else None)
+    
+    # Profile and log writes are UPSERTs that rely on the migrated unique constraints
+    if config.DB_AUTO_MIGRATE:
+        try:
+            db.migrate()
+        except Exception as e:
+            logger.warning(f"⚠️ Database migrations not applied: {e}")
+    # Refuse to serve writes against an unmigrated schema; an unreachable database is only logged
+    try:
+        db.check_schema()
+    except SchemaOutdatedError:
+        raise
+    except Exception as e:
+        logger.warning(f"⚠️ Database schema version not checked: {e}")
+    # Summary rows are not maintained while the flag is off, so bring them up to date first
+    if config.DASHBOARD_SUMMARY_ENABLED:
+        try:
+            db.rebuild_daily_summaries()
+        except Exception as e:
+            logger.warning(f"⚠️ Daily summaries not rebuilt: {e}")
     
-    # Try to load trained models
+    # Register trained models; each is memory-mapped on first use
     try:
         diet_system.load_models()
         calorie_predictor.load_model()
-        logger.info("✅ ML models loaded successfully!")
+        logger.info("✅ ML models registered for lazy loading!")
+        calorie_predictor.warm_up()
     except Exception as e:
         logger.warning(f"⚠️ ML models not found: {e}")
         logger.info("Please run 'python backend/ml_models.py' first to train the models.")
@@ -70,9 +113,21 @@ def create_app(config=None):
             'success': True,
             'message': 'AI Diet & Workout API is running',
             'timestamp': datetime.now().isoformat(),
-            'version': '1.0.0'
+            'version': '1.0.0',
+            'database_pool': db.pool_stats(),
+            'llm': llm_stats(),
+            'plan_cache': plan_cache.stats() if plan_cache else None,
+            'models': model_store.stats(),
+            'jobs': job_queue.stats(),
+            'single_flight': single_flight.stats() if single_flight else None,
+            'calorie_prediction': calorie_predictor.latency_stats()
         })
     
+    @app.route('/api/metrics', methods=['GET'])
+    def get_metrics():
+        """LLM call, token, cost, fallback and cache metrics in Prometheus text format"""
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+    
     @app.route('/api/register', methods=['POST'])
     def register():
         """Register a new user"""
@@ -176,13 +231,12 @@ def create_app(config=None):
             user_id = session['user_id']
             
             # Get user info
-            conn = psycopg2.connect(db.db_url)
-            cursor = conn.cursor()
-            cursor.execute('SELECT id, email, name FROM users WHERE id = %s', (user_id,))
-            user_result = cursor.fetchone()
+            with db.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute('SELECT id, email, name FROM users WHERE id = %s', (user_id,))
+                    user_result = cursor.fetchone()
             
             if not user_result:
-                conn.close()
                 return jsonify({'success': False, 'message': 'User not found'}), 404
             
             user_id, email, name = user_result
@@ -191,8 +245,6 @@ def create_app(config=None):
             profile = db.get_user_profile(user_id)
             profile_complete = profile is not None
             
-            conn.close()
-            
             return jsonify({
                 'success': True,
                 'user': {
@@ -241,30 +293,24 @@ def create_app(config=None):
                     'message': f'Missing required fields: {missing_fields}'
                 }), 400
             
-            # Generate diet plan first to get target calories
-            diet_plan = diet_system.predict_diet_plan(data)
-            
-            # Add target calories to profile data
-            data['target_calories'] = diet_plan.get('target_calories', 2000)
+            # Weekly mode generates every day's plans in one LLM call and stores them together
+            weekly = bool(data.pop('weekly', config.WEEKLY_PLANS_ENABLED))
+            # Diet plans come from the cluster plan library unless a Gemini-personalized plan is asked for
+            personalize = bool(data.pop('personalize', False))
             
-            # Save profile to database with target calories
-            db.save_user_profile(user_id, data)
-            
-            # Generate workout plan
-            workout_plan = workout_system.generate_workout_plan(data)
-            
-            # Save plans to database
-            today = datetime.now().strftime('%Y-%m-%d')
-            db.save_diet_plan(user_id, today, diet_plan['meal_plan'])
-            db.save_workout_plan(user_id, today, workout_plan)
+            # Hand generation to the job workers so the request returns before Gemini answers
+            if config.PLAN_JOBS_ENABLED:
+                job_id = job_queue.enqueue(
+                    'profile_plans', {'profile': data, 'weekly': weekly, 'personalize': personalize}, user_id=user_id
+                )
+                return jsonify({
+                    'success': True,
+                    'message': 'Profile received, generating plans',
+                    'job_id': job_id,
+                    'status_url': f'/api/jobs/{job_id}'
+                }), 202
             
-            logger.info(f"Profile saved and plans generated for user {user_id}")
-            return jsonify({
-                'success': True,
-                'message': 'Profile saved and plans generated',
-                'diet_plan': diet_plan,
-                'workout_plan': workout_plan
-            })
+            return jsonify(generate_profile_plans(user_id, data, weekly, personalize))
             
         except Exception as e:
             logger.error(f"Profile save error: {e}")
@@ -273,6 +319,101 @@ def create_app(config=None):
                 'message': f'Failed to save profile: {str(e)}'
             }), 500
 
+    def generate_profile_plans(user_id, data, weekly=False, personalize=False, progress=None):
+        """Generate plans for a profile, save the profile and plans, and return the response body"""
+        if progress:
+            progress('Generating plans')
+        if weekly:
+            return save_profile_with_weekly_plans(user_id, data, progress)
+        
+        # Generate diet and workout plans concurrently on the LLM executor; a diet plan
+        # from the plan library is a local lookup and does not take an LLM worker
+        workout_future = submit_llm_task(workout_system.generate_workout_plan, dict(data))
+        diet_plan = None if personalize else diet_system.library_diet_plan(dict(data))
+        if diet_plan is None:
+            diet_plan = submit_llm_task(diet_system.generate_diet_plan, dict(data)).result()
+        
+        # Add target calories to profile data
+        data['target_calories'] = diet_plan.get('target_calories', 2000)
+        
+        # Save profile to database with target calories
+        db.save_user_profile(user_id, data)
+        
+        workout_plan = workout_future.result()
+        if progress:
+            progress('Saving plans')
+        
+        # Save plans to database
+        today = datetime.now().strftime('%Y-%m-%d')
+        db.save_diet_plan(user_id, today, diet_plan['meal_plan'])
+        db.save_workout_plan(user_id, today, workout_plan)
+        
+        logger.info(f"Profile saved and plans generated for user {user_id}")
+        return {
+            'success': True,
+            'message': 'Profile saved and plans generated',
+            'diet_plan': diet_plan,
+            'workout_plan': workout_plan
+        }
+
+    def save_profile_with_weekly_plans(user_id, data, progress=None):
+        """Save the profile and WEEKLY_PLAN_DAYS days of plans starting today"""
+        weekly_plan = submit_llm_task(
+            diet_system.gemini_service.generate_weekly_plan, dict(data), config.WEEKLY_PLAN_DAYS
+        ).result()
+        
+        data['target_calories'] = weekly_plan['target_calories']
+        db.save_user_profile(user_id, data)
+        
+        if progress:
+            progress('Saving plans')
+        start = datetime.now().date()
+        dates = [(start + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(len(weekly_plan['days']))]
+        db.save_plans_bulk(
+            diet_plans=[(user_id, date, day['meal_plan']) for date, day in zip(dates, weekly_plan['days'])],
+            workout_plans=[(user_id, date, day['workout']) for date, day in zip(dates, weekly_plan['days'])]
+        )
+        
+        first_day = weekly_plan['days'][0]
+        logger.info(f"Profile saved and {len(dates)} days of plans generated for user {user_id}")
+        return {
+            'success': True,
+            'message': f'Profile saved and {len(dates)} days of plans generated',
+            'diet_plan': {
+                'target_calories': weekly_plan['target_calories'],
+                'cluster': diet_system._user_cluster(data),
+                'meal_plan': first_day['meal_plan'],
+                'macros': weekly_plan['macros'],
+                'recommendations': weekly_plan['recommendations']
+            },
+            'workout_plan': first_day['workout'],
+            'plan_dates': dates
+        }
+
+    job_queue.register('profile_plans', lambda payload, job: generate_profile_plans(
+        job['user_id'], payload['profile'], payload['weekly'], payload.get('personalize', False), job['progress']
+    ))
+    if config.PLAN_JOBS_ENABLED:
+        job_queue.start()
+
+    @app.route('/api/jobs/<job_id>', methods=['GET'])
+    def get_job(job_id):
+        """Status, progress and result of one of the user's background jobs"""
+        if 'user_id' not in session:
+            return jsonify({'success': False, 'message': 'Not authenticated'}), 401
+        
+        try:
+            job = job_queue.get(job_id, user_id=session['user_id'])
+            if job is None:
+                return jsonify({'success': False, 'message': 'Job not found'}), 404
+            return jsonify({'success': True, 'job': job})
+        except Exception as e:
+            logger.error(f"Job status error: {e}")
+            return jsonify({
+                'success': False,
+                'message': f'Failed to get job: {str(e)}'
+            }), 500
+
     @app.route('/api/diet-plan', methods=['GET'])
     def get_diet_plan():
         """Get current diet plan"""
@@ -282,16 +423,15 @@ def create_app(config=None):
         try:
             user_id = session['user_id']
             date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
-            conn = psycopg2.connect(db.db_url)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT meal_type, food_item, calories, protein, carbs, fat
-                FROM diet_plans 
-                WHERE user_id = %s AND date = %s
-                ORDER BY meal_type, id
-            ''', (user_id, date))
-            results = cursor.fetchall()
-            conn.close()
+            with db.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute('''
+                        SELECT meal_type, food_item, calories, protein, carbs, fat
+                        FROM diet_plans 
+                        WHERE user_id = %s AND date = %s
+                        ORDER BY meal_type, id
+                    ''', (user_id, date))
+                    results = cursor.fetchall()
             # Organize by meal type
             meals = {}
             total_calories = 0
@@ -339,16 +479,15 @@ def create_app(config=None):
         try:
             user_id = session['user_id']
             date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
-            conn = psycopg2.connect(db.db_url)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT workout_name, exercise_name, sets, reps, duration, calories_burned, completed
-                FROM workout_plans 
-                WHERE user_id = %s AND date = %s
-                ORDER BY id
-            ''', (user_id, date))
-            results = cursor.fetchall()
-            conn.close()
+            with db.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute('''
+                        SELECT workout_name, exercise_name, sets, reps, duration, calories_burned, completed
+                        FROM workout_plans 
+                        WHERE user_id = %s AND date = %s
+                        ORDER BY id
+                    ''', (user_id, date))
+                    results = cursor.fetchall()
             if not results:
                 return jsonify({'success': False, 'message': 'No workout plan found'})
             workout_name = results[0][0]
@@ -383,6 +522,77 @@ def create_app(config=None):
                 'message': f'Failed to get workout plan: {str(e)}'
             }), 500
 
+    def custom_workout_prompt(user_id, data):
+        """Gemini prompt for a custom workout from the request options and the user's profile (None without a profile)"""
+        # Get customization parameters
+        duration = data.get('duration', 30)
+        difficulty = data.get('difficulty', 'intermediate')
+        focus_areas = data.get('focus_areas', [])
+        equipment = data.get('equipment', [])
+        workout_type = data.get('workout_type', 'full_body')
+        
+        # Get user profile for context
+        with db.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('''
+                    SELECT age, height, weight, activity_level, goal
+                    FROM user_profiles 
+                    WHERE user_id = %s
+                ''', (user_id,))
+                profile = cursor.fetchone()
+        
+        if not profile:
+            return None
+        
+        age, height, weight, activity_level, goals = profile
+        
+        return f"""
+        Generate a custom workout plan with the following specifications:
+        
+        User Profile:
+        - Age: {age}
+        - Height: {height} cm
+        - Weight: {weight} kg
+        - Activity Level: {activity_level}
+        - Goals: {goals}
+        
+        Workout Customization:
+        - Duration: {duration} minutes
+        - Difficulty: {difficulty}
+        - Focus Areas: {', '.join(focus_areas) if focus_areas else 'General fitness'}
+        - Available Equipment: {', '.join(equipment) if equipment else 'No equipment'}
+        - Workout Type: {workout_type}
+        
+        Please generate a detailed workout plan with:
+        1. Workout name
+        2. List of exercises with:
+           - Exercise name
+           - Sets and reps
+           - Duration per exercise
+           - Estimated calories burned
+           - Instructions
+           - Muscle groups targeted
+        
+        {workout_system.gemini_service.format_instructions(CustomWorkout)}
+        """
+
+    def save_custom_workout(user_id, workout_data):
+        """Replace today's workout plan with a generated custom workout"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        db.save_workout_plan(user_id, today, {
+            'name': workout_data.get('workout_name', 'Custom Workout'),
+            'exercises': [
+                {
+                    'name': exercise.get('name', 'Unknown Exercise'),
+                    'sets': exercise.get('sets', 1),
+                    'reps': exercise.get('reps', '10'),
+                    'duration': exercise.get('duration', 5),
+                    'calories': exercise.get('calories', 50)
+                }
+                for exercise in workout_data['exercises']
+            ]
+        })
+
     @app.route('/api/workout-plan', methods=['POST'])
     def generate_custom_workout():
         """Generate custom workout plan based on user preferences"""
@@ -393,82 +603,12 @@ def create_app(config=None):
             user_id = session['user_id']
             data = request.get_json()
             
-            # Get customization parameters
-            duration = data.get('duration', 30)
-            difficulty = data.get('difficulty', 'intermediate')
-            focus_areas = data.get('focus_areas', [])
-            equipment = data.get('equipment', [])
-            workout_type = data.get('workout_type', 'full_body')
-            
-            # Get user profile for context
-            conn = psycopg2.connect(db.db_url)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT age, height, weight, activity_level, goal
-                FROM user_profiles 
-                WHERE user_id = %s
-            ''', (user_id,))
-            profile = cursor.fetchone()
-            conn.close()
-            
-            if not profile:
+            workout_prompt = custom_workout_prompt(user_id, data)
+            if workout_prompt is None:
                 return jsonify({'success': False, 'message': 'User profile not found'}), 404
             
-            age, height, weight, activity_level, goals = profile
-            
-            # Generate custom workout using Gemini
-            from gemini_service import GeminiRecommendationService
-            gemini_service = GeminiRecommendationService()
-            
-            workout_prompt = f"""
-            Generate a custom workout plan with the following specifications:
-            
-            User Profile:
-            - Age: {age}
-            - Height: {height} cm
-            - Weight: {weight} kg
-            - Activity Level: {activity_level}
-            - Goals: {goals}
-            
-            Workout Customization:
-            - Duration: {duration} minutes
-            - Difficulty: {difficulty}
-            - Focus Areas: {', '.join(focus_areas) if focus_areas else 'General fitness'}
-            - Available Equipment: {', '.join(equipment) if equipment else 'No equipment'}
-            - Workout Type: {workout_type}
-            
-            Please generate a detailed workout plan with:
-            1. Workout name
-            2. List of exercises with:
-               - Exercise name
-               - Sets and reps
-               - Duration per exercise
-               - Estimated calories burned
-               - Instructions
-               - Muscle groups targeted
-            
-            IMPORTANT: Return ONLY valid JSON without any markdown formatting, code blocks, or additional text. The response must start with {{ and end with }}.
-            
-            Format the response as JSON with the structure:
-            {{
-                "workout_name": "Custom Workout Name",
-                "exercises": [
-                    {{
-                        "name": "Exercise Name",
-                        "sets": 3,
-                        "reps": "10-12",
-                        "duration": 5,
-                        "calories": 50,
-                        "instructions": "Detailed instructions",
-                        "muscle_groups": ["Muscle Group 1", "Muscle Group 2"]
-                    }}
-                ],
-                "total_duration": {duration},
-                "total_calories": 300
-            }}
-            """
-            
-            workout_response = gemini_service.generate_workout_plan_from_prompt(workout_prompt)
+            # Generate custom workout using the shared Gemini service
+            workout_response = workout_system.gemini_service.generate_workout_plan_from_prompt(workout_prompt)
             
             # Parse the response and save to database
             import json
@@ -496,31 +636,7 @@ def create_app(config=None):
             
             # Save workout plan to database
             try:
-                conn = psycopg2.connect(db.db_url)
-                cursor = conn.cursor()
-                
-                # Clear existing workout for today
-                today = datetime.now().strftime('%Y-%m-%d')
-                cursor.execute('DELETE FROM workout_plans WHERE user_id = %s AND date = %s', (user_id, today))
-                
-                # Insert new workout plan
-                for exercise in workout_data['exercises']:
-                    cursor.execute('''
-                        INSERT INTO workout_plans 
-                        (user_id, date, workout_name, exercise_name, sets, reps, duration, calories_burned, completed)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ''', (
-                        user_id, today, workout_data['workout_name'],
-                        exercise.get('name', 'Unknown Exercise'), 
-                        exercise.get('sets', 1), 
-                        str(exercise.get('reps', '10')),
-                        exercise.get('duration', 5), 
-                        exercise.get('calories', 50), 
-                        False
-                    ))
-                
-                conn.commit()
-                conn.close()
+                save_custom_workout(user_id, workout_data)
                 
             except Exception as db_error:
                 logger.error(f"Database error while saving workout: {db_error}")
@@ -541,6 +657,47 @@ def create_app(config=None):
                 'message': f'Failed to generate custom workout: {str(e)}'
             }), 500
 
+    @app.route('/api/workout-plan/stream', methods=['POST'])
+    def stream_custom_workout():
+        """
+        Generate a custom workout and stream each exercise as a Server-Sent Event
+        POST only: the finished workout replaces today's plan, which a GET must not do
+        """
+        if 'user_id' not in session:
+            return jsonify({'success': False, 'message': 'Not authenticated'}), 401
+        
+        try:
+            user_id = session['user_id']
+            data = request.get_json(silent=True) or {}
+            workout_prompt = custom_workout_prompt(user_id, data)
+            if workout_prompt is None:
+                return jsonify({'success': False, 'message': 'User profile not found'}), 404
+        except Exception as e:
+            logger.error(f"Custom workout stream error: {e}")
+            return jsonify({
+                'success': False,
+                'message': f'Failed to generate custom workout: {str(e)}'
+            }), 500
+        
+        def events():
+            try:
+                stream = workout_system.gemini_service.stream_workout_plan_from_prompt(workout_prompt)
+                for kind, payload in stream:
+                    if kind == 'exercise':
+                        yield sse_event('exercise', payload)
+                    else:
+                        save_custom_workout(user_id, payload)
+                        yield sse_event('done', {'success': True, 'workout': payload})
+            except Exception as e:
+                logger.error(f"Custom workout stream error: {e}")
+                yield sse_event('error', {'success': False, 'message': f'Failed to generate custom workout: {str(e)}'})
+        
+        return Response(
+            stream_with_context(events()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
     @app.route('/api/log-progress', methods=['POST'])
     def log_progress():
         """Log daily progress"""
@@ -628,26 +785,95 @@ def create_app(config=None):
                 return jsonify({'success': False, 'message': 'User profile not found'}), 404
             
             # Predict calories
-            predicted_calories = calorie_predictor.predict_calories(
+            user_data = {
+                'age': profile['age'],
+                'weight': profile['weight'],
+                'gender': profile['gender']
+            }
+            workout_data = {
+                'type': data['workout_type'],
+                'intensity': data['intensity'],
+                'duration': data['duration']
+            }
+            predicted_calories = calorie_predictor.predict_calories(user_data, workout_data)
+            
+            response = {
+                'success': True,
+                'predicted_calories': predicted_calories
+            }
+            
+            # The LLM is only consulted when the client explicitly asks for an explanation
+            if data.get('explain'):
+                response['explanation'] = calorie_predictor.explain_calories(user_data, workout_data)
+            
+            return jsonify(response)
+            
+        except Exception as e:
+            logger.error(f"Calorie prediction error: {e}")
+            return jsonify({
+                'success': False,
+                'message': f'Failed to predict calories: {str(e)}'
+            }), 500
+
+    @app.route('/api/predict-calories/batch', methods=['POST'])
+    def predict_calories_batch():
+        """Predict calories burned for a list of workouts in one request"""
+        if 'user_id' not in session:
+            return jsonify({'success': False, 'message': 'Not authenticated'}), 401
+        
+        try:
+            data = request.get_json()
+            user_id = session['user_id']
+            
+            workouts = data.get('workouts') if data else None
+            if not isinstance(workouts, list) or not workouts:
+                return jsonify({
+                    'success': False,
+                    'message': 'Missing required field: workouts (non-empty list)'
+                }), 400
+            
+            if len(workouts) > config.CALORIE_BATCH_MAX_SIZE:
+                return jsonify({
+                    'success': False,
+                    'message': f'Too many workouts: at most {config.CALORIE_BATCH_MAX_SIZE} per request'
+                }), 400
+            
+            invalid = [
+                i for i, w in enumerate(workouts)
+                if not isinstance(w, dict) or not all(k in w for k in ['workout_type', 'intensity', 'duration'])
+                or isinstance(w['duration'], bool) or not isinstance(w['duration'], (int, float))
+            ]
+            if invalid:
+                return jsonify({
+                    'success': False,
+                    'message': f'Workouts at positions {invalid} need workout_type, intensity and a numeric duration'
+                }), 400
+            
+            # Load the profile once for the whole batch
+            profile = db.get_user_profile(user_id)
+            if not profile:
+                return jsonify({'success': False, 'message': 'User profile not found'}), 404
+            
+            predictions = calorie_predictor.predict_calories_batch(
                 user_data={
                     'age': profile['age'],
                     'weight': profile['weight'],
                     'gender': profile['gender']
                 },
-                workout_data={
-                    'type': data['workout_type'],
-                    'intensity': data['intensity'],
-                    'duration': data['duration']
-                }
+                workouts=[
+                    {'type': w['workout_type'], 'intensity': w['intensity'], 'duration': w['duration']}
+                    for w in workouts
+                ]
             )
             
             return jsonify({
                 'success': True,
-                'predicted_calories': predicted_calories
+                'predicted_calories': predictions,
+                'total_calories': sum(predictions)
             })
             
         except Exception as e:
-            logger.error(f"Calorie prediction error: {e}")
+            logger.error(f"Batch calorie prediction error: {e}")
             return jsonify({
                 'success': False,
                 'message': f'Failed to predict calories: {str(e)}'
@@ -661,61 +887,20 @@ def create_app(config=None):
         
         try:
             user_id = session['user_id']
-            # Get today's data
+            # Get today's data in one round trip
             today = datetime.now().strftime('%Y-%m-%d')
-            conn = psycopg2.connect(db.db_url)
-            cursor = conn.cursor()
-            
-            # Get today's diet plan calories (sum of all meals)
-            cursor.execute('''
-                SELECT SUM(calories) FROM diet_plans 
-                WHERE user_id = %s AND date = %s
-            ''', (user_id, today))
-            result = cursor.fetchone()
-            calories_planned = result[0] if result and result[0] else 0
-            
-            # Get today's workout calories (sum of all exercises)
-            cursor.execute('''
-                SELECT SUM(calories_burned) FROM workout_plans 
-                WHERE user_id = %s AND date = %s
-            ''', (user_id, today))
-            result = cursor.fetchone()
-            calories_workout = result[0] if result and result[0] else 0
-            
-            # Get completed workouts count
-            cursor.execute('''
-                SELECT COUNT(*) FROM workout_plans 
-                WHERE user_id = %s AND date = %s AND completed = true
-            ''', (user_id, today))
-            result = cursor.fetchone()
-            workouts_completed = result[0] if result and result[0] else 0
-            
-            # Get total planned workouts count
-            cursor.execute('''
-                SELECT COUNT(*) FROM workout_plans 
-                WHERE user_id = %s AND date = %s
-            ''', (user_id, today))
-            result = cursor.fetchone()
-            workouts_planned = result[0] if result and result[0] else 0
-            
-            # Get today's progress log (if any)
-            cursor.execute('''
-                SELECT calories_consumed, calories_burned, workouts_completed 
-                FROM daily_logs 
-                WHERE user_id = %s AND date = %s
-            ''', (user_id, today))
-            log_data = cursor.fetchone()
-            
-            # Get user profile for target calories
-            profile = db.get_user_profile(user_id)
-            target_calories = profile['target_calories'] if profile else 2000
+            row = db.get_dashboard_stats(user_id, today)
             
-            conn.close()
+            calories_planned = row['calories_planned'] or 0
+            calories_workout = row['calories_workout'] or 0
+            workouts_completed = row['workouts_completed'] or 0
+            workouts_planned = row['workouts_planned'] or 0
+            target_calories = row['target_calories'] if row['has_profile'] else 2000
             
             # Calculate stats - prioritize logged data, fallback to planned data
-            calories_consumed = log_data[0] if log_data and log_data[0] else 0
-            calories_burned = log_data[1] if log_data and log_data[1] else calories_workout
-            workouts_completed_logged = log_data[2] if log_data and log_data[2] else workouts_completed
+            calories_consumed = row['log_calories_consumed'] or 0
+            calories_burned = row['log_calories_burned'] or calories_workout
+            workouts_completed_logged = row['log_workouts_completed'] or workouts_completed
             
             stats = {
                 'calories_target': target_calories,
@@ -752,14 +937,7 @@ def create_app(config=None):
                     'success': False,
                     'message': 'Missing required fields: date, exercise_name'
                 }), 400
-            conn = psycopg2.connect(db.db_url)
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE workout_plans SET completed = TRUE
-                WHERE user_id = %s AND date = %s AND exercise_name = %s
-            ''', (user_id, data['date'], data['exercise_name']))
-            conn.commit()
-            conn.close()
+            db.complete_exercise(user_id, data['date'], data['exercise_name'])
             return jsonify({
                 'success': True,
                 'message': 'Exercise marked as completed'
@@ -788,15 +966,19 @@ def main():
     print(f"API will be available at: http://{config.API_HOST}:{config.API_PORT}")
     print("\nAvailable endpoints:")
     print("- GET  /api/health - Health check")
+    print("- GET  /api/metrics - Prometheus metrics")
     print("- POST /api/register - Register new user")
     print("- POST /api/login - User login")
     print("- POST /api/logout - User logout")
     print("- POST /api/profile - Save user profile")
+    print("- GET  /api/jobs/<id> - Plan generation job status")
     print("- GET  /api/diet-plan - Get diet plan")
     print("- GET  /api/workout-plan - Get workout plan")
+    print("- POST /api/workout-plan/stream - Stream a custom workout (Server-Sent Events)")
     print("- POST /api/log-progress - Log daily progress")
     print("- GET  /api/progress-data - Get progress data")
     print("- POST /api/predict-calories - Predict calorie burn")
+    print("- POST /api/predict-calories/batch - Predict calorie burn for many workouts")
     print("- GET  /api/dashboard-stats - Get dashboard statistics")
     print("- POST /api/complete-exercise - Mark exercise complete")
     
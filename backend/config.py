@@ -35,9 +35,31 @@ class Config:
     if not DATABASE_URL:
         DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     
+    # Connection Pool Configuration
+    DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 1))
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+    DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
+    
+    # Apply pending schema migrations when the API starts
+    DB_AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', '1') == '1'
+    
+    # Dashboard Configuration (maintain per-user daily_summaries for /api/dashboard-stats);
+    # enable it on every process at once: rows are rebuilt at startup, not while the flag is off
+    DASHBOARD_SUMMARY_ENABLED = os.getenv('DASHBOARD_SUMMARY_ENABLED', '0') == '1'
+    
     # ML Models Configuration
     MODELS_PATH = os.getenv('MODELS_PATH', str(BASE_DIR / 'models'))
     
+    # Synthetic Training Data Configuration
+    TRAINING_DIET_SAMPLES = int(os.getenv('TRAINING_DIET_SAMPLES', 1000))
+    TRAINING_CALORIE_SAMPLES = int(os.getenv('TRAINING_CALORIE_SAMPLES', 2000))
+    TRAINING_SEED = int(os.getenv('TRAINING_SEED', 42))
+    
+    # Training Pipeline Configuration
+    TRAINING_RF_N_JOBS = int(os.getenv('TRAINING_RF_N_JOBS', -1))
+    TRAINING_KEEP_VERSIONS = int(os.getenv('TRAINING_KEEP_VERSIONS', 3))
+    
     # API Configuration
     API_HOST = os.getenv('API_HOST', '0.0.0.0')
     API_PORT = int(os.getenv('API_PORT', 5000))
@@ -51,7 +73,61 @@ class Config:
     
     # AI/LLM Configuration
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash-exp')
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 4))
+    LLM_EXECUTOR_WORKERS = int(os.getenv('LLM_EXECUTOR_WORKERS', 8))
+    # Send plan schemas as Gemini structured output instead of describing the JSON in each prompt
+    LLM_STRUCTURED_OUTPUT = os.getenv('LLM_STRUCTURED_OUTPUT', '1') == '1'
+    # USD per million tokens, for the llm_cost_usd_total metric (0 disables cost estimates)
+    LLM_PROMPT_COST_PER_MTOK = float(os.getenv('LLM_PROMPT_COST_PER_MTOK', 0))
+    LLM_OUTPUT_COST_PER_MTOK = float(os.getenv('LLM_OUTPUT_COST_PER_MTOK', 0))
+    # Per-call deadlines in seconds (0 disables); multi-day plans produce much longer responses
+    LLM_CALL_TIMEOUT = float(os.getenv('LLM_CALL_TIMEOUT', 30))
+    LLM_WEEKLY_CALL_TIMEOUT = float(os.getenv('LLM_WEEKLY_CALL_TIMEOUT', 90))
+    # Circuit breaker: consecutive failures before calls go straight to the fallbacks, and the cool-down before a probe
+    LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv('LLM_BREAKER_FAILURE_THRESHOLD', 5))
+    LLM_BREAKER_RESET_TIMEOUT = float(os.getenv('LLM_BREAKER_RESET_TIMEOUT', 30))
+    # Hedge calls slower than the observed p95 with a second attempt (costs extra tokens)
+    LLM_HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', '0') == '1'
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', 20))
     
+    # Calorie Prediction Configuration
+    CALORIE_BATCH_MAX_SIZE = int(os.getenv('CALORIE_BATCH_MAX_SIZE', 1000))
+    # One of: formula (MET engine), random_forest (trained model), llm (Gemini per call)
+    CALORIE_PREDICTION_MODE = os.getenv('CALORIE_PREDICTION_MODE', 'formula')
+    
+    # Background jobs: plan generation runs on JOB_WORKERS threads per process
+    # (0 makes a process enqueue-only); jobs live in PostgreSQL so processes share them
+    PLAN_JOBS_ENABLED = os.getenv('PLAN_JOBS_ENABLED', '1') == '1'
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 1.0))
+    JOB_STALE_AFTER = float(os.getenv('JOB_STALE_AFTER', 600))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+    
+    # Multi-day planning: one LLM call generates WEEKLY_PLAN_DAYS of meals and workouts
+    WEEKLY_PLANS_ENABLED = os.getenv('WEEKLY_PLANS_ENABLED', '0') == '1'
+    WEEKLY_PLAN_DAYS = int(os.getenv('WEEKLY_PLAN_DAYS', 7))
+    
+    # Plan Cache Configuration (set PLAN_CACHE_PATH to empty for memory only)
+    PLAN_CACHE_ENABLED = os.getenv('PLAN_CACHE_ENABLED', '1') == '1'
+    PLAN_CACHE_PATH = os.getenv('PLAN_CACHE_PATH', str(BASE_DIR / 'data' / 'plan_cache.db'))
+    PLAN_CACHE_MAX_ENTRIES = int(os.getenv('PLAN_CACHE_MAX_ENTRIES', 1024))
+    PLAN_CACHE_PERSISTENT_MAX_ENTRIES = int(os.getenv('PLAN_CACHE_PERSISTENT_MAX_ENTRIES', 50000))
+    PLAN_CACHE_TTL = float(os.getenv('PLAN_CACHE_TTL', 7 * 24 * 3600))
+    # Coalesce concurrent generations of the same plan (in-process and across workers sharing PLAN_CACHE_PATH)
+    PLAN_SINGLE_FLIGHT_ENABLED = os.getenv('PLAN_SINGLE_FLIGHT_ENABLED', '1') == '1'
+    PLAN_LOCK_LEASE = float(os.getenv('PLAN_LOCK_LEASE', 120))
+    PLAN_LOCK_POLL_INTERVAL = float(os.getenv('PLAN_LOCK_POLL_INTERVAL', 0.25))
+    # Serve diet plans from the per-cluster library in MODELS_PATH (built by backend/plan_library.py)
+    PLAN_LIBRARY_ENABLED = os.getenv('PLAN_LIBRARY_ENABLED', '1') == '1'
+
+    # Off-peak pre-generation of next-day plans for active users (backend/plan_scheduler.py)
+    PLAN_SCHEDULER_WINDOW = os.getenv('PLAN_SCHEDULER_WINDOW', '01:00-05:00')
+    PLAN_SCHEDULER_WORKERS = int(os.getenv('PLAN_SCHEDULER_WORKERS', 4))
+    PLAN_SCHEDULER_RATE_LIMIT = float(os.getenv('PLAN_SCHEDULER_RATE_LIMIT', 60))  # LLM calls per minute
+    PLAN_SCHEDULER_BATCH_SIZE = int(os.getenv('PLAN_SCHEDULER_BATCH_SIZE', 200))
+    PLAN_SCHEDULER_ACTIVE_DAYS = int(os.getenv('PLAN_SCHEDULER_ACTIVE_DAYS', 14))
+
     @staticmethod
     def init_app(app):
         """Initialize app with configuration"""
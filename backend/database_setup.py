@@ -1,10 +1,15 @@
 import psycopg2
 import psycopg2.extras
 from psycopg2 import IntegrityError
+from psycopg2 import pool as pg_pool
 import hashlib
 import json
 import os
 import sys
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
 import logging
@@ -17,15 +22,388 @@ from backend.config import get_config
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Dashboard queries: today's plan aggregates, progress log and target calories in one round trip
+_DASHBOARD_LOG_AND_PROFILE_SQL = '''
+    LEFT JOIN LATERAL (
+        SELECT calories_consumed, calories_burned, workouts_completed
+        FROM daily_logs WHERE user_id = %(user_id)s AND date = %(date)s
+        LIMIT 1
+    ) daily_log ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT TRUE AS found, target_calories
+        FROM user_profiles WHERE user_id = %(user_id)s
+        LIMIT 1
+    ) profile ON TRUE
+'''
+
+DASHBOARD_STATS_SQL = '''
+    WITH diet AS (
+        SELECT SUM(calories) AS calories_planned
+        FROM diet_plans WHERE user_id = %(user_id)s AND date = %(date)s
+    ), workouts AS (
+        SELECT SUM(calories_burned) AS calories_workout,
+               COUNT(*) FILTER (WHERE completed) AS workouts_completed,
+               COUNT(*) AS workouts_planned
+        FROM workout_plans WHERE user_id = %(user_id)s AND date = %(date)s
+    )
+    SELECT diet.calories_planned, workouts.calories_workout, workouts.workouts_completed,
+           workouts.workouts_planned, daily_log.calories_consumed, daily_log.calories_burned,
+           daily_log.workouts_completed, profile.found, profile.target_calories
+    FROM diet CROSS JOIN workouts
+''' + _DASHBOARD_LOG_AND_PROFILE_SQL
+
+DASHBOARD_SUMMARY_SQL = '''
+    SELECT summary.calories_planned, summary.calories_workout, summary.workouts_completed,
+           summary.workouts_planned, daily_log.calories_consumed, daily_log.calories_burned,
+           daily_log.workouts_completed, profile.found, profile.target_calories, summary.user_id
+    FROM (SELECT 1) AS base
+    LEFT JOIN daily_summaries summary ON summary.user_id = %(user_id)s AND summary.date = %(date)s
+''' + _DASHBOARD_LOG_AND_PROFILE_SQL
+
+# Recompute daily_summaries rows from the plan tables for the (user_id, date) keys of a subquery
+_REFRESH_DAILY_SUMMARIES_TEMPLATE = '''
+    INSERT INTO daily_summaries
+        (user_id, date, calories_planned, calories_workout, workouts_planned, workouts_completed, updated_at)
+    SELECT keys.user_id, keys.date, diet.calories_planned, workouts.calories_workout,
+           workouts.workouts_planned, workouts.workouts_completed, CURRENT_TIMESTAMP
+    FROM ({keys}) AS keys
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(SUM(calories), 0) AS calories_planned
+        FROM diet_plans WHERE user_id = keys.user_id AND date = keys.date
+    ) diet
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(SUM(calories_burned), 0) AS calories_workout,
+               COUNT(*) AS workouts_planned,
+               COUNT(*) FILTER (WHERE completed) AS workouts_completed
+        FROM workout_plans WHERE user_id = keys.user_id AND date = keys.date
+    ) workouts
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        calories_planned = EXCLUDED.calories_planned,
+        calories_workout = EXCLUDED.calories_workout,
+        workouts_planned = EXCLUDED.workouts_planned,
+        workouts_completed = EXCLUDED.workouts_completed,
+        updated_at = EXCLUDED.updated_at
+'''
+# ... for a VALUES list of keys, after plan writes
+REFRESH_DAILY_SUMMARIES_SQL = _REFRESH_DAILY_SUMMARIES_TEMPLATE.format(
+    keys='SELECT DISTINCT user_id::integer, date::date FROM (VALUES %s) AS v (user_id, date)'
+)
+# ... for every existing row, which plan writes made while DASHBOARD_SUMMARY_ENABLED was off left stale
+REBUILD_DAILY_SUMMARIES_SQL = _REFRESH_DAILY_SUMMARIES_TEMPLATE.format(
+    keys='SELECT user_id, date FROM daily_summaries'
+)
+
+# Multi-row plan writes used with psycopg2.extras.execute_values
+DELETE_DIET_PLANS_SQL = '''
+    DELETE FROM diet_plans USING (VALUES %s) AS keys (user_id, date)
+    WHERE diet_plans.user_id = keys.user_id::integer AND diet_plans.date = keys.date::date
+'''
+INSERT_DIET_PLANS_SQL = '''
+    INSERT INTO diet_plans (user_id, date, meal_type, food_item, calories, protein, carbs, fat)
+    VALUES %s
+'''
+DELETE_WORKOUT_PLANS_SQL = '''
+    DELETE FROM workout_plans USING (VALUES %s) AS keys (user_id, date)
+    WHERE workout_plans.user_id = keys.user_id::integer AND workout_plans.date = keys.date::date
+'''
+INSERT_WORKOUT_PLANS_SQL = '''
+    INSERT INTO workout_plans (user_id, date, workout_name, exercise_name, sets, reps, duration, calories_burned)
+    VALUES %s
+'''
+BULK_PAGE_SIZE = 1000
+
+PROFILE_COLUMNS = (
+    'age', 'gender', 'height', 'weight', 'goal', 'diet_preference',
+    'activity_level', 'workout_time', 'target_calories'
+)
+
+# One page of profiles of users active since %(since)s, ordered by user_id for keyset pagination;
+# with missing_only, users who already have both plans for %(plan_date)s are left out
+ACTIVE_PROFILES_SQL = f'''
+    SELECT p.user_id, {', '.join('p.' + column for column in PROFILE_COLUMNS)}
+    FROM user_profiles p
+    WHERE p.user_id > %(after_user_id)s
+      AND (p.updated_at >= %(since)s
+           OR EXISTS (SELECT 1 FROM daily_logs l WHERE l.user_id = p.user_id AND l.date >= %(since)s::date))
+      AND NOT (%(missing_only)s
+               AND EXISTS (SELECT 1 FROM diet_plans d WHERE d.user_id = p.user_id AND d.date = %(plan_date)s)
+               AND EXISTS (SELECT 1 FROM workout_plans w WHERE w.user_id = p.user_id AND w.date = %(plan_date)s))
+    ORDER BY p.user_id
+    LIMIT %(limit)s
+'''
+
+DASHBOARD_STATS_COLUMNS = (
+    'calories_planned', 'calories_workout', 'workouts_completed', 'workouts_planned',
+    'log_calories_consumed', 'log_calories_burned', 'log_workouts_completed',
+    'has_profile', 'target_calories'
+)
+
+
+# Versioned schema changes applied in order by DatabaseManager.migrate()
+# Each entry is (version, description, statements); applied versions are recorded in schema_migrations
+MIGRATIONS = [
+    (1, 'composite (user_id, date) indexes on the plan tables', [
+        'CREATE INDEX IF NOT EXISTS idx_diet_plans_user_date ON diet_plans (user_id, date)',
+        'CREATE INDEX IF NOT EXISTS idx_workout_plans_user_date ON workout_plans (user_id, date)',
+    ]),
+    (2, 'one profile per user and one daily log per user and day', [
+        # Keep the most recent row of each duplicate group before adding the constraints
+        '''
+        DELETE FROM user_profiles older USING user_profiles newer
+        WHERE older.user_id = newer.user_id AND older.id < newer.id
+        ''',
+        '''
+        DELETE FROM daily_logs older USING daily_logs newer
+        WHERE older.user_id = newer.user_id AND older.date = newer.date AND older.id < newer.id
+        ''',
+        'ALTER TABLE user_profiles ADD CONSTRAINT user_profiles_user_id_key UNIQUE (user_id)',
+        'ALTER TABLE daily_logs ADD CONSTRAINT daily_logs_user_id_date_key UNIQUE (user_id, date)',
+    ]),
+    (3, 'background jobs table', [
+        '''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id VARCHAR(32) PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id),
+            kind VARCHAR(50) NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            payload JSONB NOT NULL,
+            result JSONB,
+            error TEXT,
+            progress TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Workers only ever scan for the oldest queued or the stale running jobs
+        "CREATE INDEX IF NOT EXISTS idx_jobs_queued ON jobs (created_at) WHERE status = 'queued'",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_running ON jobs (updated_at) WHERE status = 'running'",
+    ]),
+    # Per-user, per-day plan totals maintained when plans change (DASHBOARD_SUMMARY_ENABLED);
+    # missing rows are built on first read and existing ones rebuilt when the flag is turned on
+    (4, 'daily summaries table', [
+        '''
+        CREATE TABLE IF NOT EXISTS daily_summaries (
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            date DATE NOT NULL,
+            calories_planned REAL NOT NULL DEFAULT 0,
+            calories_workout REAL NOT NULL DEFAULT 0,
+            workouts_planned INTEGER NOT NULL DEFAULT 0,
+            workouts_completed INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, date)
+        )
+        ''',
+    ]),
+]
+
+# Schema version the application code expects; upserts need the unique constraints of migration 2
+SCHEMA_VERSION = max(version for version, _, _ in MIGRATIONS)
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent workers migrate one at a time
+MIGRATION_LOCK_ID = 7310214
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class SchemaOutdatedError(RuntimeError):
+    """Raised when the database has not been migrated to the version the code expects"""
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of PostgreSQL connections shared by all routes.
+    Connections are health-checked on checkout and usage metrics are tracked.
+    """
+
+    def __init__(self, db_url, min_size=1, max_size=10, timeout=30.0, health_check_interval=30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+        self.db_url = db_url
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._pool = pg_pool.ThreadedConnectionPool(min_size, max_size, db_url)
+        # ThreadedConnectionPool raises instead of blocking when exhausted,
+        # so callers queue on this semaphore before asking it for a connection
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        # Keyed by the connection itself: an id() could be reused by a replacement connection
+        self._last_used = weakref.WeakKeyDictionary()
+
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._health_check_failures = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commits on success and rolls back on error"""
+        start = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+        acquired = self._slots.acquire(timeout=self.timeout)
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._waiting -= 1
+            if not acquired:
+                self._timeouts += 1
+        if not acquired:
+            raise PoolTimeoutError(f"No database connection available after {self.timeout}s")
+
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._total_wait_time += waited
+            self._max_wait_time = max(self._max_wait_time, waited)
+
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self._checkin(conn)
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def _checkout(self):
+        """Get a healthy connection, replacing broken ones"""
+        for _ in range(self.max_size + 1):
+            conn = self._pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            with self._lock:
+                self._health_check_failures += 1
+                self._last_used.pop(conn, None)
+            self._pool.putconn(conn, close=True)
+        raise psycopg2.OperationalError("Could not obtain a healthy database connection")
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        # Only ping connections that sat idle long enough to be dropped server-side
+        last_used = self._last_used.get(conn)
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def _checkin(self, conn):
+        broken = bool(conn.closed)
+        with self._lock:
+            if broken:
+                self._last_used.pop(conn, None)
+            else:
+                self._last_used[conn] = time.monotonic()
+        self._pool.putconn(conn, close=broken)
+
+    def stats(self):
+        """Snapshot of pool usage metrics"""
+        with self._lock:
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'health_check_failures': self._health_check_failures,
+                'total_wait_time': round(self._total_wait_time, 6),
+                'avg_wait_time': round(self._total_wait_time / self._checkouts, 6) if self._checkouts else 0.0,
+                'max_wait_time': round(self._max_wait_time, 6)
+            }
+
+    def close(self):
+        """Close every pooled connection"""
+        self._pool.closeall()
+
+
 class DatabaseManager:
     """
     Manages all database operations for the fitness application
     """
-    def __init__(self, db_url):
+    def __init__(self, db_url, pool_min_size=1, pool_max_size=10, pool_timeout=30.0,
+                 pool_health_check_interval=30.0, daily_summaries=False):
         self.db_url = db_url
+        self.daily_summaries = daily_summaries
+        self.pool_min_size = pool_min_size
+        self.pool_max_size = pool_max_size
+        self.pool_timeout = pool_timeout
+        self.pool_health_check_interval = pool_health_check_interval
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a manager using the pool settings of a config class"""
+        return cls(
+            config.DATABASE_URL,
+            pool_min_size=config.DB_POOL_MIN_SIZE,
+            pool_max_size=config.DB_POOL_MAX_SIZE,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_health_check_interval=config.DB_POOL_HEALTH_CHECK_INTERVAL,
+            daily_summaries=config.DASHBOARD_SUMMARY_ENABLED
+        )
+
+    @property
+    def pool(self):
+        """Shared connection pool, created on first use"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ConnectionPool(
+                        self.db_url,
+                        min_size=self.pool_min_size,
+                        max_size=self.pool_max_size,
+                        timeout=self.pool_timeout,
+                        health_check_interval=self.pool_health_check_interval
+                    )
+        return self._pool
+
+    def connection(self):
+        """Borrow a pooled connection for the duration of a with-block"""
+        return self.pool.connection()
+
+    def pool_stats(self):
+        """Connection pool metrics, empty until the pool is first used"""
+        if self._pool is None:
+            return {'min_size': self.pool_min_size, 'max_size': self.pool_max_size, 'in_use': 0, 'checkouts': 0}
+        return self._pool.stats()
+
+    def close(self):
+        """Release all pooled connections"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
 
     def create_tables(self):
-        with psycopg2.connect(self.db_url) as conn:
+        with self.connection() as conn:
             with conn.cursor() as cursor:
                 # Users table
                 cursor.execute('''
@@ -129,6 +507,60 @@ class DatabaseManager:
             conn.commit()
         logger.info("Database tables created successfully!")
 
+    def schema_version(self):
+        """Highest applied migration version (0 before any migration)"""
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT to_regclass('schema_migrations')")
+                if cursor.fetchone()[0] is None:
+                    return 0
+                cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations')
+                return cursor.fetchone()[0]
+
+    def check_schema(self, required=SCHEMA_VERSION):
+        """Raise SchemaOutdatedError unless migrations up to `required` have been applied"""
+        version = self.schema_version()
+        if version < required:
+            raise SchemaOutdatedError(
+                f"Database schema is at version {version}, {required} is required; "
+                "run 'python backend/database_setup.py' or start the API with DB_AUTO_MIGRATE=1"
+            )
+        return version
+
+    def migrate(self, migrations=None):
+        """Apply pending migrations in order, each in its own transaction; returns the versions applied"""
+        migrations = sorted(MIGRATIONS if migrations is None else migrations)
+        applied = []
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version INTEGER PRIMARY KEY,
+                        description TEXT NOT NULL,
+                        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    );
+                ''')
+            conn.commit()
+            for version, description, statements in migrations:
+                with conn.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATION_LOCK_ID,))
+                    cursor.execute('SELECT 1 FROM schema_migrations WHERE version = %s', (version,))
+                    if cursor.fetchone():
+                        conn.commit()
+                        continue
+                    logger.info(f"Applying migration {version}: {description}")
+                    for statement in statements:
+                        cursor.execute(statement)
+                    cursor.execute(
+                        'INSERT INTO schema_migrations (version, description) VALUES (%s, %s)',
+                        (version, description)
+                    )
+                conn.commit()
+                applied.append(version)
+        if applied:
+            logger.info(f"✅ Applied migrations {applied}")
+        return applied
+
     def hash_password(self, password):
         """Hash password using SHA-256"""
         return hashlib.sha256(password.encode()).hexdigest()
@@ -137,7 +569,7 @@ class DatabaseManager:
         """Create a new user account"""
         logger.info(f"Creating user account for {email}")
         try:
-            with psycopg2.connect(self.db_url) as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cursor:
                     password_hash = self.hash_password(password)
                     cursor.execute('''
@@ -161,7 +593,7 @@ class DatabaseManager:
     def authenticate_user(self, email, password):
         """Authenticate user login"""
         logger.info(f"Authenticating user: {email}")
-        with psycopg2.connect(self.db_url) as conn:
+        with self.connection() as conn:
             with conn.cursor() as cursor:
                 password_hash = self.hash_password(password)
                 cursor.execute('''
@@ -178,37 +610,35 @@ class DatabaseManager:
     def save_user_profile(self, user_id, profile_data):
         """Save or update user profile"""
         logger.info(f"Saving profile for user ID: {user_id}")
-        with psycopg2.connect(self.db_url) as conn:
+        with self.connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute('SELECT id FROM user_profiles WHERE user_id = %s', (user_id,))
-                existing = cursor.fetchone()
-                if existing:
-                    cursor.execute(
-                        'UPDATE user_profiles SET age = %s, gender = %s, height = %s, weight = %s, goal = %s, diet_preference = %s, activity_level = %s, workout_time = %s, target_calories = %s, updated_at = CURRENT_TIMESTAMP WHERE user_id = %s',
-                        (
-                            profile_data['age'], profile_data['gender'], profile_data['height'],
-                            profile_data['weight'], profile_data['goal'], profile_data['diet_preference'],
-                            profile_data['activity_level'], profile_data['workout_time'],
-                            profile_data.get('target_calories'), user_id
-                        )
-                    )
-                    logger.info(f"Profile updated for user ID: {user_id}")
-                else:
-                    cursor.execute(
-                        'INSERT INTO user_profiles (user_id, age, gender, height, weight, goal, diet_preference, activity_level, workout_time, target_calories) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
-                        (
-                            user_id, profile_data['age'], profile_data['gender'], profile_data['height'],
-                            profile_data['weight'], profile_data['goal'], profile_data['diet_preference'],
-                            profile_data['activity_level'], profile_data['workout_time'],
-                            profile_data.get('target_calories')
-                        )
-                    )
+                # xmax is 0 only for a freshly inserted row
+                cursor.execute('''
+                    INSERT INTO user_profiles
+                    (user_id, age, gender, height, weight, goal, diet_preference, activity_level, workout_time, target_calories)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (user_id) DO UPDATE SET
+                    age = EXCLUDED.age, gender = EXCLUDED.gender, height = EXCLUDED.height,
+                    weight = EXCLUDED.weight, goal = EXCLUDED.goal,
+                    diet_preference = EXCLUDED.diet_preference, activity_level = EXCLUDED.activity_level,
+                    workout_time = EXCLUDED.workout_time, target_calories = EXCLUDED.target_calories,
+                    updated_at = CURRENT_TIMESTAMP
+                    RETURNING (xmax = 0)
+                ''', (
+                    user_id, profile_data['age'], profile_data['gender'], profile_data['height'],
+                    profile_data['weight'], profile_data['goal'], profile_data['diet_preference'],
+                    profile_data['activity_level'], profile_data['workout_time'],
+                    profile_data.get('target_calories')
+                ))
+                if cursor.fetchone()[0]:
                     logger.info(f"New profile created for user ID: {user_id}")
+                else:
+                    logger.info(f"Profile updated for user ID: {user_id}")
             conn.commit()
 
     def get_user_profile(self, user_id):
         """Get user profile data"""
-        with psycopg2.connect(self.db_url) as conn:
+        with self.connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute('''
                     SELECT age, gender, height, weight, goal, diet_preference,
@@ -217,97 +647,179 @@ class DatabaseManager:
                 ''', (user_id,))
                 result = cursor.fetchone()
         if result:
-            return {
-                'age': result[0],
-                'gender': result[1],
-                'height': result[2],
-                'weight': result[3],
-                'goal': result[4],
-                'diet_preference': result[5],
-                'activity_level': result[6],
-                'workout_time': result[7],
-                'target_calories': result[8]
-            }
+            return dict(zip(PROFILE_COLUMNS, result))
         return None
 
+    def get_active_profiles(self, since, plan_date, after_user_id=0, limit=500, missing_only=True):
+        """
+        One page of (user_id, profile) for users who saved their profile or logged progress since `since`
+        Pass the last user_id of a page as after_user_id to get the next one; with missing_only,
+        users who already have diet and workout plans for plan_date are skipped
+        """
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(ACTIVE_PROFILES_SQL, {
+                    'since': since,
+                    'plan_date': plan_date,
+                    'after_user_id': after_user_id,
+                    'limit': limit,
+                    'missing_only': missing_only
+                })
+                rows = cursor.fetchall()
+        return [(row[0], dict(zip(PROFILE_COLUMNS, row[1:]))) for row in rows]
+
+    @staticmethod
+    def diet_plan_rows(user_id, date, meal_plan):
+        """diet_plans rows for a meal plan whose meals are a single item or a list of items"""
+        rows = []
+        for meal_type, items in meal_plan.items():
+            for item in (items if isinstance(items, list) else [items]):
+                rows.append((
+                    user_id, date, meal_type, item['name'],
+                    item['calories'], item['protein'], item['carbs'], item['fat']
+                ))
+        return rows
+
+    @staticmethod
+    def workout_plan_rows(user_id, date, workout_plan):
+        """workout_plans rows for a workout plan"""
+        return [
+            (
+                user_id, date, workout_plan['name'], exercise['name'],
+                exercise.get('sets'), str(exercise.get('reps')),
+                exercise.get('duration'), exercise.get('calories')
+            )
+            for exercise in workout_plan['exercises']
+        ]
+
+    def replace_plans(self, cursor, diet_plans=(), workout_plans=()):
+        """Replace the plans of every (user_id, date) given, inside the caller's transaction
+        diet_plans and workout_plans are iterables of (user_id, date, plan); each table costs
+        one DELETE and one multi-row INSERT per BULK_PAGE_SIZE rows
+        """
+        keys = set()
+        for delete_sql, insert_sql, plans, to_rows in (
+            (DELETE_DIET_PLANS_SQL, INSERT_DIET_PLANS_SQL, diet_plans, self.diet_plan_rows),
+            (DELETE_WORKOUT_PLANS_SQL, INSERT_WORKOUT_PLANS_SQL, workout_plans, self.workout_plan_rows),
+        ):
+            plans = list(plans)
+            if not plans:
+                continue
+            plan_keys = sorted({(user_id, str(date)) for user_id, date, _ in plans})
+            rows = [row for user_id, date, plan in plans for row in to_rows(user_id, date, plan)]
+            psycopg2.extras.execute_values(cursor, delete_sql, plan_keys, page_size=BULK_PAGE_SIZE)
+            if rows:
+                psycopg2.extras.execute_values(cursor, insert_sql, rows, page_size=BULK_PAGE_SIZE)
+            keys.update(plan_keys)
+        self.refresh_daily_summaries(cursor, keys)
+        return len(keys)
+
+    def save_plans_bulk(self, diet_plans=(), workout_plans=()):
+        """Replace diet and workout plans for many users and days in one transaction"""
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                replaced = self.replace_plans(cursor, diet_plans, workout_plans)
+            conn.commit()
+        logger.info(f"Saved plans for {replaced} user-days")
+        return replaced
+
     def save_diet_plan(self, user_id, date, meal_plan):
         """Save daily diet plan"""
         logger.info(f"Saving diet plan for user {user_id} on {date}")
-        with psycopg2.connect(self.db_url) as conn:
+        with self.connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute('DELETE FROM diet_plans WHERE user_id = %s AND date = %s', (user_id, date))
-                for meal_type, items in meal_plan.items():
-                    if isinstance(items, list):
-                        for item in items:
-                            cursor.execute('''
-                                INSERT INTO diet_plans 
-                                (user_id, date, meal_type, food_item, calories, protein, carbs, fat)
-                                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                            ''', (
-                                user_id, date, meal_type, item['name'],
-                                item['calories'], item['protein'], item['carbs'], item['fat']
-                            ))
-                    else:
-                        cursor.execute('''
-                            INSERT INTO diet_plans 
-                            (user_id, date, meal_type, food_item, calories, protein, carbs, fat)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                        ''', (
-                            user_id, date, meal_type, items['name'],
-                            items['calories'], items['protein'], items['carbs'], items['fat']
-                        ))
+                self.replace_plans(cursor, diet_plans=[(user_id, date, meal_plan)])
             conn.commit()
         logger.info(f"Diet plan saved successfully")
 
     def save_workout_plan(self, user_id, date, workout_plan):
         """Save daily workout plan"""
         logger.info(f"Saving workout plan for user {user_id} on {date}")
-        with psycopg2.connect(self.db_url) as conn:
+        with self.connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute('DELETE FROM workout_plans WHERE user_id = %s AND date = %s', (user_id, date))
-                for exercise in workout_plan['exercises']:
-                    cursor.execute('''
-                        INSERT INTO workout_plans 
-                        (user_id, date, workout_name, exercise_name, sets, reps, duration, calories_burned)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    ''', (
-                        user_id, date, workout_plan['name'], exercise['name'],
-                        exercise.get('sets'), str(exercise.get('reps')), 
-                        exercise.get('duration'), exercise.get('calories')
-                    ))
+                self.replace_plans(cursor, workout_plans=[(user_id, date, workout_plan)])
             conn.commit()
         logger.info(f"Workout plan saved successfully")
 
+    def complete_exercise(self, user_id, date, exercise_name):
+        """Mark an exercise in a workout plan as completed"""
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('''
+                    UPDATE workout_plans SET completed = TRUE
+                    WHERE user_id = %s AND date = %s AND exercise_name = %s
+                ''', (user_id, date, exercise_name))
+                updated = cursor.rowcount
+                if updated:
+                    self.refresh_daily_summary(cursor, user_id, date)
+            conn.commit()
+        return updated
+
+    def refresh_daily_summary(self, cursor, user_id, date):
+        """Recompute the daily_summaries row for one user and day inside the caller's transaction"""
+        self.refresh_daily_summaries(cursor, [(user_id, date)])
+
+    def refresh_daily_summaries(self, cursor, keys):
+        """Recompute daily_summaries for many (user_id, date) pairs in one statement"""
+        keys = [(user_id, str(date)) for user_id, date in keys]
+        if self.daily_summaries and keys:
+            psycopg2.extras.execute_values(cursor, REFRESH_DAILY_SUMMARIES_SQL, keys, page_size=BULK_PAGE_SIZE)
+
+    def rebuild_daily_summaries(self):
+        """
+        Recompute every existing daily_summaries row from the plan tables
+        Plan writes made while DASHBOARD_SUMMARY_ENABLED was off do not touch the summaries,
+        so this runs at startup whenever the flag is on; returns the number of rows rebuilt
+        """
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(REBUILD_DAILY_SUMMARIES_SQL)
+                rebuilt = cursor.rowcount
+            conn.commit()
+        logger.info(f"✅ Rebuilt {rebuilt} daily summaries")
+        return rebuilt
+
+    def get_dashboard_stats(self, user_id, date):
+        """Plan totals, progress log and target calories for one day in a single query
+        Reads daily_summaries when enabled; a missing summary row is built on first read
+        """
+        params = {'user_id': user_id, 'date': date}
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                if self.daily_summaries:
+                    cursor.execute(DASHBOARD_SUMMARY_SQL, params)
+                    row = cursor.fetchone()
+                    if row[-1] is not None:
+                        return dict(zip(DASHBOARD_STATS_COLUMNS, row))
+                    self.refresh_daily_summary(cursor, user_id, date)
+                cursor.execute(DASHBOARD_STATS_SQL, params)
+                row = cursor.fetchone()
+            conn.commit()
+        return dict(zip(DASHBOARD_STATS_COLUMNS, row))
+
     def log_daily_progress(self, user_id, date, weight=None, calories_consumed=None, 
                           calories_burned=None, workouts_completed=None, notes=None):
         """Log daily progress"""
         logger.info(f"Logging progress for user {user_id} on {date}")
-        with psycopg2.connect(self.db_url) as conn:
+        with self.connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute('SELECT id FROM daily_logs WHERE user_id = %s AND date = %s', (user_id, date))
-                existing = cursor.fetchone()
-                if existing:
-                    cursor.execute('''
-                        UPDATE daily_logs SET
-                        weight = COALESCE(%s, weight),
-                        calories_consumed = COALESCE(%s, calories_consumed),
-                        calories_burned = COALESCE(%s, calories_burned),
-                        workouts_completed = COALESCE(%s, workouts_completed),
-                        notes = COALESCE(%s, notes)
-                        WHERE user_id = %s AND date = %s
-                    ''', (weight, calories_consumed, calories_burned, workouts_completed, notes, user_id, date))
-                else:
-                    cursor.execute('''
-                        INSERT INTO daily_logs 
-                        (user_id, date, weight, calories_consumed, calories_burned, workouts_completed, notes)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    ''', (user_id, date, weight, calories_consumed, calories_burned, workouts_completed, notes))
+                cursor.execute('''
+                    INSERT INTO daily_logs 
+                    (user_id, date, weight, calories_consumed, calories_burned, workouts_completed, notes)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (user_id, date) DO UPDATE SET
+                    weight = COALESCE(EXCLUDED.weight, daily_logs.weight),
+                    calories_consumed = COALESCE(EXCLUDED.calories_consumed, daily_logs.calories_consumed),
+                    calories_burned = COALESCE(EXCLUDED.calories_burned, daily_logs.calories_burned),
+                    workouts_completed = COALESCE(EXCLUDED.workouts_completed, daily_logs.workouts_completed),
+                    notes = COALESCE(EXCLUDED.notes, daily_logs.notes)
+                ''', (user_id, date, weight, calories_consumed, calories_burned, workouts_completed, notes))
             conn.commit()
         logger.info(f"Progress logged successfully")
 
     def get_progress_data(self, user_id, days=30):
         """Get user progress data for specified number of days"""
-        with psycopg2.connect(self.db_url) as conn:
+        with self.connection() as conn:
             query = f'''
                 SELECT date, weight, calories_consumed, calories_burned, workouts_completed
                 FROM daily_logs 
@@ -319,7 +831,7 @@ class DatabaseManager:
 
     def populate_food_database(self):
         """Populate food database with sample data"""
-        with psycopg2.connect(self.db_url) as conn:
+        with self.connection() as conn:
             with conn.cursor() as cursor:
                 foods = [
                     ('Apple', 'fruit', 52, 0.3, 14, 0.2, True),
@@ -339,7 +851,7 @@ class DatabaseManager:
 
     def populate_exercise_database(self):
         """Populate exercise database with sample data"""
-        with psycopg2.connect(self.db_url) as conn:
+        with self.connection() as conn:
             with conn.cursor() as cursor:
                 exercises = [
                     ('Push-ups', 'strength', 'chest,triceps,shoulders', 'bodyweight', 'beginner', 8, 'Keep your body straight, lower chest to ground, push back up'),
@@ -402,8 +914,10 @@ def main():
     print("=== Database Setup for AI Diet and Workout System ===")
     print("VS Code Optimized Version")
     config = get_config()
-    db = DatabaseManager(config.DATABASE_URL)
+    db = DatabaseManager.from_config(config)
     db.create_tables()
+    print("Applying schema migrations...")
+    db.migrate()
     print("\nPopulating food database...")
     db.populate_food_database()
     print("Populating exercise database...")
@@ -0,0 +1,153 @@
+"""
+Flat, array-backed evaluator for fitted scikit-learn tree ensembles
+Lets the request path score Random Forest models without sklearn's per-call overhead
+"""
+
+import numpy as np
+from typing import Dict
+
+# Array names written by to_arrays() and read by from_arrays()
+FLAT_FOREST_ARRAYS = ('feature', 'threshold', 'children', 'value', 'roots', 'max_depth')
+
+
+def _float32_thresholds(threshold):
+    """Round float64 thresholds down to float32 so float32 comparisons stay exact
+
+    sklearn compares float32 inputs against float64 thresholds. For a float32 x,
+    x <= t holds exactly when x <= the largest float32 not above t.
+    """
+    t32 = threshold.astype(np.float32)
+    rounded_up = t32.astype(np.float64) > threshold
+    t32[rounded_up] = np.nextafter(t32[rounded_up], np.float32(-np.inf))
+    return t32
+
+
+class FlatForest:
+    """
+    All trees of a forest concatenated into contiguous node arrays
+
+    feature[i], threshold[i]  split of node i (leaves point at feature 0)
+    children[2*i], children[2*i + 1]  global left/right child; leaves point at themselves
+    value[i]  leaf prediction
+    roots[t]  index of the root node of tree t
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth):
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float32)
+        self.children = np.ascontiguousarray(children, dtype=np.int32)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.is_leaf = self.children[0::2] == np.arange(len(self.feature), dtype=np.int32)
+
+    @classmethod
+    def from_sklearn(cls, forest) -> 'FlatForest':
+        """Flatten a fitted single-output RandomForestRegressor (or any bagged regressor of trees)"""
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            if tree.n_outputs != 1:
+                raise ValueError("Only single-output forests can be flattened")
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+            children.append(np.stack([left, right], axis=1).ravel())
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        if offset > np.iinfo(np.int32).max:
+            raise ValueError("Forest is too large to flatten with 32-bit node indices")
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=_float32_thresholds(np.concatenate(thresholds)),
+            children=np.concatenate(children),
+            value=np.concatenate(values),
+            roots=np.array(roots),
+            max_depth=max_depth
+        )
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in ('feature', 'threshold', 'children', 'value', 'roots'))
+
+    def predict(self, X, chunk_size: int = 4096) -> np.ndarray:
+        """Average tree predictions for each row of X, processing rows in bounded chunks"""
+        # sklearn evaluates splits on float32 inputs; match it for exact parity
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_rows = X.shape[0]
+        if n_rows == 1:
+            return np.array([self._predict_row(X[0])])
+        out = np.empty(n_rows, dtype=np.float64)
+        for start in range(0, n_rows, chunk_size):
+            stop = min(start + chunk_size, n_rows)
+            out[start:stop] = self._predict_chunk(X[start:stop])
+        return out
+
+    def _predict_row(self, x) -> float:
+        # One step per tree level for all trees at once; leaves loop onto themselves
+        nodes = self.roots
+        for _ in range(self.max_depth):
+            go_right = x[self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+        return float(self.value[nodes].mean())
+
+    def _predict_chunk(self, X) -> np.ndarray:
+        n_rows, n_features = X.shape
+        n_trees = self.n_trees
+        X_flat = X.ravel()
+        # One entry per (row, tree) pair; pairs that reach a leaf drop out of the active set
+        nodes = np.tile(self.roots, n_rows)
+        active = np.arange(n_rows * n_trees)
+        current = nodes
+        row_offsets = np.repeat(np.arange(n_rows, dtype=np.int32) * n_features, n_trees)
+        for _ in range(self.max_depth):
+            x = np.take(X_flat, row_offsets + np.take(self.feature, current))
+            go_right = x > np.take(self.threshold, current)
+            current = np.take(self.children, 2 * current + go_right)
+            nodes[active] = current
+            still_active = ~np.take(self.is_leaf, current)
+            if not still_active.all():
+                active = active[still_active]
+                if active.size == 0:
+                    break
+                current = current[still_active]
+                row_offsets = row_offsets[still_active]
+        return np.take(self.value, nodes).reshape(n_rows, n_trees).mean(axis=1)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Plain arrays suitable for memory-mapped storage (see backend.model_store)"""
+        return {
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'children': self.children,
+            'value': self.value,
+            'roots': self.roots,
+            'max_depth': np.array(self.max_depth)
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays) -> 'FlatForest':
+        """Rebuild a forest from the output of to_arrays()"""
+        return cls(**{name: arrays[name] for name in FLAT_FOREST_ARRAYS})
@@ -1,460 +1,1194 @@
-"""
-Gemini 2.5 Flash Integration for AI Diet and Workout Recommendations
-Replaces traditional ML models with Gemini API for more flexible predictions
-"""
-
-import google.generativeai as genai
-import json
-import os
-import logging
-from typing import Dict, Any, List
-from backend.config import get_config
-
-# Setup logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-class GeminiRecommendationService:
-    """
-    Service class for generating recommendations using Gemini 2.5 Flash
-    Replaces the traditional ML models with AI-powered recommendations
-    """
-    
-    def __init__(self, config=None):
-        self.config = config or get_config()
-        self.model = None
-        self._initialize_gemini()
-    
-    def _initialize_gemini(self):
-        """Initialize Gemini API"""
-        try:
-            # Get API key from environment
-            api_key = os.getenv('GEMINI_API_KEY')
-            if not api_key:
-                logger.warning("GEMINI_API_KEY not found. Please set it in your environment variables.")
-                return False
-            
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
-            logger.info("✅ Gemini 2.5 Flash initialized successfully!")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to initialize Gemini: {e}")
-            return False
-    
-    def generate_diet_plan(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Generate personalized diet plan using Gemini
-        """
-        if not self.model:
-            return self._fallback_diet_plan(user_data)
-        
-        try:
-            # Calculate basic metrics
-            bmi = user_data['weight'] / ((user_data['height'] / 100) ** 2)
-            
-            # Create detailed prompt for Gemini
-            prompt = f"""
-            You are a professional nutritionist and dietitian. Generate a personalized diet plan based on the following user profile:
-
-            User Profile:
-            - Age: {user_data['age']} years
-            - Gender: {user_data['gender']}
-            - Height: {user_data['height']} cm
-            - Weight: {user_data['weight']} kg
-            - BMI: {bmi:.1f}
-            - Goal: {user_data['goal']}
-            - Diet Preference: {user_data['diet_preference']}
-            - Activity Level: {user_data['activity_level']}
-
-            Please generate a comprehensive diet plan that includes:
-            1. Daily calorie target
-            2. Macro distribution (protein, carbs, fat)
-            3. Three main meals (breakfast, lunch, dinner) with specific food items
-            4. Each food item should include calories, protein, carbs, and fat content
-            5. Meal timing recommendations
-            6. Hydration goals
-
-            Format the response as a JSON object with this structure:
-            {{
-                "target_calories": number,
-                "macros": {{
-                    "protein": number,
-                    "carbs": number,
-                    "fat": number
-                }},
-                "meal_plan": {{
-                    "breakfast": {{
-                        "name": "string",
-                        "calories": number,
-                        "protein": number,
-                        "carbs": number,
-                        "fat": number,
-                        "time": "string"
-                    }},
-                    "lunch": {{
-                        "name": "string",
-                        "calories": number,
-                        "protein": number,
-                        "carbs": number,
-                        "fat": number,
-                        "time": "string"
-                    }},
-                    "dinner": {{
-                        "name": "string",
-                        "calories": number,
-                        "protein": number,
-                        "carbs": number,
-                        "fat": number,
-                        "time": "string"
-                    }}
-                }},
-                "recommendations": "string"
-            }}
-
-            Make sure the total calories match the target and the macros are appropriate for the user's goal.
-            """
-            
-            response = self.model.generate_content(prompt)
-            
-            # Parse the response
-            diet_plan = self._parse_gemini_response(response.text)
-            
-            logger.info("✅ Diet plan generated successfully using Gemini")
-            return diet_plan
-            
-        except Exception as e:
-            logger.error(f"Error generating diet plan with Gemini: {e}")
-            return self._fallback_diet_plan(user_data)
-    
-    def generate_workout_plan(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Generate personalized workout plan using Gemini
-        """
-        if not self.model:
-            return self._fallback_workout_plan(user_data)
-        
-        try:
-            prompt = f"""
-            You are a certified personal trainer and fitness expert. Generate a personalized workout plan based on the following user profile:
-
-            User Profile:
-            - Age: {user_data['age']} years
-            - Gender: {user_data['gender']}
-            - Height: {user_data['height']} cm
-            - Weight: {user_data['weight']} kg
-            - Goal: {user_data['goal']}
-            - Activity Level: {user_data['activity_level']}
-            - Available Time: {user_data['workout_time']} minutes per day
-
-            Please generate a comprehensive workout plan that includes:
-            1. Workout name and description
-            2. List of exercises with sets, reps, and duration
-            3. Estimated calories burned
-            4. Difficulty level appropriate for the user
-            5. Equipment needed (prefer bodyweight exercises)
-            6. Rest periods between exercises
-            7. Progression tips
-
-            Format the response as a JSON object with this structure:
-            {{
-                "name": "string",
-                "description": "string",
-                "duration": number,
-                "difficulty": "string",
-                "estimated_calories": number,
-                "exercises": [
-                    {{
-                        "name": "string",
-                        "sets": number,
-                        "reps": "string",
-                        "duration": number,
-                        "calories": number,
-                        "instructions": "string",
-                        "muscle_groups": ["string"]
-                    }}
-                ],
-                "equipment_needed": ["string"],
-                "tips": "string"
-            }}
-
-            Make sure the workout is appropriate for the user's fitness level and time constraints.
-            """
-            
-            response = self.model.generate_content(prompt)
-            
-            # Parse the response
-            workout_plan = self._parse_gemini_response(response.text)
-            
-            logger.info("✅ Workout plan generated successfully using Gemini")
-            return workout_plan
-            
-        except Exception as e:
-            logger.error(f"Error generating workout plan with Gemini: {e}")
-            return self._fallback_workout_plan(user_data)
-    
-    def generate_workout_plan_from_prompt(self, prompt: str) -> str:
-        """
-        Generate workout plan from a custom prompt string
-        Returns JSON string response
-        """
-        if not self.model:
-            return self._fallback_workout_plan_string()
-        
-        try:
-            response = self.model.generate_content(prompt)
-            logger.info("✅ Custom workout plan generated successfully using Gemini")
-            
-            # Clean the response - remove markdown code blocks if present
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]  # Remove ```json
-            if response_text.startswith('```'):
-                response_text = response_text[3:]  # Remove ```
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]  # Remove trailing ```
-            
-            return response_text.strip()
-            
-        except Exception as e:
-            logger.error(f"Error generating custom workout plan with Gemini: {e}")
-            return self._fallback_workout_plan_string()
-    
-    def _fallback_workout_plan_string(self) -> str:
-        """Fallback workout plan as JSON string"""
-        fallback_plan = {
-            "workout_name": "Basic Full Body Workout",
-            "exercises": [
-                {
-                    "name": "Push-ups",
-                    "sets": 3,
-                    "reps": "10-12",
-                    "duration": 5,
-                    "calories": 50,
-                    "instructions": "Start in plank position, lower chest to ground, push back up",
-                    "muscle_groups": ["Chest", "Triceps", "Shoulders"]
-                },
-                {
-                    "name": "Squats",
-                    "sets": 3,
-                    "reps": "15-20",
-                    "duration": 5,
-                    "calories": 60,
-                    "instructions": "Feet shoulder-width apart, lower hips back and down, return to standing",
-                    "muscle_groups": ["Legs", "Glutes"]
-                },
-                {
-                    "name": "Plank",
-                    "sets": 3,
-                    "reps": "30-60 seconds",
-                    "duration": 3,
-                    "calories": 30,
-                    "instructions": "Hold body straight from head to heels, engage core muscles",
-                    "muscle_groups": ["Core"]
-                }
-            ],
-            "total_duration": 30,
-            "total_calories": 140
-        }
-        return json.dumps(fallback_plan)
-    
-    def predict_calories_burned(self, user_data: Dict[str, Any], workout_data: Dict[str, Any]) -> int:
-        """
-        Predict calories burned for a specific workout using Gemini
-        """
-        if not self.model:
-            return self._fallback_calorie_prediction(user_data, workout_data)
-        
-        try:
-            prompt = f"""
-            You are a fitness expert with expertise in calorie burn calculations. Calculate the estimated calories burned for this workout:
-
-            User Profile:
-            - Age: {user_data['age']} years
-            - Gender: {user_data['gender']}
-            - Weight: {user_data['weight']} kg
-
-            Workout Details:
-            - Type: {workout_data['type']}
-            - Intensity: {workout_data['intensity']}
-            - Duration: {workout_data['duration']} minutes
-
-            Please provide:
-            1. Estimated calories burned (as a single number)
-            2. Brief explanation of the calculation method
-            3. Factors that influenced the calculation
-
-            Format the response as a JSON object:
-            {{
-                "calories_burned": number,
-                "explanation": "string",
-                "factors": ["string"]
-            }}
-
-            Use standard MET (Metabolic Equivalent of Task) values and consider the user's weight, age, and gender.
-            """
-            
-            response = self.model.generate_content(prompt)
-            
-            # Parse the response
-            result = self._parse_gemini_response(response.text)
-            
-            logger.info("✅ Calorie prediction generated successfully using Gemini")
-            return result.get('calories_burned', 100)
-            
-        except Exception as e:
-            logger.error(f"Error predicting calories with Gemini: {e}")
-            return self._fallback_calorie_prediction(user_data, workout_data)
-    
-    def _parse_gemini_response(self, response_text: str) -> Dict[str, Any]:
-        """
-        Parse Gemini response and extract JSON
-        """
-        try:
-            # Try to find JSON in the response
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            
-            if start_idx != -1 and end_idx != 0:
-                json_str = response_text[start_idx:end_idx]
-                return json.loads(json_str)
-            else:
-                logger.warning("No JSON found in Gemini response")
-                return {}
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON from Gemini response: {e}")
-            return {}
-    
-    def _fallback_diet_plan(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Fallback diet plan when Gemini is not available"""
-        logger.warning("Using fallback diet plan")
-        
-        # Calculate basic calories
-        if user_data['gender'] == 'male':
-            bmr = 10 * user_data['weight'] + 6.25 * user_data['height'] - 5 * user_data['age'] + 5
-        else:
-            bmr = 10 * user_data['weight'] + 6.25 * user_data['height'] - 5 * user_data['age'] - 161
-        
-        activity_multipliers = {
-            'sedentary': 1.2,
-            'light': 1.375,
-            'moderate': 1.55,
-            'intense': 1.725
-        }
-        
-        daily_calories = bmr * activity_multipliers.get(user_data['activity_level'], 1.55)
-        
-        goal_adjustments = {
-            'weight-loss': 0.8,
-            'maintenance': 1.0,
-            'muscle-gain': 1.2
-        }
-        
-        target_calories = int(daily_calories * goal_adjustments.get(user_data['goal'], 1.0))
-        
-        return {
-            "target_calories": target_calories,
-            "macros": {
-                "protein": int(target_calories * 0.25 / 4),
-                "carbs": int(target_calories * 0.45 / 4),
-                "fat": int(target_calories * 0.30 / 9)
-            },
-            "meal_plan": {
-                "breakfast": {
-                    "name": "Balanced Breakfast",
-                    "calories": int(target_calories * 0.25),
-                    "protein": int(target_calories * 0.25 * 0.25 / 4),
-                    "carbs": int(target_calories * 0.25 * 0.45 / 4),
-                    "fat": int(target_calories * 0.25 * 0.30 / 9),
-                    "time": "8:00 AM"
-                },
-                "lunch": {
-                    "name": "Nutritious Lunch",
-                    "calories": int(target_calories * 0.35),
-                    "protein": int(target_calories * 0.35 * 0.25 / 4),
-                    "carbs": int(target_calories * 0.35 * 0.45 / 4),
-                    "fat": int(target_calories * 0.35 * 0.30 / 9),
-                    "time": "1:00 PM"
-                },
-                "dinner": {
-                    "name": "Light Dinner",
-                    "calories": int(target_calories * 0.40),
-                    "protein": int(target_calories * 0.40 * 0.25 / 4),
-                    "carbs": int(target_calories * 0.40 * 0.45 / 4),
-                    "fat": int(target_calories * 0.40 * 0.30 / 9),
-                    "time": "7:00 PM"
-                }
-            },
-            "recommendations": "Please consult with a nutritionist for personalized advice."
-        }
-    
-    def _fallback_workout_plan(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Fallback workout plan when Gemini is not available"""
-        logger.warning("Using fallback workout plan")
-        
-        return {
-            "name": "Basic Full Body Workout",
-            "description": "A balanced workout for all fitness levels",
-            "duration": 30,
-            "difficulty": "beginner",
-            "estimated_calories": 200,
-            "exercises": [
-                {
-                    "name": "Push-ups",
-                    "sets": 3,
-                    "reps": "10-15",
-                    "duration": 5,
-                    "calories": 50,
-                    "instructions": "Keep your body straight, lower chest to ground, push back up",
-                    "muscle_groups": ["chest", "triceps"]
-                },
-                {
-                    "name": "Squats",
-                    "sets": 3,
-                    "reps": "15-20",
-                    "duration": 5,
-                    "calories": 60,
-                    "instructions": "Feet shoulder-width apart, lower hips back and down",
-                    "muscle_groups": ["legs", "glutes"]
-                },
-                {
-                    "name": "Plank",
-                    "sets": 3,
-                    "reps": "30 seconds",
-                    "duration": 3,
-                    "calories": 30,
-                    "instructions": "Hold body straight from head to heels",
-                    "muscle_groups": ["core"]
-                }
-            ],
-            "equipment_needed": ["none"],
-            "tips": "Focus on proper form over speed"
-        }
-    
-    def _fallback_calorie_prediction(self, user_data: Dict[str, Any], workout_data: Dict[str, Any]) -> int:
-        """Fallback calorie prediction when Gemini is not available"""
-        logger.warning("Using fallback calorie prediction")
-        
-        # Basic MET calculation
-        met_values = {
-            ('strength', 'low'): 3.0,
-            ('strength', 'moderate'): 5.0,
-            ('strength', 'high'): 8.0,
-            ('cardio', 'low'): 4.0,
-            ('cardio', 'moderate'): 7.0,
-            ('cardio', 'high'): 11.0,
-            ('mixed', 'low'): 3.5,
-            ('mixed', 'moderate'): 6.0,
-            ('mixed', 'high'): 9.5
-        }
-        
-        met = met_values.get((workout_data['type'], workout_data['intensity']), 5.0)
-        calories = met * user_data['weight'] * (workout_data['duration'] / 60)
-        
-        # Gender adjustment
-        if user_data['gender'] == 'male':
-            calories *= 1.1
-        else:
-            calories *= 0.9
-        
-        return max(int(calories), 10)
+"""
+Gemini 2.5 Flash Integration for AI Diet and Workout Recommendations
+Replaces traditional ML models with Gemini API for more flexible predictions
+"""
+
+import google.generativeai as genai
+import functools
+import json
+import os
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from backend.calorie_engine import get_calorie_engine
+from backend.config import get_config
+from backend.llm_json import JsonArrayStreamParser, parse_llm_json
+from backend.metrics import get_metrics_registry, log_event
+from backend.plan_schemas import (
+    CalorieExplanation, CustomWorkout, DietPlan, WeeklyPlan, WorkoutPlan, response_schema, schema_example
+)
+from backend.plan_cache import PlanCache, get_plan_cache, profile_fingerprint
+from backend.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, call_with_deadline
+from backend.single_flight import SingleFlight
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bump whenever a plan prompt changes so cached plans are not reused across templates
+PROMPT_TEMPLATE_VERSION = '2024-06-v2'
+
+
+class LLMConcurrencyLimiter:
+    """
+    Process-wide cap on in-flight LLM calls with queueing metrics
+    """
+    
+    def __init__(self, max_concurrency: int):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+        self._max_waiting = 0
+        self._calls = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+    
+    @contextmanager
+    def slot(self):
+        """Block until an LLM call slot is free, then hold it"""
+        start = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+            self._max_waiting = max(self._max_waiting, self._waiting)
+        self._semaphore.acquire()
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._waiting -= 1
+            self._in_flight += 1
+            self._calls += 1
+            self._total_wait_time += waited
+            self._max_wait_time = max(self._max_wait_time, waited)
+        try:
+            yield
+        finally:
+            self.release()
+    
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free right now; the caller must release() it"""
+        if not self._semaphore.acquire(blocking=False):
+            return False
+        with self._lock:
+            self._in_flight += 1
+            self._calls += 1
+        return True
+    
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._semaphore.release()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of limiter usage"""
+        with self._lock:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'in_flight': self._in_flight,
+                'waiting': self._waiting,
+                'max_waiting': self._max_waiting,
+                'calls': self._calls,
+                'total_wait_time': round(self._total_wait_time, 6),
+                'avg_wait_time': round(self._total_wait_time / self._calls, 6) if self._calls else 0.0,
+                'max_wait_time': round(self._max_wait_time, 6)
+            }
+
+
+class LLMRateLimiter:
+    """
+    Token bucket capping the rate of LLM calls at `rate` per second with bursts of up to `burst`
+    Callers reserve a token and sleep until it is due, so waiters are served in arrival order
+    """
+    
+    def __init__(self, rate: float, burst: int = 1, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._calls = 0
+        self._total_wait_time = 0.0
+    
+    def acquire(self) -> float:
+        """Block until the next call may start; returns the seconds waited"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self._calls += 1
+            self._total_wait_time += wait
+        if wait:
+            self._sleep(wait)
+        return wait
+    
+    def try_acquire(self) -> bool:
+        """Take a token only if one is available right now, never waiting"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            self._calls += 1
+        return True
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'rate_per_minute': round(self.rate * 60, 3),
+                'calls': self._calls,
+                'total_wait_time': round(self._total_wait_time, 6)
+            }
+
+
+class GeminiClientRegistry:
+    """
+    Process-wide Gemini client: configures the SDK once and keeps one model handle
+    per model name, so every service reuses the same API connections
+    (each genai.configure call discards the SDK's cached clients)
+    A model_factory replaces the SDK entirely, e.g. to hand out fakes in tests
+    """
+    
+    def __init__(self, api_key: Optional[str] = None, model_factory=None):
+        self.api_key = api_key
+        self._model_factory = model_factory
+        self._models: Dict[str, Any] = {}
+        self._configured = False
+        self._lock = threading.Lock()
+    
+    def model(self, name: str):
+        """Shared handle for a model, or None when no API key is configured"""
+        with self._lock:
+            if name not in self._models:
+                self._models[name] = self._create_model(name)
+            return self._models[name]
+    
+    def _create_model(self, name: str):
+        if self._model_factory is not None:
+            return self._model_factory(name)
+        if not self.api_key:
+            logger.warning("GEMINI_API_KEY not found. Please set it in your environment variables.")
+            return None
+        try:
+            if not self._configured:
+                genai.configure(api_key=self.api_key)
+                self._configured = True
+            model = genai.GenerativeModel(name)
+            logger.info(f"✅ Gemini model {name} initialized successfully!")
+            return model
+        except Exception as e:
+            logger.error(f"Failed to initialize Gemini: {e}")
+            return None
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'configured': self._configured,
+                'models': sorted(name for name, model in self._models.items() if model is not None)
+            }
+
+
+_gemini_client = None
+_gemini_service = None
+_llm_limiter = None
+_llm_breaker = None
+_llm_executor = None
+_llm_call_executor = None
+_llm_pending = 0
+_llm_state_lock = threading.Lock()
+_gemini_service_lock = threading.Lock()
+
+# Per-method instruments for every model call; method is the kind of call ('diet', 'workout', ...)
+_metrics = get_metrics_registry()
+_llm_calls = _metrics.counter('llm_requests_total', 'Gemini calls by method and outcome', ('method', 'outcome'))
+_llm_latency = _metrics.histogram(
+    'llm_request_duration_seconds', 'Gemini call latency, excluding the wait for a concurrency slot', ('method',)
+)
+_llm_first_chunk = _metrics.histogram(
+    'llm_first_chunk_seconds', 'Time to the first chunk of a streamed Gemini call', ('method',)
+)
+_llm_tokens = _metrics.counter('llm_tokens_total', 'Tokens reported by Gemini usage metadata', ('method', 'type'))
+_llm_cost = _metrics.counter('llm_cost_usd_total', 'Estimated Gemini spend from the configured token prices', ('method',))
+# Outcome of parsing each response: clean JSON, usable after repairs, or unusable
+_llm_responses = _metrics.counter('llm_responses_total', 'Parsed Gemini responses by outcome', ('method', 'outcome'))
+_plan_cache_lookups = _metrics.counter('plan_cache_lookups_total', 'Plan cache lookups by method and result', ('method', 'result'))
+_llm_hedges = _metrics.counter('llm_hedged_requests_total', 'Gemini calls that started a hedged second attempt', ('method',))
+_llm_hedges_skipped = _metrics.counter(
+    'llm_hedges_skipped_total', 'Hedged attempts skipped because no LLM slot or rate token was free', ('method',)
+)
+_llm_fallbacks = _metrics.counter('llm_fallbacks_total', 'Rule-based fallbacks served instead of Gemini', ('method', 'reason'))
+
+RESPONSE_OUTCOMES = ('clean', 'repaired', 'failed')
+USAGE_FIELDS = {
+    'prompt_tokens': 'prompt_token_count',
+    'output_tokens': 'candidates_token_count',
+    'total_tokens': 'total_token_count'
+}
+
+
+def _count_response(kind: str, outcome: str, repairs: int = 0):
+    _llm_responses.inc(method=kind, outcome=outcome)
+    if outcome != 'clean':
+        log_event('llm_parse', method=kind, outcome=outcome, repairs=repairs)
+
+
+def _count_fallback(kind: str, reason: str):
+    """
+    reason is 'no_model' (Gemini not configured), 'circuit_open', 'timeout',
+    'error' (call or validation failed) or 'unusable' (empty result)
+    """
+    _llm_fallbacks.inc(method=kind, reason=reason)
+    log_event('llm_fallback', method=kind, reason=reason)
+
+
+def _fallback_reason(error: Exception) -> str:
+    if isinstance(error, CircuitOpenError):
+        return 'circuit_open'
+    if isinstance(error, DeadlineExceeded):
+        return 'timeout'
+    return 'error'
+
+
+@functools.lru_cache(maxsize=None)
+def _compiled_schema(schema) -> Dict[str, Any]:
+    return response_schema(schema)
+
+
+def get_gemini_client() -> GeminiClientRegistry:
+    """Shared Gemini client for this process, keyed by the GEMINI_API_KEY environment variable"""
+    global _gemini_client
+    if _gemini_client is None:
+        with _llm_state_lock:
+            if _gemini_client is None:
+                _gemini_client = GeminiClientRegistry(os.getenv('GEMINI_API_KEY'))
+    return _gemini_client
+
+
+def set_gemini_client(client: Optional[GeminiClientRegistry]):
+    """Install the client used by services created from now on (None restores the default)"""
+    global _gemini_client, _gemini_service
+    with _gemini_service_lock:
+        _gemini_client = client
+        _gemini_service = None
+
+
+def get_llm_limiter(config=None) -> LLMConcurrencyLimiter:
+    """Shared limiter for every LLM call made by this process"""
+    global _llm_limiter
+    if _llm_limiter is None:
+        with _llm_state_lock:
+            if _llm_limiter is None:
+                config = config or get_config()
+                _llm_limiter = LLMConcurrencyLimiter(config.LLM_MAX_CONCURRENCY)
+    return _llm_limiter
+
+
+def get_circuit_breaker(config=None) -> CircuitBreaker:
+    """Shared circuit breaker for calls to the Gemini API"""
+    global _llm_breaker
+    if _llm_breaker is None:
+        with _llm_state_lock:
+            if _llm_breaker is None:
+                config = config or get_config()
+                _llm_breaker = CircuitBreaker(config.LLM_BREAKER_FAILURE_THRESHOLD, config.LLM_BREAKER_RESET_TIMEOUT)
+    return _llm_breaker
+
+
+def get_llm_call_executor(config=None) -> ThreadPoolExecutor:
+    """Threads that run individual model calls so they can be given deadlines and hedged"""
+    global _llm_call_executor
+    if _llm_call_executor is None:
+        with _llm_state_lock:
+            if _llm_call_executor is None:
+                config = config or get_config()
+                # Room for a hedge per concurrent call
+                _llm_call_executor = ThreadPoolExecutor(
+                    max_workers=2 * config.LLM_MAX_CONCURRENCY,
+                    thread_name_prefix='llm-call'
+                )
+    return _llm_call_executor
+
+
+def get_llm_executor(config=None) -> ThreadPoolExecutor:
+    """Dedicated executor that runs blocking LLM generations off the request thread"""
+    global _llm_executor
+    if _llm_executor is None:
+        with _llm_state_lock:
+            if _llm_executor is None:
+                config = config or get_config()
+                _llm_executor = ThreadPoolExecutor(
+                    max_workers=config.LLM_EXECUTOR_WORKERS,
+                    thread_name_prefix='llm'
+                )
+    return _llm_executor
+
+
+def get_gemini_service(config=None) -> 'GeminiRecommendationService':
+    """Recommendation service shared by every component of this process"""
+    global _gemini_service
+    if _gemini_service is None:
+        with _gemini_service_lock:
+            if _gemini_service is None:
+                _gemini_service = GeminiRecommendationService(config)
+    return _gemini_service
+
+
+def submit_llm_task(fn, *args, **kwargs) -> Future:
+    """Run an LLM-backed callable on the shared executor and return its future"""
+    global _llm_pending
+    with _llm_state_lock:
+        _llm_pending += 1
+    
+    def _done(_future):
+        global _llm_pending
+        with _llm_state_lock:
+            _llm_pending -= 1
+    
+    future = get_llm_executor().submit(fn, *args, **kwargs)
+    future.add_done_callback(_done)
+    return future
+
+
+def llm_stats() -> Dict[str, Any]:
+    """Limiter and client state, queued or running executor tasks, and response, token and fallback totals"""
+    stats = get_llm_limiter().stats()
+    with _llm_state_lock:
+        stats['executor_pending'] = _llm_pending
+    stats['client'] = get_gemini_client().stats()
+    stats['circuit'] = get_circuit_breaker().stats()
+    responses = {outcome: 0 for outcome in RESPONSE_OUTCOMES}
+    for labels, count in _llm_responses.samples():
+        responses[labels['outcome']] += count
+    tokens = {}
+    for labels, count in _llm_calls.samples():
+        if labels['outcome'] == 'success':
+            tokens[labels['method']] = {'calls': count, **{field: 0 for field in USAGE_FIELDS}}
+    for labels, count in _llm_tokens.samples():
+        tokens.setdefault(labels['method'], {'calls': 0, **{field: 0 for field in USAGE_FIELDS}})
+        tokens[labels['method']][f"{labels['type']}_tokens"] += count
+    fallbacks = {}
+    for labels, count in _llm_fallbacks.samples():
+        fallbacks[labels['method']] = fallbacks.get(labels['method'], 0) + count
+    stats.update(responses=responses, tokens=tokens, fallbacks=fallbacks)
+    return stats
+
+
+MEAL_TYPES = ('breakfast', 'lunch', 'dinner')
+MEAL_NUTRIENTS = ('calories', 'protein', 'carbs', 'fat')
+
+
+def _number(value, field):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ValueError(f"{field} must be a non-negative number, got {value!r}")
+    return value
+
+
+def _normalize_day(day: Any, index: int) -> Dict[str, Any]:
+    """Check one day of a multi-day plan and reduce it to the fields that are persisted"""
+    if not isinstance(day, dict):
+        raise ValueError(f"day {index} is not an object")
+    meal_plan = day.get('meal_plan')
+    if not isinstance(meal_plan, dict):
+        raise ValueError(f"day {index} has no meal_plan")
+    meals = {}
+    for meal_type in MEAL_TYPES:
+        meal = meal_plan.get(meal_type)
+        if not isinstance(meal, dict) or not str(meal.get('name') or '').strip():
+            raise ValueError(f"day {index} {meal_type} is missing or unnamed")
+        meals[meal_type] = {'name': str(meal['name']).strip()}
+        for nutrient in MEAL_NUTRIENTS:
+            meals[meal_type][nutrient] = _number(meal.get(nutrient), f"day {index} {meal_type} {nutrient}")
+
+    workout = day.get('workout')
+    if not isinstance(workout, dict) or not isinstance(workout.get('exercises'), list) or not workout['exercises']:
+        raise ValueError(f"day {index} has no workout exercises")
+    exercises = []
+    for exercise in workout['exercises']:
+        if not isinstance(exercise, dict) or not str(exercise.get('name') or '').strip():
+            raise ValueError(f"day {index} has an unnamed exercise")
+        exercises.append({
+            **exercise,
+            'name': str(exercise['name']).strip(),
+            'sets': int(exercise['sets']) if isinstance(exercise.get('sets'), (int, float)) else None,
+            'duration': int(exercise['duration']) if isinstance(exercise.get('duration'), (int, float)) else None,
+            'calories': exercise.get('calories') if isinstance(exercise.get('calories'), (int, float)) else None
+        })
+    return {
+        'day': index,
+        'meal_plan': meals,
+        'workout': {
+            'name': str(workout.get('name') or f'Day {index} Workout'),
+            'duration': workout.get('duration', 30),
+            'difficulty': workout.get('difficulty', 'beginner'),
+            'exercises': exercises,
+            'estimated_calories': workout.get('estimated_calories', 200),
+            'description': workout.get('description', ''),
+            'equipment_needed': workout.get('equipment_needed', []),
+            'tips': workout.get('tips', '')
+        }
+    }
+
+
+def validate_weekly_plan(plan: Any, days: int) -> Dict[str, Any]:
+    """
+    Validate a multi-day plan response and normalize every day
+    Raises ValueError describing the first problem found
+    """
+    if not isinstance(plan, dict) or not isinstance(plan.get('days'), list):
+        raise ValueError("plan has no days list")
+    if len(plan['days']) != days:
+        raise ValueError(f"expected {days} days, got {len(plan['days'])}")
+    target_calories = _number(plan.get('target_calories'), 'target_calories')
+    macros = plan.get('macros') if isinstance(plan.get('macros'), dict) else {}
+    return {
+        'target_calories': target_calories,
+        'macros': {nutrient: macros.get(nutrient, 0) for nutrient in ('protein', 'carbs', 'fat')},
+        'recommendations': plan.get('recommendations', ''),
+        'days': [_normalize_day(day, index) for index, day in enumerate(plan['days'], start=1)]
+    }
+
+
+class GeminiRecommendationService:
+    """
+    Service class for generating recommendations using Gemini 2.5 Flash
+    Replaces the traditional ML models with AI-powered recommendations
+    """
+    
+    def __init__(self, config=None, limiter: Optional[LLMConcurrencyLimiter] = None,
+                 plan_cache: Optional[PlanCache] = None, client: Optional[GeminiClientRegistry] = None,
+                 single_flight: Optional[SingleFlight] = None, breaker: Optional[CircuitBreaker] = None,
+                 rate_limiter: Optional[LLMRateLimiter] = None):
+        self.config = config or get_config()
+        self.limiter = limiter or get_llm_limiter(self.config)
+        # Optional budget on calls per second; rate_limited() sets one for the calling thread only
+        self.rate_limiter = rate_limiter
+        self._local = threading.local()
+        self.breaker = breaker or get_circuit_breaker(self.config)
+        self.plan_cache = plan_cache if plan_cache is not None else get_plan_cache(self.config)
+        self.single_flight = single_flight
+        if single_flight is None and self.plan_cache is not None and self.config.PLAN_SINGLE_FLIGHT_ENABLED:
+            # The lock table shares the persistent plan cache file, so workers on one host coalesce too
+            self.single_flight = SingleFlight(
+                lock_path=self.plan_cache.db_path,
+                lease_seconds=self.config.PLAN_LOCK_LEASE,
+                poll_interval=self.config.PLAN_LOCK_POLL_INTERVAL
+            )
+        self.client = client or get_gemini_client()
+        self.model = self.client.model(self.config.GEMINI_MODEL)
+    
+    @contextmanager
+    def rate_limited(self, rate_limiter: LLMRateLimiter):
+        """
+        Spend rate_limiter's budget on the calls this thread makes inside the block,
+        e.g. for the offline plan scheduler, without throttling other callers of the shared service
+        """
+        previous = getattr(self._local, 'rate_limiter', None)
+        self._local.rate_limiter = rate_limiter
+        try:
+            yield
+        finally:
+            self._local.rate_limiter = previous
+    
+    def _rate_limiter(self) -> Optional[LLMRateLimiter]:
+        return getattr(self._local, 'rate_limiter', None) or self.rate_limiter
+    
+    @property
+    def structured_output(self) -> bool:
+        return bool(self.config.LLM_STRUCTURED_OUTPUT)
+    
+    @property
+    def template_version(self) -> str:
+        """Prompt version plus output mode; structured and free-text calls produce different plans"""
+        return f"{PROMPT_TEMPLATE_VERSION}+{'structured' if self.structured_output else 'text'}"
+    
+    def format_instructions(self, schema) -> str:
+        """Describe the JSON format in the prompt, unless the schema is sent as structured output"""
+        if self.structured_output:
+            return ''
+        return f"Format the response as a JSON object with this structure:\n{schema_example(schema)}"
+    
+    def _generation_config(self, schema) -> Optional[Dict[str, Any]]:
+        if schema is None or not self.structured_output:
+            return None
+        return {'response_mime_type': 'application/json', 'response_schema': _compiled_schema(schema)}
+    
+    def _call_timeout(self, kind: str) -> Optional[float]:
+        timeout = self.config.LLM_WEEKLY_CALL_TIMEOUT if kind == 'weekly' else self.config.LLM_CALL_TIMEOUT
+        return timeout if timeout > 0 else None
+    
+    def _hedge_delay(self, kind: str) -> Optional[float]:
+        """p95 latency of this kind of call, once enough calls have been observed"""
+        if not self.config.LLM_HEDGE_ENABLED:
+            return None
+        histogram = _llm_latency.labels(method=kind)
+        if histogram.snapshot()['count'] < self.config.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return histogram.percentile(95)
+    
+    def _generate_content(self, prompt: str, schema=None, kind: str = 'other', stream: bool = False):
+        """
+        Call the model while holding a process-wide concurrency slot, after waiting
+        for the rate limiter when one is set
+        With a schema and LLM_STRUCTURED_OUTPUT, the model is constrained to JSON matching it.
+        Calls fail fast with CircuitOpenError while the circuit breaker is open and raise
+        DeadlineExceeded past their deadline; with LLM_HEDGE_ENABLED a call slower than
+        the p95 for its kind is hedged with a second attempt, which needs its own slot and
+        rate token and is skipped when either is not free at once.
+        Streaming calls return a generator of chunks that holds the slot until it is exhausted
+        """
+        kwargs = {}
+        generation_config = self._generation_config(schema)
+        if generation_config:
+            kwargs['generation_config'] = generation_config
+        timeout = self._call_timeout(kind)
+        if timeout and isinstance(self.model, genai.GenerativeModel):
+            # Let the SDK abort the request too, so an abandoned attempt frees its thread
+            kwargs['request_options'] = {'timeout': timeout}
+        if stream:
+            return self._stream_content(prompt, kind, kwargs)
+        rate_limiter = self._rate_limiter()
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        self.breaker.before_call()
+        hedge_after = self._hedge_delay(kind)
+        with self.limiter.slot():
+            start = time.perf_counter()
+            try:
+                if timeout is None and hedge_after is None:
+                    response = self.model.generate_content(prompt, **kwargs)
+                else:
+                    def call():
+                        return self.model.generate_content(prompt, **kwargs)
+                    response, attempts = call_with_deadline(
+                        call, get_llm_call_executor(self.config), timeout, hedge_after,
+                        hedge=lambda: self._hedge_attempt(kind, call)
+                    )
+                    if attempts > 1:
+                        _llm_hedges.inc(method=kind)
+            except Exception as e:
+                self.breaker.record_failure()
+                self._record_call(kind, 'timeout' if isinstance(e, DeadlineExceeded) else 'error',
+                                  time.perf_counter() - start)
+                raise
+        self.breaker.record_success()
+        self._record_call(kind, 'success', time.perf_counter() - start, getattr(response, 'usage_metadata', None))
+        return response
+    
+    def _hedge_attempt(self, kind: str, call):
+        """
+        Reserve a concurrency slot and a rate token for a hedged attempt without waiting
+        Returns the attempt, which frees its slot when it finishes, or None to skip the hedge
+        """
+        if not self.limiter.try_acquire():
+            _llm_hedges_skipped.inc(method=kind)
+            return None
+        rate_limiter = self._rate_limiter()
+        if rate_limiter is not None and not rate_limiter.try_acquire():
+            self.limiter.release()
+            _llm_hedges_skipped.inc(method=kind)
+            return None
+
+        def attempt():
+            try:
+                return call()
+            finally:
+                self.limiter.release()
+        return attempt
+    
+    def _stream_content(self, prompt: str, kind: str, kwargs: Dict[str, Any]):
+        usage = None
+        outcome = 'error'
+        rate_limiter = self._rate_limiter()
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        self.breaker.before_call()
+        with self.limiter.slot():
+            start = time.perf_counter()
+            first_chunk = True
+            try:
+                for chunk in self.model.generate_content(prompt, stream=True, **kwargs):
+                    if first_chunk:
+                        _llm_first_chunk.observe(time.perf_counter() - start, method=kind)
+                        first_chunk = False
+                    # Token counts arrive with the chunks; the last one holds the totals
+                    usage = getattr(chunk, 'usage_metadata', None) or usage
+                    yield chunk
+                outcome = 'success'
+            except GeneratorExit:
+                # The consumer stopped reading, e.g. the client disconnected
+                outcome = 'cancelled'
+                raise
+            finally:
+                if outcome == 'success':
+                    self.breaker.record_success()
+                elif outcome == 'error':
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.release()
+                self._record_call(kind, outcome, time.perf_counter() - start, usage)
+    
+    def _record_call(self, kind: str, outcome: str, seconds: float, usage_metadata=None):
+        """Update the call, latency, token and cost metrics and log one structured line"""
+        _llm_calls.inc(method=kind, outcome=outcome)
+        _llm_latency.observe(seconds, method=kind)
+        tokens = {field: int(getattr(usage_metadata, attribute, 0) or 0) for field, attribute in USAGE_FIELDS.items()}
+        for field, count in tokens.items():
+            if count:
+                _llm_tokens.inc(count, method=kind, type=field[:-len('_tokens')])
+        # Thinking tokens are billed as output but only appear in the total
+        billed_output = max(tokens['total_tokens'] - tokens['prompt_tokens'], tokens['output_tokens'])
+        cost = (tokens['prompt_tokens'] * self.config.LLM_PROMPT_COST_PER_MTOK
+                + billed_output * self.config.LLM_OUTPUT_COST_PER_MTOK) / 1_000_000
+        if cost:
+            _llm_cost.inc(cost, method=kind)
+        log_event('llm_call', method=kind, outcome=outcome, duration_ms=round(seconds * 1000, 1),
+                  cost_usd=round(cost, 6), **tokens)
+    
+    def _cached_plan(self, kind: str, user_data: Dict[str, Any]):
+        """Look up a previously generated plan; returns (cache_key, plan or None)"""
+        if self.plan_cache is None:
+            return None, None
+        try:
+            cache_key = profile_fingerprint(kind, user_data, self.template_version)
+        except (TypeError, ValueError, KeyError):
+            return None, None
+        plan = self.plan_cache.get(cache_key)
+        _plan_cache_lookups.inc(method=kind, result='miss' if plan is None else 'hit')
+        return cache_key, plan
+    
+    def _coalesced(self, cache_key: Optional[str], generate, *args):
+        """
+        Run generate(*args, cache_key) once for concurrent requests with the same plan
+        fingerprint; followers in other processes pick the plan up from the cache
+        """
+        if cache_key is None or self.single_flight is None:
+            return generate(*args, cache_key)
+        return self.single_flight.do(
+            cache_key, lambda: generate(*args, cache_key), lookup=lambda: self.plan_cache.get(cache_key)
+        )
+    
+    def _store_plan(self, kind: str, cache_key: Optional[str], plan: Dict[str, Any]):
+        if cache_key is not None:
+            self.plan_cache.set(cache_key, kind, plan)
+    
+    def generate_diet_plan_async(self, user_data: Dict[str, Any]) -> Future:
+        """Generate a diet plan on the LLM executor"""
+        return submit_llm_task(self.generate_diet_plan, user_data)
+    
+    def generate_workout_plan_async(self, user_data: Dict[str, Any]) -> Future:
+        """Generate a workout plan on the LLM executor"""
+        return submit_llm_task(self.generate_workout_plan, user_data)
+    
+    def predict_calories_burned_async(self, user_data: Dict[str, Any], workout_data: Dict[str, Any]) -> Future:
+        """Predict calories burned on the LLM executor"""
+        return submit_llm_task(self.predict_calories_burned, user_data, workout_data)
+    
+    def generate_diet_plan(self, user_data: Dict[str, Any], fallback: bool = True) -> Dict[str, Any]:
+        """
+        Generate personalized diet plan using Gemini
+        Without fallback, errors are raised instead of returning the rule-based plan
+        """
+        cache_key, cached = self._cached_plan('diet', user_data)
+        if cached is not None:
+            logger.info("✅ Diet plan served from plan cache")
+            return cached
+        if not self.model:
+            if not fallback:
+                raise RuntimeError("Gemini is not configured; set GEMINI_API_KEY")
+            _count_fallback('diet', 'no_model')
+            return self._fallback_diet_plan(user_data)
+        
+        try:
+            # Concurrent duplicates share the outcome, so each caller decides on its own fallback
+            return self._coalesced(cache_key, self._generate_diet_plan, user_data)
+        except Exception as e:
+            if not fallback:
+                raise
+            logger.error(f"Error generating diet plan with Gemini: {e}")
+            _count_fallback('diet', _fallback_reason(e))
+            return self._fallback_diet_plan(user_data)
+    
+    def _generate_diet_plan(self, user_data: Dict[str, Any], cache_key: Optional[str]) -> Dict[str, Any]:
+        response = self._generate_content(self._diet_prompt(user_data), DietPlan, kind='diet')
+        
+        # Parse the response
+        diet_plan = self._parse_gemini_response(response.text, DietPlan, kind='diet')
+        if 'meal_plan' not in diet_plan:
+            raise ValueError("Gemini returned no usable diet plan")
+        self._store_plan('diet', cache_key, diet_plan)
+        
+        logger.info("✅ Diet plan generated successfully using Gemini")
+        return diet_plan
+    
+    def generate_library_diet_plan(self, profile: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Diet plan for the representative profile of a user segment (see backend/plan_library.py)
+        Raises instead of falling back, so a failed segment is left out of the library
+        """
+        if not self.model:
+            raise RuntimeError("Gemini is not configured; set GEMINI_API_KEY")
+        response = self._generate_content(self._diet_prompt(profile), DietPlan, kind='library')
+        diet_plan = self._parse_gemini_response(response.text, DietPlan, kind='library')
+        if 'meal_plan' not in diet_plan:
+            raise ValueError("Gemini returned no usable diet plan")
+        return diet_plan
+    
+    def _diet_prompt(self, user_data: Dict[str, Any]) -> str:
+        # Calculate basic metrics
+        bmi = user_data['weight'] / ((user_data['height'] / 100) ** 2)
+        
+        # Create detailed prompt for Gemini
+        return f"""
+            You are a professional nutritionist and dietitian. Generate a personalized diet plan based on the following user profile:
+
+            User Profile:
+            - Age: {user_data['age']} years
+            - Gender: {user_data['gender']}
+            - Height: {user_data['height']} cm
+            - Weight: {user_data['weight']} kg
+            - BMI: {bmi:.1f}
+            - Goal: {user_data['goal']}
+            - Diet Preference: {user_data['diet_preference']}
+            - Activity Level: {user_data['activity_level']}
+
+            Please generate a comprehensive diet plan that includes:
+            1. Daily calorie target
+            2. Macro distribution (protein, carbs, fat)
+            3. Three main meals (breakfast, lunch, dinner) with specific food items
+            4. Each food item should include calories, protein, carbs, and fat content
+            5. Meal timing recommendations
+            6. Hydration goals
+
+            {self.format_instructions(DietPlan)}
+
+            Make sure the total calories match the target and the macros are appropriate for the user's goal.
+            """
+    
+    def generate_workout_plan(self, user_data: Dict[str, Any], fallback: bool = True) -> Dict[str, Any]:
+        """
+        Generate personalized workout plan using Gemini
+        Without fallback, errors are raised instead of returning the rule-based plan
+        """
+        cache_key, cached = self._cached_plan('workout', user_data)
+        if cached is not None:
+            logger.info("✅ Workout plan served from plan cache")
+            return cached
+        if not self.model:
+            if not fallback:
+                raise RuntimeError("Gemini is not configured; set GEMINI_API_KEY")
+            _count_fallback('workout', 'no_model')
+            return self._fallback_workout_plan(user_data)
+        
+        try:
+            return self._coalesced(cache_key, self._generate_workout_plan, user_data)
+        except Exception as e:
+            if not fallback:
+                raise
+            logger.error(f"Error generating workout plan with Gemini: {e}")
+            _count_fallback('workout', _fallback_reason(e))
+            return self._fallback_workout_plan(user_data)
+    
+    def _generate_workout_plan(self, user_data: Dict[str, Any], cache_key: Optional[str]) -> Dict[str, Any]:
+        response = self._generate_content(self._workout_prompt(user_data), WorkoutPlan, kind='workout')
+        
+        # Parse the response
+        workout_plan = self._parse_gemini_response(response.text, WorkoutPlan, kind='workout')
+        if 'exercises' not in workout_plan:
+            raise ValueError("Gemini returned no usable workout plan")
+        self._store_plan('workout', cache_key, workout_plan)
+        
+        logger.info("✅ Workout plan generated successfully using Gemini")
+        return workout_plan
+    
+    def _workout_prompt(self, user_data: Dict[str, Any]) -> str:
+        return f"""
+            You are a certified personal trainer and fitness expert. Generate a personalized workout plan based on the following user profile:
+
+            User Profile:
+            - Age: {user_data['age']} years
+            - Gender: {user_data['gender']}
+            - Height: {user_data['height']} cm
+            - Weight: {user_data['weight']} kg
+            - Goal: {user_data['goal']}
+            - Activity Level: {user_data['activity_level']}
+            - Available Time: {user_data['workout_time']} minutes per day
+
+            Please generate a comprehensive workout plan that includes:
+            1. Workout name and description
+            2. List of exercises with sets, reps, and duration
+            3. Estimated calories burned
+            4. Difficulty level appropriate for the user
+            5. Equipment needed (prefer bodyweight exercises)
+            6. Rest periods between exercises
+            7. Progression tips
+
+            {self.format_instructions(WorkoutPlan)}
+
+            Make sure the workout is appropriate for the user's fitness level and time constraints.
+            """
+    
+    def generate_weekly_plan(self, user_data: Dict[str, Any], days: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Generate meals and workouts for several consecutive days in a single Gemini call
+        Returns target_calories, macros, recommendations and a 'days' list whose entries
+        hold a 'meal_plan' and a 'workout' in the same shape as the daily plans
+        """
+        days = days or self.config.WEEKLY_PLAN_DAYS
+        cache_data = {**user_data, 'plan_days': days}
+        cache_key, cached = self._cached_plan('weekly', cache_data)
+        if cached is not None:
+            logger.info("✅ Weekly plan served from plan cache")
+            return cached
+        return self._coalesced(cache_key, self._generate_weekly_plan, user_data, days)
+    
+    def _generate_weekly_plan(self, user_data: Dict[str, Any], days: int, cache_key: Optional[str]) -> Dict[str, Any]:
+        if not self.model:
+            _count_fallback('weekly', 'no_model')
+            return self._fallback_weekly_plan(user_data, days)
+        
+        try:
+            bmi = user_data['weight'] / ((user_data['height'] / 100) ** 2)
+            
+            prompt = f"""
+            You are a professional nutritionist and certified personal trainer. Generate a {days}-day meal and workout plan based on the following user profile:
+
+            User Profile:
+            - Age: {user_data['age']} years
+            - Gender: {user_data['gender']}
+            - Height: {user_data['height']} cm
+            - Weight: {user_data['weight']} kg
+            - BMI: {bmi:.1f}
+            - Goal: {user_data['goal']}
+            - Diet Preference: {user_data['diet_preference']}
+            - Activity Level: {user_data['activity_level']}
+            - Available Time: {user_data['workout_time']} minutes per day
+
+            Requirements:
+            1. One daily calorie target and macro distribution for the whole plan
+            2. Exactly {days} days, each with breakfast, lunch and dinner and one workout
+            3. Vary the meals and the muscle groups trained from day to day
+            4. Each meal should include calories, protein, carbs, and fat content
+            5. Prefer bodyweight exercises that fit in the available time
+
+            {self.format_instructions(WeeklyPlan)}
+
+            The days list must contain exactly {days} entries, in order. Make sure each day's meals add up to the target.
+            """
+            
+            response = self._generate_content(prompt, WeeklyPlan, kind='weekly')
+            weekly_plan = validate_weekly_plan(self._parse_gemini_response(response.text, WeeklyPlan, kind='weekly'), days)
+            self._store_plan('weekly', cache_key, weekly_plan)
+            
+            logger.info(f"✅ {days}-day plan generated successfully using Gemini")
+            return weekly_plan
+            
+        except Exception as e:
+            logger.error(f"Error generating {days}-day plan with Gemini: {e}")
+            _count_fallback('weekly', _fallback_reason(e))
+            return self._fallback_weekly_plan(user_data, days)
+    
+    def generate_workout_plan_from_prompt(self, prompt: str) -> str:
+        """
+        Generate workout plan from a custom prompt string
+        Returns JSON string response
+        """
+        if not self.model:
+            _count_fallback('custom_workout', 'no_model')
+            return self._fallback_workout_plan_string()
+        
+        try:
+            response = self._generate_content(prompt, CustomWorkout, kind='custom_workout')
+            workout_plan = self._parse_gemini_response(response.text, CustomWorkout, kind='custom_workout')
+            if not workout_plan:
+                _count_fallback('custom_workout', 'unusable')
+                return self._fallback_workout_plan_string()
+            
+            logger.info("✅ Custom workout plan generated successfully using Gemini")
+            return json.dumps(workout_plan)
+            
+        except Exception as e:
+            logger.error(f"Error generating custom workout plan with Gemini: {e}")
+            _count_fallback('custom_workout', _fallback_reason(e))
+            return self._fallback_workout_plan_string()
+    
+    def stream_workout_plan_from_prompt(self, prompt: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Stream a workout plan generated from a custom prompt
+        Yields ('exercise', exercise) as each exercise object completes, then ('plan', plan)
+        with the full plan, repaired and conformed to the CustomWorkout schema
+        """
+        parser = JsonArrayStreamParser('exercises')
+        fallback_reason = 'no_model'
+        if self.model:
+            fallback_reason = 'unusable'
+            try:
+                for chunk in self._generate_content(prompt, CustomWorkout, kind='custom_workout', stream=True):
+                    for exercise in parser.feed(chunk.text):
+                        yield 'exercise', exercise
+            except Exception as e:
+                fallback_reason = _fallback_reason(e)
+                logger.error(f"Error streaming custom workout plan with Gemini: {e}")
+        
+        plan = self._parse_gemini_response(parser.text, CustomWorkout, kind='custom_workout') if parser.text else {}
+        if not plan and parser.items:
+            # Keep the exercises that did arrive even if the rest is unusable
+            plan = {'workout_name': 'Custom Workout', 'exercises': parser.items}
+        elif not plan:
+            _count_fallback('custom_workout', fallback_reason)
+            plan = json.loads(self._fallback_workout_plan_string())
+            for exercise in plan['exercises']:
+                yield 'exercise', exercise
+        logger.info(f"✅ Custom workout plan streamed with {len(plan['exercises'])} exercises")
+        yield 'plan', plan
+    
+    def _fallback_workout_plan_string(self) -> str:
+        """Fallback workout plan as JSON string"""
+        fallback_plan = {
+            "workout_name": "Basic Full Body Workout",
+            "exercises": [
+                {
+                    "name": "Push-ups",
+                    "sets": 3,
+                    "reps": "10-12",
+                    "duration": 5,
+                    "calories": 50,
+                    "instructions": "Start in plank position, lower chest to ground, push back up",
+                    "muscle_groups": ["Chest", "Triceps", "Shoulders"]
+                },
+                {
+                    "name": "Squats",
+                    "sets": 3,
+                    "reps": "15-20",
+                    "duration": 5,
+                    "calories": 60,
+                    "instructions": "Feet shoulder-width apart, lower hips back and down, return to standing",
+                    "muscle_groups": ["Legs", "Glutes"]
+                },
+                {
+                    "name": "Plank",
+                    "sets": 3,
+                    "reps": "30-60 seconds",
+                    "duration": 3,
+                    "calories": 30,
+                    "instructions": "Hold body straight from head to heels, engage core muscles",
+                    "muscle_groups": ["Core"]
+                }
+            ],
+            "total_duration": 30,
+            "total_calories": 140
+        }
+        return json.dumps(fallback_plan)
+    
+    def predict_calories_burned(self, user_data: Dict[str, Any], workout_data: Dict[str, Any]) -> int:
+        """
+        Predict calories burned for a specific workout using Gemini
+        """
+        return self.explain_calories_burned(user_data, workout_data).get('calories_burned', 100)
+    
+    def explain_calories_burned(self, user_data: Dict[str, Any], workout_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Ask Gemini for a calorie estimate together with an explanation of how it was derived
+        """
+        if not self.model:
+            _count_fallback('calories', 'no_model')
+            return self._fallback_calorie_explanation(user_data, workout_data)
+        
+        try:
+            prompt = f"""
+            You are a fitness expert with expertise in calorie burn calculations. Calculate the estimated calories burned for this workout:
+
+            User Profile:
+            - Age: {user_data['age']} years
+            - Gender: {user_data['gender']}
+            - Weight: {user_data['weight']} kg
+
+            Workout Details:
+            - Type: {workout_data['type']}
+            - Intensity: {workout_data['intensity']}
+            - Duration: {workout_data['duration']} minutes
+
+            Please provide:
+            1. Estimated calories burned (as a single number)
+            2. Brief explanation of the calculation method
+            3. Factors that influenced the calculation
+
+            {self.format_instructions(CalorieExplanation)}
+
+            Use standard MET (Metabolic Equivalent of Task) values and consider the user's weight, age, and gender.
+            """
+            
+            response = self._generate_content(prompt, CalorieExplanation, kind='calories')
+            
+            # Parse the response
+            result = self._parse_gemini_response(response.text, CalorieExplanation, kind='calories')
+            
+            logger.info("✅ Calorie prediction generated successfully using Gemini")
+            if 'calories_burned' not in result:
+                _count_fallback('calories', 'unusable')
+                return self._fallback_calorie_explanation(user_data, workout_data)
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error predicting calories with Gemini: {e}")
+            _count_fallback('calories', _fallback_reason(e))
+            return self._fallback_calorie_explanation(user_data, workout_data)
+    
+    def _parse_gemini_response(self, response_text: str, schema=None, kind: str = 'other') -> Dict[str, Any]:
+        """
+        Parse Gemini response and extract JSON, conformed to a plan schema when given
+        Returns {} when nothing usable could be recovered
+        """
+        try:
+            result, repairs = parse_llm_json(response_text, schema)
+        except ValueError as e:
+            _count_response(kind, 'failed')
+            logger.error(f"Failed to parse JSON from Gemini response: {e}")
+            return {}
+        if repairs:
+            _count_response(kind, 'repaired', len(repairs))
+            logger.warning(f"🔧 Repaired Gemini response: {'; '.join(repairs)}")
+        else:
+            _count_response(kind, 'clean')
+        return result
+    
+    def _fallback_diet_plan(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Fallback diet plan when Gemini is not available"""
+        logger.warning("Using fallback diet plan")
+        
+        # Calculate basic calories
+        if user_data['gender'] == 'male':
+            bmr = 10 * user_data['weight'] + 6.25 * user_data['height'] - 5 * user_data['age'] + 5
+        else:
+            bmr = 10 * user_data['weight'] + 6.25 * user_data['height'] - 5 * user_data['age'] - 161
+        
+        activity_multipliers = {
+            'sedentary': 1.2,
+            'light': 1.375,
+            'moderate': 1.55,
+            'intense': 1.725
+        }
+        
+        daily_calories = bmr * activity_multipliers.get(user_data['activity_level'], 1.55)
+        
+        goal_adjustments = {
+            'weight-loss': 0.8,
+            'maintenance': 1.0,
+            'muscle-gain': 1.2
+        }
+        
+        target_calories = int(daily_calories * goal_adjustments.get(user_data['goal'], 1.0))
+        
+        return {
+            "target_calories": target_calories,
+            "macros": {
+                "protein": int(target_calories * 0.25 / 4),
+                "carbs": int(target_calories * 0.45 / 4),
+                "fat": int(target_calories * 0.30 / 9)
+            },
+            "meal_plan": {
+                "breakfast": {
+                    "name": "Balanced Breakfast",
+                    "calories": int(target_calories * 0.25),
+                    "protein": int(target_calories * 0.25 * 0.25 / 4),
+                    "carbs": int(target_calories * 0.25 * 0.45 / 4),
+                    "fat": int(target_calories * 0.25 * 0.30 / 9),
+                    "time": "8:00 AM"
+                },
+                "lunch": {
+                    "name": "Nutritious Lunch",
+                    "calories": int(target_calories * 0.35),
+                    "protein": int(target_calories * 0.35 * 0.25 / 4),
+                    "carbs": int(target_calories * 0.35 * 0.45 / 4),
+                    "fat": int(target_calories * 0.35 * 0.30 / 9),
+                    "time": "1:00 PM"
+                },
+                "dinner": {
+                    "name": "Light Dinner",
+                    "calories": int(target_calories * 0.40),
+                    "protein": int(target_calories * 0.40 * 0.25 / 4),
+                    "carbs": int(target_calories * 0.40 * 0.45 / 4),
+                    "fat": int(target_calories * 0.40 * 0.30 / 9),
+                    "time": "7:00 PM"
+                }
+            },
+            "recommendations": "Please consult with a nutritionist for personalized advice."
+        }
+    
+    def _fallback_workout_plan(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Fallback workout plan when Gemini is not available"""
+        logger.warning("Using fallback workout plan")
+        
+        return {
+            "name": "Basic Full Body Workout",
+            "description": "A balanced workout for all fitness levels",
+            "duration": 30,
+            "difficulty": "beginner",
+            "estimated_calories": 200,
+            "exercises": [
+                {
+                    "name": "Push-ups",
+                    "sets": 3,
+                    "reps": "10-15",
+                    "duration": 5,
+                    "calories": 50,
+                    "instructions": "Keep your body straight, lower chest to ground, push back up",
+                    "muscle_groups": ["chest", "triceps"]
+                },
+                {
+                    "name": "Squats",
+                    "sets": 3,
+                    "reps": "15-20",
+                    "duration": 5,
+                    "calories": 60,
+                    "instructions": "Feet shoulder-width apart, lower hips back and down",
+                    "muscle_groups": ["legs", "glutes"]
+                },
+                {
+                    "name": "Plank",
+                    "sets": 3,
+                    "reps": "30 seconds",
+                    "duration": 3,
+                    "calories": 30,
+                    "instructions": "Hold body straight from head to heels",
+                    "muscle_groups": ["core"]
+                }
+            ],
+            "equipment_needed": ["none"],
+            "tips": "Focus on proper form over speed"
+        }
+    
+    def _fallback_weekly_plan(self, user_data: Dict[str, Any], days: int) -> Dict[str, Any]:
+        """Fallback multi-day plan repeating the fallback diet and workout"""
+        diet_plan = self._fallback_diet_plan(user_data)
+        workout_plan = self._fallback_workout_plan(user_data)
+        return validate_weekly_plan({
+            **diet_plan,
+            'days': [{'meal_plan': diet_plan['meal_plan'], 'workout': workout_plan}] * days
+        }, days)
+    
+    def _fallback_calorie_prediction(self, user_data: Dict[str, Any], workout_data: Dict[str, Any]) -> int:
+        """Fallback calorie prediction when Gemini is not available"""
+        logger.warning("Using fallback calorie prediction")
+        return get_calorie_engine().predict(user_data, workout_data)
+    
+    def _fallback_calorie_explanation(self, user_data: Dict[str, Any], workout_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Fallback calorie explanation based on the standard MET formula"""
+        engine = get_calorie_engine()
+        met = engine.met_lookup.get((workout_data['type'], workout_data['intensity']), engine.default_met)
+        return {
+            "calories_burned": self._fallback_calorie_prediction(user_data, workout_data),
+            "explanation": f"MET {met} × {user_data['weight']} kg × {workout_data['duration']} min / 60, adjusted for gender",
+            "factors": ["workout type", "intensity", "duration", "body weight", "gender"]
+        }
@@ -0,0 +1,263 @@
+"""
+Background job queue backed by the PostgreSQL jobs table
+Web requests enqueue work and return a job id; worker threads in any process
+claim queued jobs with FOR UPDATE SKIP LOCKED, so web and generation workers
+can be sized independently
+"""
+
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from psycopg2.extras import Json
+
+from backend.config import get_config
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+
+CLAIM_JOB_SQL = '''
+    UPDATE jobs SET status = 'running', attempts = attempts + 1,
+        started_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+    WHERE id = (
+        SELECT id FROM jobs WHERE status = 'queued'
+        ORDER BY created_at LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, user_id, kind, payload, attempts
+'''
+
+# Running jobs whose worker stopped heartbeating are retried, or failed after max attempts
+REQUEUE_STALE_SQL = '''
+    UPDATE jobs SET
+        status = CASE WHEN attempts >= %(max_attempts)s THEN 'failed' ELSE 'queued' END,
+        error = CASE WHEN attempts >= %(max_attempts)s THEN 'Worker stopped responding' ELSE error END,
+        finished_at = CASE WHEN attempts >= %(max_attempts)s THEN CURRENT_TIMESTAMP END,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE status = 'running' AND updated_at < CURRENT_TIMESTAMP - make_interval(secs => %(stale_after)s)
+'''
+
+# Results are only recorded by the worker holding the job's current attempt; a worker whose
+# job was requeued as stale and claimed again must not overwrite the newer attempt
+FINISH_JOB_SQL = '''
+    UPDATE jobs SET status = %(status)s, result = %(result)s, error = %(error)s,
+        finished_at = CASE WHEN %(status)s = 'queued' THEN NULL ELSE CURRENT_TIMESTAMP END,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = %(id)s AND status = 'running' AND attempts = %(attempt)s
+'''
+
+HEARTBEAT_SQL = '''
+    UPDATE jobs SET updated_at = CURRENT_TIMESTAMP
+    WHERE id = %s AND status = 'running' AND attempts = %s
+'''
+
+JOB_COLUMNS = (
+    'id', 'user_id', 'kind', 'status', 'result', 'error', 'progress', 'attempts',
+    'created_at', 'started_at', 'finished_at'
+)
+
+
+class PermanentJobError(RuntimeError):
+    """Raised by a handler for a failure that retrying cannot fix; the job fails at once"""
+
+
+class JobQueue:
+    """
+    Runs registered handlers for queued jobs on a pool of worker threads
+    A handler is called as handler(payload, job) where job holds the id, user_id,
+    kind and attempt number plus a progress(message) callback; its return value
+    (JSON-serializable) becomes the job result. A handler that raises is requeued
+    until the job has had max_attempts attempts, unless it raises PermanentJobError
+    """
+
+    def __init__(self, db, workers=2, poll_interval=1.0, stale_after=600.0, max_attempts=3):
+        self.db = db
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self._handlers: Dict[str, Callable] = {}
+        self._threads = []
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._counters = {'enqueued': 0, 'succeeded': 0, 'failed': 0, 'retried': 0, 'superseded': 0}
+
+    @classmethod
+    def from_config(cls, db, config=None):
+        config = config or get_config()
+        return cls(
+            db,
+            workers=config.JOB_WORKERS,
+            poll_interval=config.JOB_POLL_INTERVAL,
+            stale_after=config.JOB_STALE_AFTER,
+            max_attempts=config.JOB_MAX_ATTEMPTS
+        )
+
+    def register(self, kind: str, handler: Callable):
+        self._handlers[kind] = handler
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], user_id: Optional[int] = None) -> str:
+        """Store a queued job and return its id"""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind {kind!r}")
+        job_id = uuid.uuid4().hex
+        with self.db.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    'INSERT INTO jobs (id, user_id, kind, payload) VALUES (%s, %s, %s, %s)',
+                    (job_id, user_id, kind, Json(payload))
+                )
+            conn.commit()
+        with self._lock:
+            self._counters['enqueued'] += 1
+        self._wake.set()
+        logger.info(f"📥 Queued {kind} job {job_id}")
+        return job_id
+
+    def get(self, job_id: str, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Job status and result; restricted to user_id's jobs when given"""
+        query = f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = %s"
+        params = [job_id]
+        if user_id is not None:
+            query += ' AND user_id = %s'
+            params.append(user_id)
+        with self.db.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                row = cursor.fetchone()
+        if row is None:
+            return None
+        job = dict(zip(JOB_COLUMNS, row))
+        for key in ('created_at', 'started_at', 'finished_at'):
+            if job[key] is not None:
+                job[key] = job[key].isoformat()
+        return job
+
+    def set_progress(self, job_id: str, message: str, attempt: Optional[int] = None):
+        """Record a progress message; with attempt, only while that attempt still holds the job"""
+        query = 'UPDATE jobs SET progress = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s'
+        params = [message, job_id]
+        if attempt is not None:
+            query += " AND status = 'running' AND attempts = %s"
+            params.append(attempt)
+        self._execute(query, params)
+
+    def requeue_stale(self) -> int:
+        """Give up on running jobs whose worker went away; returns the number of jobs touched"""
+        return self._execute(REQUEUE_STALE_SQL, {'max_attempts': self.max_attempts, 'stale_after': self.stale_after})
+
+    def _execute(self, query, params) -> int:
+        with self.db.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                count = cursor.rowcount
+            conn.commit()
+        return count
+
+    def _claim(self):
+        with self.db.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(CLAIM_JOB_SQL)
+                row = cursor.fetchone()
+            conn.commit()
+        if row is None:
+            return None
+        return dict(zip(('id', 'user_id', 'kind', 'payload', 'attempts'), row))
+
+    def run_next(self) -> Optional[str]:
+        """Claim and run one queued job; returns its id, or None when the queue is empty"""
+        job = self._claim()
+        if job is None:
+            return None
+        with self._lock:
+            self._active += 1
+        start = time.perf_counter()
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job['id'], job['attempts'], stop),
+                                     name=f"job-heartbeat-{job['id'][:8]}", daemon=True)
+        heartbeat.start()
+        try:
+            handler = self._handlers.get(job['kind'])
+            if handler is None:
+                raise PermanentJobError(f"No handler registered for job kind {job['kind']!r}")
+            job['progress'] = lambda message: self.set_progress(job['id'], message, job['attempts'])
+            result = handler(job['payload'], job)
+            status, error = 'succeeded', None
+        except Exception as e:
+            logger.error(f"{job['kind']} job {job['id']} attempt {job['attempts']} failed: {e}")
+            retry = not isinstance(e, PermanentJobError) and job['attempts'] < self.max_attempts
+            status, error = ('queued' if retry else 'failed'), str(e)
+        finally:
+            stop.set()
+            heartbeat.join()
+            with self._lock:
+                self._active -= 1
+
+        finished = self._execute(FINISH_JOB_SQL, {
+            'status': status, 'result': Json(result) if status == 'succeeded' else None, 'error': error,
+            'id': job['id'], 'attempt': job['attempts']
+        })
+        outcome = {'queued': 'retried'}.get(status, status) if finished else 'superseded'
+        with self._lock:
+            self._counters[outcome] += 1
+        if outcome == 'superseded':
+            logger.warning(f"⚠️ {job['kind']} job {job['id']} was requeued while attempt {job['attempts']} "
+                           f"ran; its {status} outcome is discarded")
+        else:
+            logger.info(f"{'✅' if outcome == 'succeeded' else '❌'} {job['kind']} job {job['id']} "
+                        f"{outcome} in {time.perf_counter() - start:.1f}s")
+        return job['id']
+
+    def _heartbeat(self, job_id, attempt, stop):
+        """Touch the running job every third of stale_after until stop is set"""
+        while not stop.wait(self.stale_after / 3):
+            try:
+                if self._execute(HEARTBEAT_SQL, (job_id, attempt)) == 0:
+                    logger.warning(f"⚠️ Job {job_id} attempt {attempt} no longer holds the job")
+                    return
+            except Exception as e:
+                logger.warning(f"Job heartbeat failed: {e}")
+
+    def _worker_loop(self):
+        last_sweep = 0.0
+        while not self._stopping.is_set():
+            try:
+                if time.monotonic() - last_sweep > self.stale_after / 2:
+                    last_sweep = time.monotonic()
+                    self.requeue_stale()
+                if self.run_next() is not None:
+                    continue
+            except Exception as e:
+                logger.error(f"Job worker error: {e}")
+            # Local enqueues wake a worker at once; jobs queued by other processes are polled
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def start(self):
+        """Start the worker threads (no-op with zero workers)"""
+        if self._threads or self.workers <= 0:
+            return
+        self._stopping.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f'job-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"✅ Started {self.workers} job worker(s)")
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'workers': len(self._threads), 'active': self._active, **self._counters}
@@ -0,0 +1,311 @@
+"""
+JSON extraction for LLM responses
+Finds the JSON object in a response that may be wrapped in prose or code fences,
+repairs trailing commas and truncated output, conforms it to a typed plan schema
+(see backend/plan_schemas.py) and reports every repair it made. For streamed
+responses, JsonArrayStreamParser emits the elements of a top-level array (such
+as a workout's "exercises") as soon as each object is complete
+"""
+
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.plan_schemas import is_typed_dict, schema_fields, union_types
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+_CLOSERS = {'{': '}', '[': ']'}
+_NUMBER_RE = re.compile(r'-?\d+(?:\.\d+)?')
+
+# Bounds the work spent on responses that are not JSON at all
+MAX_OBJECT_STARTS = 10
+MAX_TRUNCATION_CUTS = 200
+
+
+class SchemaError(ValueError):
+    """Raised when a response cannot be made to fit a plan schema"""
+
+
+def _scan(text: str, start: int) -> Tuple[Optional[int], List[Tuple[int, str]]]:
+    """
+    Walk the JSON value opening at text[start]
+    Returns the index of its closing bracket (None when truncated) and the
+    (position, open brackets) pairs where the text can be cut and closed
+    """
+    stack = []
+    cuts = []
+    in_string = escape = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append(char)
+            cuts.append((i + 1, ''.join(stack)))
+        elif char in '}]':
+            stack.pop()
+            if not stack:
+                return i, cuts
+            cuts.append((i + 1, ''.join(stack)))
+        elif char == ',':
+            cuts.append((i, ''.join(stack)))
+    return None, cuts
+
+
+def _strip_trailing_commas(text: str) -> str:
+    """Remove commas directly before a closing bracket, outside strings"""
+    out = []
+    in_string = escape = False
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '}]':
+            index = len(out) - 1
+            while index >= 0 and out[index].isspace():
+                index -= 1
+            if index >= 0 and out[index] == ',':
+                del out[index]
+        out.append(char)
+    return ''.join(out)
+
+
+def _loads(text: str):
+    try:
+        return json.loads(text), True
+    except json.JSONDecodeError:
+        return None, False
+
+
+def extract_json(text: str) -> Tuple[Any, List[str]]:
+    """
+    Find the first JSON object in an LLM response and return (value, repairs)
+    Raises ValueError when no object can be parsed, even after repairs
+    """
+    repairs = []
+    start = text.find('{')
+    for _ in range(MAX_OBJECT_STARTS):
+        if start == -1:
+            break
+        end, cuts = _scan(text, start)
+        candidate = text[start:] if end is None else text[start:end + 1]
+        value, ok = _loads(candidate)
+        if ok:
+            return value, repairs
+        value, ok = _loads(_strip_trailing_commas(candidate))
+        if ok:
+            repairs.append('removed trailing commas')
+            return value, repairs
+        if end is None:
+            # Truncated output: keep everything up to the last complete value and close the brackets
+            for position, stack in reversed(cuts[-MAX_TRUNCATION_CUTS:]):
+                closing = ''.join(_CLOSERS[bracket] for bracket in reversed(stack))
+                value, ok = _loads(_strip_trailing_commas(text[start:position]) + closing)
+                if ok:
+                    repairs.append(f'closed truncated JSON after {position - start} of {len(text) - start} characters')
+                    return value, repairs
+        start = text.find('{', start + 1)
+    raise ValueError('No parseable JSON object in response')
+
+
+def conform(value: Any, schema, path: str = '', repairs: Optional[List[str]] = None):
+    """
+    Check value against a TypedDict, List[...], Union[...], str, int or float schema
+    Near misses are coerced ("450 kcal" -> 450, 12 -> "12"); invalid list items and
+    optional fields are dropped. Each repair is appended to repairs; anything that
+    cannot be repaired raises SchemaError. A Union takes the first type the value
+    matches as-is, else the first one it can be repaired to
+    """
+    repairs = [] if repairs is None else repairs
+    where = path or 'response'
+
+    if union_types(schema):
+        repaired = None
+        for option in union_types(schema):
+            option_repairs = []
+            try:
+                result = conform(value, option, path, option_repairs)
+            except SchemaError:
+                continue
+            if not option_repairs:
+                return result
+            if repaired is None:
+                repaired = (result, option_repairs)
+        if repaired is None:
+            raise SchemaError(f"{where}: expected {' or '.join(t.__name__ for t in union_types(schema))}, "
+                              f"got {type(value).__name__}")
+        repairs.extend(repaired[1])
+        return repaired[0]
+
+    if getattr(schema, '__origin__', None) is list:
+        if not isinstance(value, list):
+            raise SchemaError(f"{where}: expected a list, got {type(value).__name__}")
+        item_schema = schema.__args__[0]
+        items = []
+        for index, item in enumerate(value):
+            try:
+                items.append(conform(item, item_schema, f'{path}[{index}]', repairs))
+            except SchemaError as e:
+                repairs.append(f'dropped {path}[{index}] ({e})')
+        return items
+
+    if is_typed_dict(schema):
+        if not isinstance(value, dict):
+            raise SchemaError(f"{where}: expected an object, got {type(value).__name__}")
+        result = dict(value)
+        for key, field_schema, required in schema_fields(schema):
+            field_path = f'{path}.{key}' if path else key
+            if key not in value:
+                if required:
+                    raise SchemaError(f'{field_path}: missing')
+                continue
+            try:
+                result[key] = conform(value[key], field_schema, field_path, repairs)
+            except SchemaError as e:
+                if required:
+                    raise
+                del result[key]
+                repairs.append(f'dropped {field_path} ({e})')
+        return result
+
+    if schema is str:
+        if isinstance(value, str):
+            return value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            repairs.append(f'{where}: coerced {value!r} to text')
+            return str(value)
+        raise SchemaError(f"{where}: expected text, got {type(value).__name__}")
+
+    if schema in (int, float):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise SchemaError(f"{where}: expected a number, got {type(value).__name__}")
+        number = value
+        if isinstance(value, str):
+            match = _NUMBER_RE.search(value.replace(',', ''))
+            if not match:
+                raise SchemaError(f"{where}: expected a number, got {value!r}")
+            number = float(match.group())
+            if schema is int or number.is_integer():
+                number = int(number)
+            repairs.append(f'{where}: coerced {value!r} to {number}')
+        elif schema is int and not isinstance(value, int):
+            number = int(round(value))
+            if number != value:
+                repairs.append(f'{where}: rounded {value!r} to {number}')
+        return number
+
+    return value
+
+
+def parse_llm_json(text: str, schema=None) -> Tuple[Any, List[str]]:
+    """
+    Extract the JSON object from an LLM response and, when a schema is given, conform it
+    Returns (value, repairs); raises ValueError when the response is unusable
+    """
+    value, repairs = extract_json(text)
+    if schema is not None:
+        value = conform(value, schema, '', repairs)
+    return value, repairs
+
+
+class JsonArrayStreamParser:
+    """
+    Feed response chunks in order; feed() returns the objects of the top-level
+    array named `key` that were completed by that chunk
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.text = ''
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string: Optional[str] = None
+        self._array_depth = None
+        self._array_closed = False
+        self._item_start = None
+        self.items: List[Dict[str, Any]] = []
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self.text += chunk
+        completed = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:i]
+                continue
+
+            if not self._stack and char != '{':
+                # Prose or a code fence before the JSON object starts
+                continue
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in '{[':
+                if (char == '[' and self._array_depth is None and not self._array_closed
+                        and self._stack == ['{'] and self._last_string == self.key):
+                    self._array_depth = 2
+                self._stack.append(char)
+                if char == '{' and self._array_depth is not None and len(self._stack) == self._array_depth + 1:
+                    self._item_start = i
+            elif char in '}]':
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if char == '}' and self._item_start is not None and len(self._stack) == self._array_depth:
+                    item = self._load_item(text[self._item_start:i + 1])
+                    self._item_start = None
+                    if item is not None:
+                        completed.append(item)
+                elif char == ']' and self._array_depth is not None and len(self._stack) == self._array_depth - 1:
+                    # Later arrays with the same key are ignored
+                    self._array_depth = None
+                    self._array_closed = True
+            elif char == ',':
+                self._last_string = None
+        self._pos = len(text)
+        self.items.extend(completed)
+        return completed
+
+    def _load_item(self, item_text: str) -> Optional[Dict[str, Any]]:
+        try:
+            item = json.loads(item_text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping malformed {self.key} item: {e}")
+            return None
+        return item if isinstance(item, dict) else None
+
+    def document(self) -> Optional[Dict[str, Any]]:
+        """The whole JSON object once the stream is complete, or None if it does not parse"""
+        try:
+            return extract_json(self.text)[0]
+        except ValueError:
+            return None
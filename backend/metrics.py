@@ -0,0 +1,248 @@
+"""
+Lightweight in-process metrics for the AI Diet and Workout System
+Labelled counters and histograms live in a MetricsRegistry that renders the
+Prometheus text exposition format, so no client library is needed
+"""
+
+import bisect
+import json
+import logging
+import math
+import threading
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bucket upper bounds in seconds, from 10 microseconds up to 30 seconds
+DEFAULT_LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+class LatencyHistogram:
+    """
+    Thread-safe cumulative latency histogram with fixed bucket bounds
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        """Record one duration"""
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += seconds
+
+    def percentile(self, q: float) -> float:
+        """Upper bucket bound containing the q-th percentile, capped at the largest bound"""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+        if not total:
+            return 0.0
+        target = total * q / 100
+        running = 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            if running >= target:
+                return bound
+        return self.buckets[-1]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Cumulative counts per bucket (keyed by upper bound) plus summary statistics"""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+            total_sum = self._sum
+        cumulative = []
+        running = 0
+        for bound, count in zip([repr(b) for b in self.buckets] + ['+Inf'], counts):
+            running += count
+            cumulative.append((bound, running))
+        return {
+            'count': total,
+            'sum': total_sum,
+            'mean': total_sum / total if total else 0.0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'buckets': cumulative
+        }
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+class _Metric:
+    """Base for metrics keyed by a fixed tuple of label names"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _items(self) -> List[Tuple[Dict[str, str], Any]]:
+        with self._lock:
+            items = list(self._children.items())
+        return [(dict(zip(self.labelnames, key)), child) for key, child in sorted(items)]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._children[key] = self._children.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._children.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[Dict[str, str], float]]:
+        return self._items()
+
+    def render(self) -> List[str]:
+        return [f'{self.name}{_format_labels(labels)} {_format_value(value)}' for labels, value in self._items()]
+
+
+class Histogram(_Metric):
+    """A LatencyHistogram per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def labels(self, **labels) -> LatencyHistogram:
+        key = self._key(labels)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = LatencyHistogram(self.buckets)
+            return child
+
+    def observe(self, seconds: float, **labels):
+        self.labels(**labels).observe(seconds)
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, histogram in self._items():
+            snapshot = histogram.snapshot()
+            for bound, count in snapshot['buckets']:
+                lines.append(f'{self.name}_bucket{_format_labels({**labels, "le": bound})} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(snapshot["sum"])}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {snapshot["count"]}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Named counters and histograms plus gauge callbacks, rendered for Prometheus
+    Gauge callbacks return a flat dict of numbers (such as a component's stats());
+    each numeric entry becomes a gauge named <namespace>_<source>_<key> and
+    nested or non-numeric entries are skipped
+    """
+
+    def __init__(self, namespace: str = 'fitsense'):
+        self.namespace = namespace
+        self._metrics: Dict[str, _Metric] = {}
+        self._gauge_sources: Dict[str, Callable[[], Optional[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        full_name = f'{self.namespace}_{name}'
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = cls(full_name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{full_name} is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def register_gauges(self, source: str, callback: Callable[[], Optional[Dict[str, Any]]]):
+        """Export callback()'s numbers as gauges at scrape time; re-registering a source replaces it"""
+        with self._lock:
+            self._gauge_sources[source] = callback
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+            sources = sorted(self._gauge_sources.items())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        for source, callback in sources:
+            try:
+                values = callback() or {}
+            except Exception as e:
+                logger.warning(f"Metrics source {source} failed: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f'{self.namespace}_{source}_{key}'
+                lines.append(f'# TYPE {name} gauge')
+                lines.append(f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Process-wide metrics registry"""
+    return _registry
+
+
+def log_event(event: str, **fields):
+    """Emit one structured (JSON) log line for log-based metrics pipelines"""
+    logger.info(json.dumps({'event': event, **fields}, default=str, sort_keys=True))
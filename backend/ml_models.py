@@ -7,6 +7,8 @@ import pandas as pd
 import numpy as np
 import os
 import sys
+import threading
+import time
 from pathlib import Path
 import logging
 
@@ -22,82 +24,133 @@ import joblib
 import json
 
 # Import configuration and Gemini service
+from backend.calorie_engine import (
+    CalorieEngine, get_calorie_engine, WORKOUT_TYPES, INTENSITIES, MET_TABLE,
+    MALE_MULTIPLIER, FEMALE_MULTIPLIER, MIN_CALORIES
+)
 from backend.config import get_config
-from backend.gemini_service import GeminiRecommendationService
+from backend.flat_forest import FlatForest
+from backend.gemini_service import get_gemini_service
+from backend.metrics import LatencyHistogram, get_metrics_registry
+from backend.model_store import LazyModelMixin, get_model_store
+from backend.plan_library import LIBRARY_FILE, PlanLibrary, kmeans_fingerprint, scale_plan
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class DietRecommendationSystem:
+# Calorie model feature layout shared by training and inference
+CALORIE_CATEGORICAL_FEATURES = ['gender', 'workout_type', 'intensity']
+CALORIE_FEATURE_COLUMNS = ['age', 'weight', 'duration'] + [f + '_encoded' for f in CALORIE_CATEGORICAL_FEATURES]
+CALORIE_PREDICTION_MODES = ('formula', 'random_forest', 'llm')
+
+# Categories used by the synthetic training data, in code order
+GENDERS = ('male', 'female')
+ACTIVITY_LEVELS = ('sedentary', 'light', 'moderate', 'intense')
+GOALS = ('weight-loss', 'maintenance', 'muscle-gain')
+DIET_PREFERENCES = ('vegan', 'non-vegan')
+
+ACTIVITY_MULTIPLIERS = {
+    'sedentary': 1.2,
+    'light': 1.375,
+    'moderate': 1.55,
+    'intense': 1.725
+}
+GOAL_ADJUSTMENTS = {
+    'weight-loss': 0.8,
+    'maintenance': 1.0,
+    'muscle-gain': 1.2
+}
+
+# Diet clustering feature layout shared by training, cluster assignment and the plan library
+DIET_NUMERICAL_FEATURES = ['age', 'weight', 'height', 'bmi', 'bmr']
+DIET_CATEGORICAL_FEATURES = ['gender', 'activity_level', 'goal', 'diet_preference']
+DIET_CLUSTER_FEATURES = DIET_NUMERICAL_FEATURES + [f + '_encoded' for f in DIET_CATEGORICAL_FEATURES]
+
+_library_lookups = get_metrics_registry().counter(
+    'plan_library_lookups_total', 'Diet plan library lookups by result', ('result',)
+)
+
+
+def _category_values(categories, mapping):
+    """Array of mapping values aligned with category codes"""
+    return np.array([mapping[category] for category in categories], dtype=np.float64)
+
+
+def calculate_bmr(user_data):
+    """Mifflin-St Jeor basal metabolic rate"""
+    bmr = 10 * user_data['weight'] + 6.25 * user_data['height'] - 5 * user_data['age']
+    return bmr + (5 if user_data['gender'] == 'male' else -161)
+
+
+def calculate_target_calories(user_data):
+    """Daily calorie target from the BMR, activity level and goal"""
+    daily_calories = calculate_bmr(user_data) * ACTIVITY_MULTIPLIERS[user_data['activity_level']]
+    return daily_calories * GOAL_ADJUSTMENTS[user_data['goal']]
+
+class DietRecommendationSystem(LazyModelMixin):
     """
     Gemini 2.5 Flash powered diet recommendation system
     Replaces traditional ML models with AI-powered recommendations
     """
     
+    MODEL_FILES = {
+        'kmeans': 'diet_kmeans_model.pkl',
+        'decision_tree': 'diet_decision_tree_model.pkl',
+        'scaler': 'diet_scaler.pkl',
+        'label_encoders': 'diet_label_encoders.pkl'
+    }
+    
     def __init__(self, config=None):
         self.config = config or get_config()
-        self.gemini_service = GeminiRecommendationService(config)
+        self.gemini_service = get_gemini_service(config)
         
         # Keep fallback models for when Gemini is not available
         self.kmeans = KMeans(n_clusters=5, random_state=42)
         self.decision_tree = DecisionTreeClassifier(random_state=42)
         self.scaler = StandardScaler()
         self.label_encoders = {}
+        self.plan_library = None
+        self._library_verified = False
+        self._category_codes = None
         
         # Ensure models directory exists
         os.makedirs(self.config.MODELS_PATH, exist_ok=True)
         
-    def prepare_sample_data(self):
+    def prepare_sample_data(self, n_samples=None, seed=None):
         """Generate sample user data for training"""
         logger.info("Generating sample training data...")
-        np.random.seed(42)
-        n_samples = 1000
-        
-        data = {
-            'age': np.random.randint(18, 65, n_samples),
-            'weight': np.random.normal(70, 15, n_samples),
-            'height': np.random.normal(170, 10, n_samples),
-            'gender': np.random.choice(['male', 'female'], n_samples),
-            'activity_level': np.random.choice(['sedentary', 'light', 'moderate', 'intense'], n_samples),
-            'goal': np.random.choice(['weight-loss', 'maintenance', 'muscle-gain'], n_samples),
-            'diet_preference': np.random.choice(['vegan', 'non-vegan'], n_samples)
-        }
+        size = n_samples or self.config.TRAINING_DIET_SAMPLES
+        rng = np.random.default_rng(self.config.TRAINING_SEED if seed is None else seed)
+        activity_multipliers = _category_values(ACTIVITY_LEVELS, ACTIVITY_MULTIPLIERS)
+        goal_adjustments = _category_values(GOALS, GOAL_ADJUSTMENTS)
         
-        # Calculate BMI and BMR
-        df = pd.DataFrame(data)
-        df['bmi'] = df['weight'] / ((df['height'] / 100) ** 2)
+        age = rng.integers(18, 65, size)
+        weight = rng.normal(70, 15, size)
+        height = rng.normal(170, 10, size)
+        gender = rng.integers(0, len(GENDERS), size)
+        activity_level = rng.integers(0, len(ACTIVITY_LEVELS), size)
+        goal = rng.integers(0, len(GOALS), size)
+        diet_preference = rng.integers(0, len(DIET_PREFERENCES), size)
         
-        # Calculate BMR using Mifflin-St Jeor Equation
-        df['bmr'] = np.where(
-            df['gender'] == 'male',
-            10 * df['weight'] + 6.25 * df['height'] - 5 * df['age'] + 5,
-            10 * df['weight'] + 6.25 * df['height'] - 5 * df['age'] - 161
-        )
-        
-        # Activity multipliers
-        activity_multipliers = {
-            'sedentary': 1.2,
-            'light': 1.375,
-            'moderate': 1.55,
-            'intense': 1.725
-        }
-        
-        df['daily_calories'] = df.apply(
-            lambda row: row['bmr'] * activity_multipliers[row['activity_level']], axis=1
-        )
-        
-        # Adjust calories based on goal
-        goal_adjustments = {
-            'weight-loss': 0.8,
-            'maintenance': 1.0,
-            'muscle-gain': 1.2
-        }
-        
-        df['target_calories'] = df.apply(
-            lambda row: row['daily_calories'] * goal_adjustments[row['goal']], axis=1
-        )
+        bmi = weight / ((height / 100) ** 2)
+        # Mifflin-St Jeor Equation
+        bmr = 10 * weight + 6.25 * height - 5 * age + np.where(gender == 0, 5, -161)
+        daily_calories = bmr * activity_multipliers[activity_level]
         
+        df = pd.DataFrame({
+            'age': age,
+            'weight': weight,
+            'height': height,
+            'gender': pd.Categorical.from_codes(gender, GENDERS),
+            'activity_level': pd.Categorical.from_codes(activity_level, ACTIVITY_LEVELS),
+            'goal': pd.Categorical.from_codes(goal, GOALS),
+            'diet_preference': pd.Categorical.from_codes(diet_preference, DIET_PREFERENCES),
+            'bmi': bmi,
+            'bmr': bmr,
+            'daily_calories': daily_calories,
+            'target_calories': daily_calories * goal_adjustments[goal]
+        })
         logger.info(f"Generated {len(df)} training samples")
         return df
     
@@ -106,20 +159,16 @@ class DietRecommendationSystem:
         logger.info("Training diet recommendation models...")
         df = self.prepare_sample_data()
         
-        # Prepare features for clustering
-        categorical_features = ['gender', 'activity_level', 'goal', 'diet_preference']
-        numerical_features = ['age', 'weight', 'height', 'bmi', 'bmr']
-        
         # Encode categorical variables
         df_encoded = df.copy()
-        for feature in categorical_features:
+        for feature in DIET_CATEGORICAL_FEATURES:
             le = LabelEncoder()
             df_encoded[feature + '_encoded'] = le.fit_transform(df[feature])
             self.label_encoders[feature] = le
+        self._category_codes = None
         
         # Prepare features for clustering
-        cluster_features = numerical_features + [f + '_encoded' for f in categorical_features]
-        X_cluster = df_encoded[cluster_features]
+        X_cluster = df_encoded[DIET_CLUSTER_FEATURES]
         X_cluster_scaled = self.scaler.fit_transform(X_cluster)
         
         # Train K-Means clustering
@@ -129,7 +178,7 @@ class DietRecommendationSystem:
         
         # Train Decision Tree for diet type prediction
         logger.info("Training Decision Tree model...")
-        X_tree = df_encoded[cluster_features + ['target_calories']]
+        X_tree = df_encoded[DIET_CLUSTER_FEATURES + ['target_calories']]
         y_tree = df_encoded['diet_preference']
         
         self.decision_tree.fit(X_tree, y_tree)
@@ -140,13 +189,147 @@ class DietRecommendationSystem:
         
         return df_encoded
     
-    def predict_diet_plan(self, user_data):
-        """Predict personalized diet plan for a user using Gemini 2.5 Flash"""
+    def _models_trained(self):
+        return hasattr(self.kmeans, 'cluster_centers_') and hasattr(self.scaler, 'mean_')
+    
+    def _cluster_category_codes(self):
+        """Per categorical feature, the label encoder's code for each category"""
+        if self._category_codes is None:
+            self._category_codes = {
+                feature: {category: code for code, category in enumerate(self.label_encoders[feature].classes_)}
+                for feature in DIET_CATEGORICAL_FEATURES
+            }
+        return self._category_codes
+    
+    def assign_cluster(self, user_data):
+        """
+        KMeans cluster of a user, computed directly from the scaler and cluster centers
+        Returns None when the models are not trained or a category was not seen in training
+        """
+        if not self._models_trained():
+            return None
+        codes = self._cluster_category_codes()
+        bmi = user_data['weight'] / ((user_data['height'] / 100) ** 2)
+        bmr = calculate_bmr(user_data)
+        try:
+            encoded = [codes[feature][user_data[feature]] for feature in DIET_CATEGORICAL_FEATURES]
+        except KeyError:
+            return None
+    
+        x = np.array([user_data['age'], user_data['weight'], user_data['height'], bmi, bmr] + encoded,
+                     dtype=np.float64)
+        x = (x - self.scaler.mean_) / self.scaler.scale_
+        distances = ((self.kmeans.cluster_centers_ - x) ** 2).sum(axis=1)
+        return int(np.argmin(distances))
+    
+    def segment_profiles(self):
+        """
+        Yield (cluster, profile) for every cluster x diet preference x goal segment
+        The profile is the cluster center decoded back to a user profile
+        """
+        centers = self.scaler.inverse_transform(self.kmeans.cluster_centers_)
+        n_numerical = len(DIET_NUMERICAL_FEATURES)
+        for cluster, center in enumerate(centers):
+            encoded = dict(zip(DIET_CATEGORICAL_FEATURES, center[n_numerical:]))
+            decoded = {}
+            for feature in ('gender', 'activity_level'):
+                classes = self.label_encoders[feature].classes_
+                decoded[feature] = str(classes[int(np.clip(round(encoded[feature]), 0, len(classes) - 1))])
+            for diet_preference in DIET_PREFERENCES:
+                for goal in GOALS:
+                    yield cluster, {
+                        'age': int(round(center[0])),
+                        'weight': round(float(center[1]), 1),
+                        'height': round(float(center[2]), 1),
+                        **decoded,
+                        'goal': goal,
+                        'diet_preference': diet_preference
+                    }
+    
+    def load_plan_library(self):
+        """
+        Load the plan library from MODELS_PATH
+        Whether it was built for the current KMeans model is checked on first use, so
+        loading the library does not force the lazily loaded models into memory
+        """
+        self.plan_library = None
+        self._library_verified = False
+        if not self.config.PLAN_LIBRARY_ENABLED:
+            return False
+        library = PlanLibrary.load(Path(self.config.MODELS_PATH) / LIBRARY_FILE)
+        if library is None:
+            return False
+        self.plan_library = library
+        logger.info(f"✅ Plan library loaded with {len(library)} segment plans")
+        return True
+    
+    def _verified_plan_library(self):
+        """The plan library once its fingerprint matches the KMeans model; a mismatched one is dropped"""
+        library = self.plan_library
+        if library is None or self._library_verified:
+            return library
+        if not self._models_trained():
+            return None
+        if library.kmeans_fingerprint != kmeans_fingerprint(self.kmeans):
+            logger.warning("Plan library was built for different diet models, ignoring it")
+            self.plan_library = None
+            return None
+        self._library_verified = True
+        return library
+    
+    def _user_cluster(self, user_data):
+        """assign_cluster, or 0 when the user cannot be assigned"""
+        try:
+            cluster = self.assign_cluster(user_data)
+        except Exception as e:
+            logger.warning(f"Cluster assignment failed: {e}")
+            cluster = None
+        return 0 if cluster is None else cluster
+    
+    def _library_diet_plan(self, user_data):
+        """The user's segment plan scaled to their calorie target, or None"""
+        library = self._verified_plan_library()
+        if library is None:
+            return None
+        cluster = self.assign_cluster(user_data)
+        plan = None if cluster is None else library.get(cluster, user_data['diet_preference'], user_data['goal'])
+        _library_lookups.inc(result='miss' if plan is None else 'hit')
+        if plan is None:
+            return None
+        return {**scale_plan(plan, calculate_target_calories(user_data)), 'cluster': cluster, 'source': 'library'}
+    
+    def library_diet_plan(self, user_data):
+        """The plan library's plan for a user, or None; a local lookup that never calls Gemini"""
+        if self.plan_library is None:
+            return None
+        try:
+            return self._library_diet_plan(user_data)
+        except Exception as e:
+            logger.error(f"Error serving diet plan from the library: {e}")
+            return None
+    
+    def predict_diet_plan(self, user_data, personalize=False, fallback=True):
+        """
+        Predict a diet plan for a user
+        Served from the plan library when one is loaded, unless personalize asks for a
+        plan generated by Gemini 2.5 Flash for this user
+        """
+        if not personalize:
+            diet_plan = self.library_diet_plan(user_data)
+            if diet_plan is not None:
+                return diet_plan
+        return self.generate_diet_plan(user_data, fallback=fallback)
+    
+    def generate_diet_plan(self, user_data, fallback=True):
+        """
+        Generate a diet plan for a user with Gemini 2.5 Flash, falling back to the rule-based plan
+        Without fallback, Gemini errors are raised instead
+        """
         try:
             logger.info("Generating diet plan using Gemini 2.5 Flash...")
             
             # Use Gemini service for diet plan generation
-            diet_plan = self.gemini_service.generate_diet_plan(user_data)
+            diet_plan = self.gemini_service.generate_diet_plan(user_data, fallback=fallback)
             
             # Transform the response to match the expected format
             if 'meal_plan' in diet_plan:
@@ -164,7 +347,7 @@ class DietRecommendationSystem:
                 
                 return {
                     'target_calories': diet_plan.get('target_calories', 2000),
-                    'cluster': 0,  # Not used with Gemini
+                    'cluster': self._user_cluster(user_data),
                     'meal_plan': meal_plan,
                     'macros': diet_plan.get('macros', {
                         'protein': 150,
@@ -179,45 +362,22 @@ class DietRecommendationSystem:
                 return self._fallback_diet_plan(user_data)
                 
         except Exception as e:
+            if not fallback:
+                raise
             logger.error(f"Error predicting diet plan with Gemini: {e}")
             return self._fallback_diet_plan(user_data)
     
     def _fallback_diet_plan(self, user_data):
         """Fallback diet plan using traditional ML approach"""
         try:
-            # Calculate BMI and BMR
-            bmi = user_data['weight'] / ((user_data['height'] / 100) ** 2)
-            
-            if user_data['gender'] == 'male':
-                bmr = 10 * user_data['weight'] + 6.25 * user_data['height'] - 5 * user_data['age'] + 5
-            else:
-                bmr = 10 * user_data['weight'] + 6.25 * user_data['height'] - 5 * user_data['age'] - 161
-            
-            # Activity multipliers
-            activity_multipliers = {
-                'sedentary': 1.2,
-                'light': 1.375,
-                'moderate': 1.55,
-                'intense': 1.725
-            }
-            
-            daily_calories = bmr * activity_multipliers[user_data['activity_level']]
-            
-            # Goal adjustments
-            goal_adjustments = {
-                'weight-loss': 0.8,
-                'maintenance': 1.0,
-                'muscle-gain': 1.2
-            }
-            
-            target_calories = daily_calories * goal_adjustments[user_data['goal']]
+            target_calories = calculate_target_calories(user_data)
             
             # Generate meal plan
             meal_plan = self.generate_meal_plan(target_calories, user_data['diet_preference'], user_data['goal'])
             
             return {
                 'target_calories': target_calories,
-                'cluster': 0,
+                'cluster': self._user_cluster(user_data),
                 'meal_plan': meal_plan,
                 'macros': self.calculate_macros(target_calories, user_data['goal'])
             }
@@ -325,25 +485,20 @@ class DietRecommendationSystem:
     
     def save_models(self):
         """Save trained models to disk"""
-        models_path = Path(self.config.MODELS_PATH)
+        store = get_model_store(self.config.MODELS_PATH)
         
-        joblib.dump(self.kmeans, models_path / 'diet_kmeans_model.pkl')
-        joblib.dump(self.decision_tree, models_path / 'diet_decision_tree_model.pkl')
-        joblib.dump(self.scaler, models_path / 'diet_scaler.pkl')
-        joblib.dump(self.label_encoders, models_path / 'diet_label_encoders.pkl')
+        for name, filename in self.MODEL_FILES.items():
+            store.save(filename, getattr(self, name))
         
-        logger.info(f"Models saved to {models_path}")
+        logger.info(f"Models saved to {store.models_path}")
     
     def load_models(self):
-        """Load trained models from disk"""
-        models_path = Path(self.config.MODELS_PATH)
-        
+        """Register the trained models; each one is memory-mapped on first use"""
         try:
-            self.kmeans = joblib.load(models_path / 'diet_kmeans_model.pkl')
-            self.decision_tree = joblib.load(models_path / 'diet_decision_tree_model.pkl')
-            self.scaler = joblib.load(models_path / 'diet_scaler.pkl')
-            self.label_encoders = joblib.load(models_path / 'diet_label_encoders.pkl')
-            logger.info("Diet models loaded successfully")
+            self.bind_model_store(get_model_store(self.config.MODELS_PATH))
+            self._category_codes = None
+            logger.info("Diet models registered for lazy loading")
+            self.load_plan_library()
             return True
         except FileNotFoundError:
             logger.warning("Diet models not found, need to train first")
@@ -358,7 +513,7 @@ class WorkoutRecommendationSystem:
     
     def __init__(self, config=None):
         self.config = config or get_config()
-        self.gemini_service = GeminiRecommendationService(config)
+        self.gemini_service = get_gemini_service(config)
         
         # Keep fallback systems for when Gemini is not available
         self.exercise_database = self.create_exercise_database()
@@ -425,13 +580,16 @@ class WorkoutRecommendationSystem:
             }
         }
     
-    def generate_workout_plan(self, user_data):
-        """Generate personalized workout plan using Gemini 2.5 Flash"""
+    def generate_workout_plan(self, user_data, fallback=True):
+        """
+        Generate personalized workout plan using Gemini 2.5 Flash
+        Without fallback, Gemini errors are raised instead of returning the rule-based plan
+        """
         try:
             logger.info("Generating workout plan using Gemini 2.5 Flash...")
             
             # Use Gemini service for workout plan generation
-            workout_plan = self.gemini_service.generate_workout_plan(user_data)
+            workout_plan = self.gemini_service.generate_workout_plan(user_data, fallback=fallback)
             
             # Transform the response to match the expected format
             if 'exercises' in workout_plan:
@@ -451,6 +609,8 @@ class WorkoutRecommendationSystem:
                 return self._fallback_workout_plan(user_data)
                 
         except Exception as e:
+            if not fallback:
+                raise
             logger.error(f"Error generating workout plan with Gemini: {e}")
             return self._fallback_workout_plan(user_data)
     
@@ -622,86 +782,102 @@ class WorkoutRecommendationSystem:
         return time_mapping.get(time_range, 30)
 
 
-class CalorieBurnPredictor:
+class CalorieBurnPredictor(LazyModelMixin):
     """
-    Gemini 2.5 Flash powered calorie burn prediction system
-    Replaces Random Forest with AI-powered predictions
+    Calorie burn prediction system
+    Scores workouts with the MET formula, the trained Random Forest or Gemini,
+    selected by CALORIE_PREDICTION_MODE
     """
     
+    # The sklearn forest is saved too but only read when the flat copy is missing
+    SKLEARN_MODEL_FILE = 'calorie_burn_model.pkl'
+    MODEL_FILES = {
+        'scaler': 'calorie_burn_scaler.pkl',
+        'label_encoders': 'calorie_burn_encoders.pkl',
+        'flat_model': 'calorie_burn_flat_forest.pkl'
+    }
+    
     def __init__(self, config=None):
         self.config = config or get_config()
-        self.gemini_service = GeminiRecommendationService(config)
+        self.gemini_service = get_gemini_service(config)
+        self.engine = get_calorie_engine()
         
-        # Keep fallback models for when Gemini is not available
+        self.prediction_mode = self.config.CALORIE_PREDICTION_MODE
+        if self.prediction_mode not in CALORIE_PREDICTION_MODES:
+            raise ValueError(f"Unknown CALORIE_PREDICTION_MODE: {self.prediction_mode}")
+        self.latency = {mode: LatencyHistogram() for mode in CALORIE_PREDICTION_MODES}
+        
+        # Random Forest model and its preprocessing
         self.model = RandomForestRegressor(n_estimators=100, random_state=42)
         self.scaler = StandardScaler()
         self.label_encoders = {}
         
+        # Array-backed copy of the forest used on the request path
+        self.flat_model = None
+        
+        # Set once a fitted forest is in memory or registered with the model store
+        self._forest_available = False
+        
+        # Inference state derived from the fitted encoders and scaler, built on first use
+        self._category_codes = {}
+        self._scale_mean = None
+        self._scale_std = None
+        self._buffers = threading.local()
+        
         # Ensure models directory exists
         os.makedirs(self.config.MODELS_PATH, exist_ok=True)
         
-    def prepare_training_data(self):
+    def prepare_training_data(self, n_samples=None, seed=None):
         """Generate training data for calorie burn prediction"""
         logger.info("Generating calorie burn training data...")
-        np.random.seed(42)
-        n_samples = 2000
-        
-        # Generate synthetic data
-        data = {
-            'age': np.random.randint(18, 65, n_samples),
-            'weight': np.random.normal(70, 15, n_samples),
-            'gender': np.random.choice(['male', 'female'], n_samples),
-            'workout_type': np.random.choice(['strength', 'cardio', 'mixed'], n_samples),
-            'intensity': np.random.choice(['low', 'moderate', 'high'], n_samples),
-            'duration': np.random.randint(15, 90, n_samples)
-        }
+        size = n_samples or self.config.TRAINING_CALORIE_SAMPLES
+        rng = np.random.default_rng(self.config.TRAINING_SEED if seed is None else seed)
         
-        df = pd.DataFrame(data)
-        
-        # Calculate calories burned using MET values
-        met_values = {
-            ('strength', 'low'): 3.0,
-            ('strength', 'moderate'): 5.0,
-            ('strength', 'high'): 8.0,
-            ('cardio', 'low'): 4.0,
-            ('cardio', 'moderate'): 7.0,
-            ('cardio', 'high'): 11.0,
-            ('mixed', 'low'): 3.5,
-            ('mixed', 'moderate'): 6.0,
-            ('mixed', 'high'): 9.5
-        }
-        
-        df['met'] = df.apply(lambda row: met_values[(row['workout_type'], row['intensity'])], axis=1)
+        age = rng.integers(18, 65, size)
+        weight = rng.normal(70, 15, size)
+        gender = rng.integers(0, len(GENDERS), size)
+        workout_type = rng.integers(0, len(WORKOUT_TYPES), size)
+        intensity = rng.integers(0, len(INTENSITIES), size)
+        duration = rng.integers(15, 90, size)
         
         # Calories = MET × weight(kg) × duration(hours)
-        df['calories_burned'] = df['met'] * df['weight'] * (df['duration'] / 60)
+        met = MET_TABLE[workout_type, intensity]
+        calories_burned = met * weight * (duration / 60)
         
         # Add some noise and gender adjustment
-        gender_multiplier = np.where(df['gender'] == 'male', 1.1, 0.9)
-        age_factor = 1 - (df['age'] - 25) * 0.002  # Slight decrease with age
-        
-        df['calories_burned'] = df['calories_burned'] * gender_multiplier * age_factor
-        df['calories_burned'] += np.random.normal(0, 10, n_samples)  # Add noise
-        df['calories_burned'] = np.maximum(df['calories_burned'], 10)  # Minimum 10 calories
+        gender_multiplier = np.where(gender == 0, MALE_MULTIPLIER, FEMALE_MULTIPLIER)
+        age_factor = 1 - (age - 25) * 0.002  # Slight decrease with age
+        calories_burned *= gender_multiplier * age_factor
+        calories_burned += rng.normal(0, 10, size)  # Add noise
         
+        df = pd.DataFrame({
+            'age': age,
+            'weight': weight,
+            'gender': pd.Categorical.from_codes(gender, GENDERS),
+            'workout_type': pd.Categorical.from_codes(workout_type, WORKOUT_TYPES),
+            'intensity': pd.Categorical.from_codes(intensity, INTENSITIES),
+            'duration': duration,
+            'met': met,
+            'calories_burned': np.maximum(calories_burned, MIN_CALORIES)
+        })
         logger.info(f"Generated {len(df)} calorie burn training samples")
         return df
     
-    def train_model(self):
-        """Train the calorie burn prediction model"""
+    def train_model(self, n_jobs=None):
+        """Train the calorie burn prediction model
+        n_jobs sets the Random Forest's parallelism for this fit only
+        """
         logger.info("Training calorie burn prediction model...")
         df = self.prepare_training_data()
         
         # Encode categorical variables
-        categorical_features = ['gender', 'workout_type', 'intensity']
-        for feature in categorical_features:
+        for feature in CALORIE_CATEGORICAL_FEATURES:
             le = LabelEncoder()
             df[feature + '_encoded'] = le.fit_transform(df[feature])
             self.label_encoders[feature] = le
         
         # Prepare features
-        feature_columns = ['age', 'weight', 'duration'] + [f + '_encoded' for f in categorical_features]
-        X = df[feature_columns]
+        X = df[CALORIE_FEATURE_COLUMNS]
         y = df['calories_burned']
         
         # Split data
@@ -713,7 +889,13 @@ class CalorieBurnPredictor:
         
         # Train model
         logger.info("Training Random Forest model...")
-        self.model.fit(X_train_scaled, y_train)
+        serving_n_jobs = self.model.n_jobs
+        if n_jobs is not None:
+            self.model.set_params(n_jobs=n_jobs)
+        try:
+            self.model.fit(X_train_scaled, y_train)
+        finally:
+            self.model.set_params(n_jobs=serving_n_jobs)
         
         # Evaluate model
         train_score = self.model.score(X_train_scaled, y_train)
@@ -722,75 +904,256 @@ class CalorieBurnPredictor:
         logger.info(f"Training R² Score: {train_score:.3f}")
         logger.info(f"Testing R² Score: {test_score:.3f}")
         
+        self.export_flat_model()
+        self._prepare_inference()
+        self._forest_available = True
+        
         # Save model
         self.save_model()
         logger.info("Calorie burn prediction model trained and saved successfully!")
         
         return test_score
     
+    @property
+    def is_model_ready(self):
+        """True once a fitted (or flattened) Random Forest and its encoders are available"""
+        return self._forest_available
+    
+    def export_flat_model(self):
+        """Flatten the fitted Random Forest into contiguous arrays for sklearn-free inference"""
+        self.flat_model = FlatForest.from_sklearn(self.model)
+        logger.info(f"Flattened Random Forest: {self.flat_model.n_trees} trees, "
+                    f"{self.flat_model.n_nodes} nodes, {self.flat_model.nbytes / 1e6:.1f} MB")
+        return self.flat_model
+    
+    def _prepare_inference(self):
+        """Precompute label lookups and scaling vectors so inference skips sklearn preprocessing"""
+        self._scale_mean = np.asarray(self.scaler.mean_, dtype=np.float64)
+        self._scale_std = np.asarray(self.scaler.scale_, dtype=np.float64)
+        # Assigned last: a non-empty _category_codes means the state above is ready
+        self._category_codes = {
+            feature: {label: code for code, label in enumerate(encoder.classes_)}
+            for feature, encoder in self.label_encoders.items()
+        }
+    
+    def _resolve_model(self, name, obj):
+        if name == 'flat_model':
+            return FlatForest.from_arrays(obj)
+        return obj
+    
+    def _feature_buffer(self, n):
+        """Per-thread preallocated feature matrix, grown on demand"""
+        buffer = getattr(self._buffers, 'features', None)
+        if buffer is None or buffer.shape[0] < n:
+            buffer = np.empty((max(n, 1), len(CALORIE_FEATURE_COLUMNS)), dtype=np.float64)
+            self._buffers.features = buffer
+        return buffer[:n]
+    
+    def _predict_random_forest_batch(self, ages, weights, durations, genders, workout_types, intensities):
+        """Score rows with the Random Forest; rows with unseen labels use the MET formula"""
+        if not self._category_codes:
+            self._prepare_inference()
+        n = len(weights)
+        X = self._feature_buffer(n)
+        X[:, 0] = ages
+        X[:, 1] = weights
+        X[:, 2] = durations
+        known = np.ones(n, dtype=bool)
+        columns = zip(CALORIE_CATEGORICAL_FEATURES, (genders, workout_types, intensities))
+        for offset, (feature, values) in enumerate(columns):
+            codes = CalorieEngine.category_codes(values, self._category_codes[feature])
+            known &= codes >= 0
+            X[:, 3 + offset] = codes
+        X -= self._scale_mean
+        X /= self._scale_std
+        
+        forest = self.flat_model if self.flat_model is not None else self.model
+        calories = np.empty(n, dtype=np.int64)
+        if known.all():
+            calories[:] = forest.predict(X)
+        else:
+            if known.any():
+                calories[known] = forest.predict(X[known])
+            unknown = ~known
+            calories[unknown] = self.engine.predict_batch(
+                np.asarray(weights)[unknown], np.asarray(genders)[unknown],
+                np.asarray(workout_types)[unknown], np.asarray(intensities)[unknown],
+                np.asarray(durations)[unknown]
+            )
+        return np.maximum(calories, 10)
+    
+    def _predict_random_forest_row(self, user_data, workout_data):
+        """Single-row Random Forest path using plain dict lookups for the encoders"""
+        if not self._category_codes:
+            self._prepare_inference()
+        codes = self._category_codes
+        try:
+            categorical = (
+                codes['gender'][user_data['gender']],
+                codes['workout_type'][workout_data['type']],
+                codes['intensity'][workout_data['intensity']]
+            )
+        except KeyError:
+            return self._fallback_calorie_prediction(user_data, workout_data)
+        X = self._feature_buffer(1)
+        X[0, :3] = (user_data['age'], user_data['weight'], workout_data['duration'])
+        X[0, 3:] = categorical
+        X -= self._scale_mean
+        X /= self._scale_std
+        forest = self.flat_model if self.flat_model is not None else self.model
+        return max(int(forest.predict(X)[0]), 10)
+    
+    def _predict_with_mode(self, mode, user_data, workout_data):
+        if mode == 'random_forest':
+            return self._predict_random_forest_row(user_data, workout_data)
+        if mode == 'llm':
+            return max(int(self.gemini_service.predict_calories_burned(user_data, workout_data)), 10)
+        return self._fallback_calorie_prediction(user_data, workout_data)
+    
     def predict_calories(self, user_data, workout_data):
-        """Predict calories burned for a specific workout using Gemini 2.5 Flash"""
+        """Predict calories burned for a specific workout using the configured mode"""
+        mode = self.prediction_mode
+        if mode == 'random_forest' and not self.is_model_ready:
+            mode = 'formula'
+        start = time.perf_counter()
         try:
-            logger.info("Predicting calories using Gemini 2.5 Flash...")
-            
-            # Use Gemini service for calorie prediction
-            calories = self.gemini_service.predict_calories_burned(user_data, workout_data)
-            
-            return max(int(calories), 10)  # Minimum 10 calories
-            
+            calories = self._predict_with_mode(mode, user_data, workout_data)
         except Exception as e:
-            logger.error(f"Error predicting calories with Gemini: {e}")
-            return self._fallback_calorie_prediction(user_data, workout_data)
+            logger.error(f"Error predicting calories in {mode} mode: {e}")
+            mode = 'formula'
+            calories = self._fallback_calorie_prediction(user_data, workout_data)
+        self.latency[mode].observe(time.perf_counter() - start)
+        return calories
+    
+    def predict_calories_batch(self, user_data, workouts):
+        """Predict calories for a list of workouts by one user in a single vectorized pass
+        The LLM mode is never used for batches; they are scored with the formula instead
+        """
+        n = len(workouts)
+        mode = 'random_forest' if self.prediction_mode == 'random_forest' and self.is_model_ready else 'formula'
+        start = time.perf_counter()
+        columns = {
+            'weights': np.full(n, float(user_data['weight'])),
+            'genders': np.full(n, user_data['gender']),
+            'workout_types': [w['type'] for w in workouts],
+            'intensities': [w['intensity'] for w in workouts],
+            'durations': [w['duration'] for w in workouts]
+        }
+        if mode == 'random_forest':
+            calories = self._predict_random_forest_batch(ages=np.full(n, float(user_data['age'])), **columns)
+        else:
+            calories = self.engine.predict_batch(**columns)
+        self.latency[mode].observe(time.perf_counter() - start)
+        return calories.tolist()
+    
+    def warm_up(self, rounds=3):
+        """Run throwaway local predictions so the first real request skips one-off setup costs"""
+        if self.prediction_mode == 'llm':
+            return
+        mode = 'random_forest' if self.prediction_mode == 'random_forest' and self.is_model_ready else 'formula'
+        sample_user = {'age': 30, 'weight': 70, 'gender': 'male'}
+        sample_workout = {'type': 'mixed', 'intensity': 'moderate', 'duration': 30}
+        start = time.perf_counter()
+        for _ in range(rounds):
+            self._predict_with_mode(mode, sample_user, sample_workout)
+        logger.info(f"Calorie predictor warmed up in {mode} mode ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    
+    def latency_stats(self):
+        """Latency summary per prediction mode"""
+        stats = {'mode': self.prediction_mode, 'model_ready': self.is_model_ready, 'latency': {}}
+        for mode, histogram in self.latency.items():
+            snapshot = histogram.snapshot()
+            stats['latency'][mode] = {k: snapshot[k] for k in ('count', 'mean', 'p50', 'p95', 'p99')}
+        return stats
+    
+    def benchmark_modes(self, n_single=200, include_llm=False):
+        """Measure latency and accuracy of each prediction mode on the held-out split"""
+        df = self.prepare_training_data()
+        _, test_df = train_test_split(df, test_size=0.2, random_state=42)
+        modes = ['formula']
+        if self.is_model_ready:
+            modes.append('random_forest')
+        if include_llm:
+            modes.append('llm')
+        
+        rows = test_df.to_dict('records')
+        results = {}
+        for mode in modes:
+            sample = rows[:n_single] if mode != 'llm' else rows[:5]
+            predictions = []
+            start = time.perf_counter()
+            for row in sample:
+                predictions.append(self._predict_with_mode(
+                    mode,
+                    {'age': row['age'], 'weight': row['weight'], 'gender': row['gender']},
+                    {'type': row['workout_type'], 'intensity': row['intensity'], 'duration': row['duration']}
+                ))
+            single_latency = (time.perf_counter() - start) / len(sample)
+            actual = np.array([row['calories_burned'] for row in sample])
+            results[mode] = {
+                'mae': float(np.mean(np.abs(np.array(predictions) - actual))),
+                'single_row_latency_us': single_latency * 1e6
+            }
+        
+        # Batch throughput over the whole held-out split
+        columns = {
+            'weights': test_df['weight'].to_numpy(),
+            'genders': test_df['gender'].to_numpy(),
+            'workout_types': test_df['workout_type'].to_numpy(),
+            'intensities': test_df['intensity'].to_numpy(),
+            'durations': test_df['duration'].to_numpy()
+        }
+        start = time.perf_counter()
+        self.engine.predict_batch(**columns)
+        results['formula']['batch_rows_per_sec'] = len(test_df) / (time.perf_counter() - start)
+        if 'random_forest' in results:
+            start = time.perf_counter()
+            self._predict_random_forest_batch(ages=test_df['age'].to_numpy(), **columns)
+            results['random_forest']['batch_rows_per_sec'] = len(test_df) / (time.perf_counter() - start)
+        return results
+    
+    def explain_calories(self, user_data, workout_data):
+        """Opt-in LLM explanation of a calorie estimate (calls Gemini)"""
+        try:
+            logger.info("Explaining calorie estimate using Gemini 2.5 Flash...")
+            return self.gemini_service.explain_calories_burned(user_data, workout_data)
+        except Exception as e:
+            logger.error(f"Error explaining calories with Gemini: {e}")
+            return None
     
     def _fallback_calorie_prediction(self, user_data, workout_data):
-        """Fallback calorie prediction using traditional ML approach"""
+        """Closed-form MET calorie prediction"""
         try:
-            # Basic MET calculation
-            met_values = {
-                ('strength', 'low'): 3.0,
-                ('strength', 'moderate'): 5.0,
-                ('strength', 'high'): 8.0,
-                ('cardio', 'low'): 4.0,
-                ('cardio', 'moderate'): 7.0,
-                ('cardio', 'high'): 11.0,
-                ('mixed', 'low'): 3.5,
-                ('mixed', 'moderate'): 6.0,
-                ('mixed', 'high'): 9.5
-            }
-            
-            met = met_values.get((workout_data['type'], workout_data['intensity']), 5.0)
-            calories = met * user_data['weight'] * (workout_data['duration'] / 60)
-            
-            # Gender adjustment
-            if user_data['gender'] == 'male':
-                calories *= 1.1
-            else:
-                calories *= 0.9
-            
-            return max(int(calories), 10)
+            return self.engine.predict(user_data, workout_data)
         except Exception as e:
             logger.error(f"Error in fallback calorie prediction: {e}")
             return 100  # Default fallback
     
     def save_model(self):
         """Save the trained model"""
-        models_path = Path(self.config.MODELS_PATH)
+        store = get_model_store(self.config.MODELS_PATH)
         
-        joblib.dump(self.model, models_path / 'calorie_burn_model.pkl')
-        joblib.dump(self.scaler, models_path / 'calorie_burn_scaler.pkl')
-        joblib.dump(self.label_encoders, models_path / 'calorie_burn_encoders.pkl')
+        store.save(self.SKLEARN_MODEL_FILE, self.model)
+        store.save(self.MODEL_FILES['scaler'], self.scaler)
+        store.save(self.MODEL_FILES['label_encoders'], self.label_encoders)
+        if self.flat_model is not None:
+            store.save(self.MODEL_FILES['flat_model'], self.flat_model.to_arrays())
         
-        logger.info(f"Calorie models saved to {models_path}")
+        logger.info(f"Calorie models saved to {store.models_path}")
     
     def load_model(self):
-        """Load trained model from disk"""
-        models_path = Path(self.config.MODELS_PATH)
+        """Register the trained models; each one is memory-mapped on first use"""
+        store = get_model_store(self.config.MODELS_PATH)
         
         try:
-            self.model = joblib.load(models_path / 'calorie_burn_model.pkl')
-            self.scaler = joblib.load(models_path / 'calorie_burn_scaler.pkl')
-            self.label_encoders = joblib.load(models_path / 'calorie_burn_encoders.pkl')
-            logger.info("Calorie models loaded successfully")
+            # Models saved before the flat forest existed are flattened once and stored
+            if not store.exists(self.MODEL_FILES['flat_model']):
+                self.model = joblib.load(store.path(self.SKLEARN_MODEL_FILE))
+                store.save(self.MODEL_FILES['flat_model'], self.export_flat_model().to_arrays())
+            self.bind_model_store(store)
+            self._category_codes = {}
+            self._forest_available = True
+            logger.info("Calorie models registered for lazy loading")
             return True
         except FileNotFoundError:
             logger.warning("Calorie models not found, need to train first")
@@ -798,62 +1161,9 @@ class CalorieBurnPredictor:
 
 
 def main():
-    """Main function to train all models"""
-    print("=== AI-Powered Diet and Workout Recommendation System ===")
-    print("VS Code Optimized Version")
-    print("Training Machine Learning Models...\n")
-    
-    # Get configuration
-    config = get_config()
-    
-    # Train Diet Recommendation System
-    print("1. Training Diet Recommendation System...")
-    diet_system = DietRecommendationSystem(config)
-    diet_data = diet_system.train_models()
-    print("✓ Diet recommendation models trained successfully!\n")
-    
-    # Train Calorie Burn Predictor
-    print("2. Training Calorie Burn Predictor...")
-    calorie_predictor = CalorieBurnPredictor(config)
-    calorie_score = calorie_predictor.train_model()
-    print("✓ Calorie burn prediction model trained successfully!\n")
-    
-    # Test the systems with sample user
-    print("3. Testing systems with sample user...")
-    sample_user = {
-        'age': 28,
-        'weight': 70,
-        'height': 175,
-        'gender': 'male',
-        'activity_level': 'moderate',
-        'goal': 'weight-loss',
-        'diet_preference': 'non-vegan',
-        'workout_time': '30-45'
-    }
-    
-    # Test diet recommendation
-    diet_plan = diet_system.predict_diet_plan(sample_user)
-    print(f"Sample Diet Plan - Target Calories: {diet_plan['target_calories']:.0f}")
-    print(f"Macros - Protein: {diet_plan['macros']['protein']}g, Carbs: {diet_plan['macros']['carbs']}g, Fat: {diet_plan['macros']['fat']}g")
-    
-    # Test workout recommendation
-    workout_system = WorkoutRecommendationSystem(config)
-    workout_plan = workout_system.generate_workout_plan(sample_user)
-    print(f"Sample Workout: {workout_plan['name']} - {workout_plan['duration']} minutes")
-    print(f"Estimated Calories: {workout_plan['estimated_calories']}")
-    
-    # Test calorie prediction
-    workout_data = {
-        'type': 'mixed',
-        'intensity': 'moderate',
-        'duration': 37
-    }
-    predicted_calories = calorie_predictor.predict_calories(sample_user, workout_data)
-    print(f"Predicted Calorie Burn: {predicted_calories} calories")
-    
-    print("\n✓ All models trained and tested successfully!")
-    print("Models saved to disk and ready for integration with the web application.")
-    print(f"Models location: {config.MODELS_PATH}")
+    """Train all models; see backend/training_pipeline.py for options"""
+    from backend.training_pipeline import main as run_training_pipeline
+    run_training_pipeline()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,221 @@
+"""
+Model store for trained artifacts
+Saves models uncompressed and loads them lazily with mmap_mode='r' so worker
+processes share array pages through the OS page cache. Files published by the
+training pipeline are resolved through its manifest, which points every model
+at one versioned directory
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any
+
+import joblib
+import numpy as np
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Written by backend/training_pipeline.py; replacing it switches every model to its new version at once
+MANIFEST_FILE = 'training_manifest.json'
+VERSIONS_DIR = 'versions'
+
+
+def _is_mapped(array):
+    """True when an array (or one of its bases) is backed by a memory map"""
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, 'base', None)
+        if not isinstance(array, np.ndarray):
+            return False
+    return False
+
+
+def _array_bytes(obj, seen=None, depth=0):
+    """Sum (mapped_bytes, private_bytes) of the NumPy arrays reachable from obj"""
+    if seen is None:
+        seen = set()
+    if depth > 8 or id(obj) in seen:
+        return 0, 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        if obj.dtype == object:
+            return _array_bytes(list(obj.ravel()), seen, depth + 1)
+        return (obj.nbytes, 0) if _is_mapped(obj) else (0, obj.nbytes)
+
+    if isinstance(obj, dict):
+        children = list(obj.values())
+    elif isinstance(obj, (list, tuple)):
+        children = list(obj)
+    elif hasattr(obj, '__dict__'):
+        children = list(vars(obj).values())
+    elif hasattr(obj, '__getstate__') and not isinstance(obj, (str, bytes, int, float, bool)):
+        # Compiled objects such as sklearn's Tree only expose their arrays through their state
+        try:
+            state = obj.__getstate__()
+        except Exception:
+            return 0, 0
+        children = list(state.values()) if isinstance(state, dict) else []
+    else:
+        return 0, 0
+
+    mapped = private = 0
+    for child in children:
+        child_mapped, child_private = _array_bytes(child, seen, depth + 1)
+        mapped += child_mapped
+        private += child_private
+    return mapped, private
+
+
+class ModelStore:
+    """
+    Loads each model file at most once per process, on first use
+    """
+
+    def __init__(self, models_path, mmap_mode='r'):
+        self.models_path = Path(models_path)
+        self.mmap_mode = mmap_mode
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._manifest = None
+
+    def _published(self) -> Dict[str, Path]:
+        """Path of every file in the model versions the training manifest points at"""
+        manifest_path = self.models_path / MANIFEST_FILE
+        try:
+            # The manifest is replaced, never edited, so a new inode means a new manifest
+            stat = manifest_path.stat()
+            version = (stat.st_ino, stat.st_mtime_ns)
+            if self._manifest is None or self._manifest[0] != version:
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+                published = {}
+                for name, entry in manifest.items():
+                    version_dir = self.models_path / VERSIONS_DIR / name / entry['version']
+                    for filename in entry.get('files', []):
+                        published[filename] = version_dir / filename
+                self._manifest = (version, published)
+        except FileNotFoundError:
+            return {}
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable training manifest {manifest_path}: {e}")
+            return {}
+        return self._manifest[1]
+
+    def path(self, filename) -> Path:
+        """The published version of a file when the manifest lists it, else the file in models_path"""
+        published = self._published().get(filename)
+        if published is not None and published.exists():
+            return published
+        return self.models_path / filename
+
+    def exists(self, filename) -> bool:
+        return self.path(filename).exists()
+
+    def save(self, filename, obj):
+        """
+        Write obj uncompressed (so it can be memory-mapped) and atomically replace models_path/filename
+        Published versions are never written to; only the training pipeline publishes new ones
+        """
+        self.models_path.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.models_path, prefix=f'.{filename}.', suffix='.tmp')
+        os.close(fd)
+        try:
+            joblib.dump(obj, tmp_path, compress=0)
+            os.replace(tmp_path, self.models_path / filename)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if filename in self._published():
+            logger.warning(f"⚠️ Saved {filename} to {self.models_path}, but the published version in the "
+                           f"training manifest is still served until the pipeline publishes a new one")
+        with self._lock:
+            self._models.pop(filename, None)
+            self._stats.pop(filename, None)
+
+    def get(self, filename):
+        """Return the loaded model, loading it on first access"""
+        model = self._models.get(filename)
+        if model is not None:
+            return model
+        with self._lock:
+            model = self._models.get(filename)
+            if model is not None:
+                return model
+            path = self.path(filename)
+            start = time.perf_counter()
+            model = joblib.load(path, mmap_mode=self.mmap_mode)
+            load_time = time.perf_counter() - start
+            mapped_bytes, private_bytes = _array_bytes(model)
+            self._models[filename] = model
+            self._stats[filename] = {
+                'load_time_ms': round(load_time * 1000, 3),
+                'file_bytes': path.stat().st_size,
+                'mapped_bytes': mapped_bytes,
+                'private_bytes': private_bytes
+            }
+        logger.info(f"Loaded {filename} in {load_time * 1000:.1f} ms "
+                    f"({mapped_bytes / 1e6:.1f} MB mapped, {private_bytes / 1e6:.1f} MB private)")
+        return model
+
+    def is_loaded(self, filename) -> bool:
+        return filename in self._models
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-model load time and resident size for every model loaded so far"""
+        with self._lock:
+            return {filename: dict(stats) for filename, stats in self._stats.items()}
+
+
+class LazyModelMixin:
+    """
+    Resolves the attributes listed in MODEL_FILES from a bound ModelStore on first access
+    Subclasses may override _resolve_model to post-process a stored object
+    """
+
+    MODEL_FILES: Dict[str, str] = {}
+
+    def bind_model_store(self, store: ModelStore):
+        """Defer loading of every model attribute to the store"""
+        missing = [filename for filename in self.MODEL_FILES.values() if not store.exists(filename)]
+        if missing:
+            raise FileNotFoundError(f"Missing model files: {missing}")
+        self.model_store = store
+        for name in self.MODEL_FILES:
+            self.__dict__.pop(name, None)
+
+    def _resolve_model(self, name, obj):
+        return obj
+
+    def __getattr__(self, name):
+        # Only reached when normal attribute lookup fails
+        files = type(self).MODEL_FILES
+        store = self.__dict__.get('model_store')
+        if name in files and store is not None:
+            value = self._resolve_model(name, store.get(files[name]))
+            setattr(self, name, value)
+            return value
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_model_store(models_path) -> ModelStore:
+    """Process-wide store for a models directory"""
+    key = str(Path(models_path).resolve())
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = ModelStore(key)
+        return _stores[key]
@@ -0,0 +1,235 @@
+"""
+Content-addressed cache for LLM-generated diet and workout plans
+Plans are keyed on a bucketed profile fingerprint plus the prompt template version
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from backend.config import get_config
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Profile fields each prompt actually depends on
+PLAN_FIELDS = {
+    'diet': ('age', 'gender', 'height', 'weight', 'goal', 'diet_preference', 'activity_level'),
+    'workout': ('age', 'gender', 'height', 'weight', 'goal', 'activity_level', 'workout_time'),
+    'weekly': ('age', 'gender', 'height', 'weight', 'goal', 'diet_preference', 'activity_level',
+               'workout_time', 'plan_days')
+}
+
+# Rounding band for numeric fields (years, cm, kg)
+BUCKET_SIZES = {
+    'age': 5,
+    'height': 5,
+    'weight': 2
+}
+
+
+def _bucket(value, size):
+    return int(round(float(value) / size) * size)
+
+
+def profile_fingerprint(kind: str, user_data: Dict[str, Any], template_version: str) -> str:
+    """Stable hash of the normalized, bucketed profile fields used by a plan prompt"""
+    normalized = {}
+    for field in PLAN_FIELDS[kind]:
+        value = user_data.get(field)
+        if value is None:
+            normalized[field] = None
+        elif field in BUCKET_SIZES:
+            normalized[field] = _bucket(value, BUCKET_SIZES[field])
+        else:
+            normalized[field] = str(value).strip().lower()
+    payload = json.dumps(
+        {'kind': kind, 'version': template_version, 'profile': normalized},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PlanCache:
+    """
+    Two-tier plan cache: an in-memory LRU in front of a persistent SQLite table
+    Both tiers honour the TTL; each tier evicts least recently used entries when full
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: int = 1024,
+                 ttl_seconds: float = 7 * 24 * 3600, persistent_max_entries: int = 50000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent_max_entries = persistent_max_entries
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = {
+            'memory_hits': 0,
+            'persistent_hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'evictions': 0,
+            'expirations': 0
+        }
+
+        if self.db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS plan_cache (
+                        key TEXT PRIMARY KEY,
+                        kind TEXT NOT NULL,
+                        plan TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        expires_at REAL NOT NULL,
+                        last_access REAL NOT NULL
+                    )
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_plan_cache_last_access ON plan_cache (last_access)')
+
+    def _connect(self):
+        """One SQLite connection per thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached plan, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, plan = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._counters['memory_hits'] += 1
+                    return copy.deepcopy(plan)
+                del self._memory[key]
+                self._counters['expirations'] += 1
+
+        if self.db_path:
+            try:
+                plan = self._get_persistent(key, now)
+            except sqlite3.Error as e:
+                logger.warning(f"Plan cache read failed: {e}")
+                plan = None
+            if plan is not None:
+                self._count('persistent_hits')
+                return copy.deepcopy(plan)
+
+        self._count('misses')
+        return None
+
+    def _get_persistent(self, key, now):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT plan, expires_at FROM plan_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            plan_json, expires_at = row
+            if expires_at <= now:
+                conn.execute('DELETE FROM plan_cache WHERE key = ?', (key,))
+                self._count('expirations')
+                return None
+            conn.execute('UPDATE plan_cache SET last_access = ? WHERE key = ?', (now, key))
+        plan = json.loads(plan_json)
+        self._set_memory(key, expires_at, plan)
+        return plan
+
+    def set(self, key: str, kind: str, plan: Dict[str, Any]):
+        """Store a plan in both tiers"""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        plan = copy.deepcopy(plan)
+        self._set_memory(key, expires_at, plan)
+        self._count('sets')
+
+        if self.db_path:
+            try:
+                self._set_persistent(key, kind, plan, now, expires_at)
+            except sqlite3.Error as e:
+                logger.warning(f"Plan cache write failed: {e}")
+
+    def _set_memory(self, key, expires_at, plan):
+        with self._lock:
+            self._memory[key] = (expires_at, plan)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def _set_persistent(self, key, kind, plan, now, expires_at):
+        with self._connect() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO plan_cache (key, kind, plan, created_at, expires_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (key, kind, json.dumps(plan), now, expires_at, now))
+            conn.execute('DELETE FROM plan_cache WHERE expires_at <= ?', (now,))
+            (count,) = conn.execute('SELECT COUNT(*) FROM plan_cache').fetchone()
+            overflow = count - self.persistent_max_entries
+            if overflow > 0:
+                conn.execute('''
+                    DELETE FROM plan_cache WHERE key IN (
+                        SELECT key FROM plan_cache ORDER BY last_access LIMIT ?
+                    )
+                ''', (overflow,))
+                self._count('evictions', overflow)
+
+    def clear(self):
+        """Drop every cached plan"""
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM plan_cache')
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['memory_entries'] = len(self._memory)
+        hits = stats['memory_hits'] + stats['persistent_hits']
+        lookups = hits + stats['misses']
+        stats['hit_rate'] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_plan_cache = None
+_plan_cache_lock = threading.Lock()
+
+
+def get_plan_cache(config=None) -> Optional[PlanCache]:
+    """Process-wide plan cache, or None when disabled in config"""
+    global _plan_cache
+    config = config or get_config()
+    if not config.PLAN_CACHE_ENABLED:
+        return None
+    if _plan_cache is None:
+        with _plan_cache_lock:
+            if _plan_cache is None:
+                _plan_cache = PlanCache(
+                    db_path=config.PLAN_CACHE_PATH or None,
+                    max_entries=config.PLAN_CACHE_MAX_ENTRIES,
+                    ttl_seconds=config.PLAN_CACHE_TTL,
+                    persistent_max_entries=config.PLAN_CACHE_PERSISTENT_MAX_ENTRIES
+                )
+    return _plan_cache
@@ -0,0 +1,187 @@
+"""
+Cluster-level diet plan library
+An offline job asks Gemini for one curated diet plan per (cluster, diet_preference,
+goal) segment of the trained KMeans model and stores them as a JSON artifact in
+MODELS_PATH. At request time a user is assigned to a cluster locally and the
+segment's plan is scaled to their target calories, so a profile save needs no
+LLM call for the diet plan; Gemini stays available for personalized plans
+
+Usage: python backend/plan_library.py [--models-path PATH]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from backend.config import get_config
+from backend.gemini_service import MEAL_NUTRIENTS, MEAL_TYPES, submit_llm_task
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LIBRARY_FILE = 'diet_plan_library.json'
+
+
+def library_key(cluster: int, diet_preference: str, goal: str) -> str:
+    return f'{cluster}:{diet_preference}:{goal}'
+
+
+def kmeans_fingerprint(kmeans) -> str:
+    """Hash of the cluster centers; a library is only valid for the model it was built from"""
+    centers = np.ascontiguousarray(kmeans.cluster_centers_, dtype=np.float64)
+    return hashlib.sha256(centers.tobytes()).hexdigest()
+
+
+def normalize_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a generated diet plan to the fields the library stores and scales"""
+    target_calories = plan.get('target_calories')
+    if not isinstance(target_calories, (int, float)) or target_calories <= 0:
+        raise ValueError(f"target_calories must be positive, got {target_calories!r}")
+    meal_plan = {}
+    for meal_type in MEAL_TYPES:
+        meal = plan['meal_plan'][meal_type]
+        meal_plan[meal_type] = {'name': meal['name'], **{nutrient: meal[nutrient] for nutrient in MEAL_NUTRIENTS}}
+    return {
+        'target_calories': target_calories,
+        'macros': {nutrient: plan['macros'][nutrient] for nutrient in ('protein', 'carbs', 'fat')},
+        'meal_plan': meal_plan,
+        'recommendations': plan.get('recommendations', '')
+    }
+
+
+def scale_plan(plan: Dict[str, Any], target_calories: float) -> Dict[str, Any]:
+    """Scale every meal and the macros of a library plan to a new calorie target"""
+    factor = target_calories / plan['target_calories']
+    return {
+        'target_calories': target_calories,
+        'meal_plan': {
+            meal_type: {
+                'name': meal['name'],
+                **{nutrient: int(round(meal[nutrient] * factor)) for nutrient in MEAL_NUTRIENTS}
+            }
+            for meal_type, meal in plan['meal_plan'].items()
+        },
+        'macros': {nutrient: int(round(grams * factor)) for nutrient, grams in plan['macros'].items()},
+        'recommendations': plan.get('recommendations', '')
+    }
+
+
+class PlanLibrary:
+    """
+    Segment plans keyed by library_key(cluster, diet_preference, goal)
+    """
+
+    def __init__(self, plans: Dict[str, Dict[str, Any]], kmeans_fingerprint: str,
+                 metadata: Optional[Dict[str, Any]] = None):
+        self.plans = plans
+        self.kmeans_fingerprint = kmeans_fingerprint
+        self.metadata = metadata or {}
+
+    def __len__(self):
+        return len(self.plans)
+
+    def get(self, cluster: int, diet_preference: str, goal: str) -> Optional[Dict[str, Any]]:
+        return self.plans.get(library_key(cluster, diet_preference, goal))
+
+    def save(self, path):
+        """Write the library as JSON, atomically replacing the previous file"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'kmeans_fingerprint': self.kmeans_fingerprint, 'metadata': self.metadata, 'plans': self.plans},
+                      f, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path) -> Optional['PlanLibrary']:
+        """The library stored at path, or None when there is none or it cannot be read"""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            return cls(data['plans'], data['kmeans_fingerprint'], data.get('metadata'))
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable plan library {path}: {e}")
+            return None
+
+
+def build_plan_library(diet_system, service=None, path=None) -> PlanLibrary:
+    """
+    Generate a plan for every segment of diet_system's trained KMeans model and save the library
+    Segments whose generation fails are left out and listed in the metadata
+    """
+    service = service or diet_system.gemini_service
+    path = path or Path(diet_system.config.MODELS_PATH) / LIBRARY_FILE
+    segments = list(diet_system.segment_profiles())
+    start = time.perf_counter()
+
+    # The shared LLM executor and limiter bound how many segments are generated at once
+    futures = {
+        library_key(cluster, profile['diet_preference'], profile['goal']):
+            (profile, submit_llm_task(service.generate_library_diet_plan, profile))
+        for cluster, profile in segments
+    }
+    plans = {}
+    failed = []
+    for key, (profile, future) in futures.items():
+        try:
+            plans[key] = {**normalize_plan(future.result()), 'profile': profile}
+        except Exception as e:
+            logger.warning(f"⚠️ No library plan for segment {key}: {e}")
+            failed.append(key)
+
+    library = PlanLibrary(plans, kmeans_fingerprint(diet_system.kmeans), {
+        'generated_at': datetime.now().isoformat(),
+        'model': diet_system.config.GEMINI_MODEL,
+        'prompt_version': service.template_version,
+        'segments': len(segments),
+        'failed': failed
+    })
+    library.save(path)
+    logger.info(f"✅ Plan library with {len(plans)}/{len(segments)} segments written to {path} "
+                f"in {time.perf_counter() - start:.1f}s")
+    return library
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the cluster-level diet plan library with Gemini")
+    parser.add_argument('--models-path', help='directory with the trained diet models (default: MODELS_PATH)')
+    args = parser.parse_args(argv)
+
+    from backend.ml_models import DietRecommendationSystem
+
+    overrides = {'MODELS_PATH': args.models_path} if args.models_path else {}
+    config = type('LibraryConfig', (get_config(),), overrides)
+    diet_system = DietRecommendationSystem(config)
+    if not diet_system.load_models():
+        print("❌ Diet models not found; run 'python backend/training_pipeline.py' first")
+        return None
+    if diet_system.gemini_service.model is None:
+        print("❌ GEMINI_API_KEY is required to generate the plan library")
+        return None
+
+    library = build_plan_library(diet_system)
+    print(f"✓ {len(library)} of {library.metadata['segments']} segment plans generated")
+    for key in library.metadata['failed']:
+        print(f"⚠ {key}: generation failed, requests in this segment use Gemini directly")
+    return library
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Off-peak pre-generation of next-day plans
+Walks the profiles of recently active users in pages, generates each user's diet
+and workout plans for the next day on a thread pool under one LLM rate budget,
+and writes every page with a single bulk insert. Morning traffic then reads the
+stored plans instead of generating them on the request path
+
+Usage: python backend/plan_scheduler.py [--date YYYY-MM-DD] [--now] [--force] [--workers N] [--rate N]
+"""
+
+import argparse
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date as date_type, datetime, time as time_of_day, timedelta
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from backend.config import get_config
+from backend.database_setup import DatabaseManager
+from backend.gemini_service import LLMRateLimiter
+from backend.metrics import log_event
+from backend.ml_models import DietRecommendationSystem, WorkoutRecommendationSystem
+from backend.resilience import CircuitOpenError
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_window(window: str) -> Tuple[time_of_day, time_of_day]:
+    """(start, end) times of an 'HH:MM-HH:MM' window; the window may wrap past midnight"""
+    try:
+        start, end = (datetime.strptime(part.strip(), '%H:%M').time() for part in window.split('-'))
+    except ValueError:
+        raise ValueError(f"Invalid window {window!r}, expected HH:MM-HH:MM")
+    return start, end
+
+
+def in_window(now: datetime, window: Tuple[time_of_day, time_of_day]) -> bool:
+    start, end = window
+    current = now.time()
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end
+
+
+class PlanScheduler:
+    """
+    Generates plans for one date for every active user that has none yet
+    Only plans from the plan library or Gemini are stored; users whose generation fails
+    are counted as failed and retried on the next run instead of getting the rule-based plan.
+    Stops taking new pages once the off-peak window closes or the LLM circuit opens;
+    users left over keep generating plans on the request path
+    """
+
+    def __init__(self, db: DatabaseManager, diet_system, workout_system, config=None, workers: Optional[int] = None,
+                 rate_limit: Optional[float] = None, batch_size: Optional[int] = None, clock=datetime.now):
+        self.config = config or get_config()
+        self.db = db
+        self.diet_system = diet_system
+        self.workout_system = workout_system
+        self.workers = workers or self.config.PLAN_SCHEDULER_WORKERS
+        self.batch_size = batch_size or self.config.PLAN_SCHEDULER_BATCH_SIZE
+        self.window = parse_window(self.config.PLAN_SCHEDULER_WINDOW)
+        self._clock = clock
+
+        rate_limit = self.config.PLAN_SCHEDULER_RATE_LIMIT if rate_limit is None else rate_limit
+        self.service = diet_system.gemini_service
+        # One budget for every worker thread; only calls that reach Gemini spend it.
+        # It applies to the scheduler's threads alone, not to other users of the shared service
+        self.rate_limiter = LLMRateLimiter(rate_limit / 60, burst=self.workers) if rate_limit > 0 else None
+
+    def generate_user_plans(self, profile: Dict[str, Any]):
+        """(diet plan, workout plan) for one user; raises instead of falling back to rule-based plans"""
+        if self.service.breaker.state == 'open':
+            raise CircuitOpenError("Circuit open: skipping plan generation")
+        if self.rate_limiter is None:
+            return self._generate_user_plans(profile)
+        with self.service.rate_limited(self.rate_limiter):
+            return self._generate_user_plans(profile)
+
+    def _generate_user_plans(self, profile: Dict[str, Any]):
+        diet_plan = self.diet_system.predict_diet_plan(dict(profile), fallback=False)
+        workout_plan = self.workout_system.generate_workout_plan(dict(profile), fallback=False)
+        return diet_plan, workout_plan
+
+    def _stop_reason(self, ignore_window: bool) -> Optional[str]:
+        if not ignore_window and not in_window(self._clock(), self.window):
+            return 'window_closed'
+        if self.service.breaker.state == 'open':
+            return 'circuit_open'
+        return None
+
+    def run(self, plan_date: Optional[date_type] = None, force: bool = False,
+            ignore_window: bool = False) -> Dict[str, Any]:
+        """
+        Generate and store plans for plan_date (default: tomorrow) and return run statistics
+        With force, users who already have plans for the date are regenerated too
+        """
+        now = self._clock()
+        plan_date = plan_date or (now + timedelta(days=1)).date()
+        since = now - timedelta(days=self.config.PLAN_SCHEDULER_ACTIVE_DAYS)
+        stats = {'date': str(plan_date), 'status': 'completed', 'users': 0, 'saved': 0, 'failed': 0, 'batches': 0}
+        if not ignore_window and not in_window(now, self.window):
+            stats['status'] = 'outside_window'
+            logger.info(f"⏭ Outside the off-peak window {self.config.PLAN_SCHEDULER_WINDOW}, nothing to do")
+            return stats
+
+        start = time.perf_counter()
+        after_user_id = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='plan-scheduler') as executor:
+            while True:
+                reason = self._stop_reason(ignore_window)
+                if reason:
+                    stats['status'] = reason
+                    logger.warning(f"⚠️ Plan pre-generation stopped early: {reason}")
+                    break
+                page = self.db.get_active_profiles(
+                    since, plan_date, after_user_id=after_user_id, limit=self.batch_size, missing_only=not force
+                )
+                if not page:
+                    break
+                after_user_id = page[-1][0]
+
+                futures = [(user_id, executor.submit(self.generate_user_plans, profile))
+                           for user_id, profile in page]
+                diet_plans, workout_plans = [], []
+                for user_id, future in futures:
+                    try:
+                        diet_plan, workout_plan = future.result()
+                    except Exception as e:
+                        logger.error(f"Plan generation failed for user {user_id}: {e}")
+                        stats['failed'] += 1
+                        continue
+                    diet_plans.append((user_id, plan_date, diet_plan['meal_plan']))
+                    workout_plans.append((user_id, plan_date, workout_plan))
+
+                if diet_plans:
+                    self.db.save_plans_bulk(diet_plans=diet_plans, workout_plans=workout_plans)
+                stats['users'] += len(page)
+                stats['saved'] += len(diet_plans)
+                stats['batches'] += 1
+                logger.info(f"📅 {stats['saved']} users have plans for {plan_date} ({stats['failed']} failed)")
+
+        stats['duration'] = round(time.perf_counter() - start, 3)
+        if self.rate_limiter is not None:
+            stats['rate_limiter'] = self.rate_limiter.stats()
+        log_event('plan_scheduler_run', **{k: v for k, v in stats.items() if k != 'rate_limiter'})
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate next-day plans for active users during off-peak hours")
+    parser.add_argument('--date', type=lambda value: datetime.strptime(value, '%Y-%m-%d').date(),
+                        help='plan date (default: tomorrow)')
+    parser.add_argument('--now', action='store_true', help='run even outside PLAN_SCHEDULER_WINDOW')
+    parser.add_argument('--force', action='store_true', help='regenerate plans that already exist for the date')
+    parser.add_argument('--workers', type=int, help='generation threads (default: PLAN_SCHEDULER_WORKERS)')
+    parser.add_argument('--rate', type=float, help='LLM calls per minute, 0 for no limit (default: PLAN_SCHEDULER_RATE_LIMIT)')
+    parser.add_argument('--batch-size', type=int, help='users per bulk insert (default: PLAN_SCHEDULER_BATCH_SIZE)')
+    args = parser.parse_args(argv)
+
+    config = get_config()
+    db = DatabaseManager.from_config(config)
+    diet_system = DietRecommendationSystem(config)
+    diet_system.load_models()
+    workout_system = WorkoutRecommendationSystem(config)
+
+    scheduler = PlanScheduler(db, diet_system, workout_system, config, workers=args.workers,
+                              rate_limit=args.rate, batch_size=args.batch_size)
+    try:
+        stats = scheduler.run(plan_date=args.date, force=args.force, ignore_window=args.now)
+    finally:
+        db.close()
+    print(f"{'✓' if stats['status'] == 'completed' else '⚠'} {stats['status']}: plans for {stats['saved']} of "
+          f"{stats['users']} users on {stats['date']} ({stats['failed']} failed)")
+    return stats
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Typed definitions of the JSON documents Gemini returns for each plan
+Keys declared on the total=False base classes are optional; all others are required.
+A Union field accepts any of its types and is described to Gemini as the first one.
+The same definitions are compiled into Gemini response schemas and rendered as
+JSON examples for free-text prompts
+"""
+
+import json
+from typing import Any, Dict, List, TypedDict, Union, get_type_hints
+
+
+class Macros(TypedDict):
+    protein: float
+    carbs: float
+    fat: float
+
+
+class _MealOptional(TypedDict, total=False):
+    time: str
+
+
+class Meal(_MealOptional):
+    name: str
+    calories: float
+    protein: float
+    carbs: float
+    fat: float
+
+
+class MealPlan(TypedDict):
+    breakfast: Meal
+    lunch: Meal
+    dinner: Meal
+
+
+class _DietPlanOptional(TypedDict, total=False):
+    recommendations: str
+
+
+class DietPlan(_DietPlanOptional):
+    target_calories: float
+    macros: Macros
+    meal_plan: MealPlan
+
+
+class _ExerciseOptional(TypedDict, total=False):
+    sets: int
+    # A count (12) or a description ("10-12", "30 seconds")
+    reps: Union[str, int]
+    duration: int
+    calories: float
+    instructions: str
+    muscle_groups: List[str]
+
+
+class Exercise(_ExerciseOptional):
+    name: str
+
+
+class _WorkoutPlanOptional(TypedDict, total=False):
+    name: str
+    description: str
+    duration: int
+    difficulty: str
+    estimated_calories: float
+    equipment_needed: List[str]
+    tips: str
+
+
+class WorkoutPlan(_WorkoutPlanOptional):
+    exercises: List[Exercise]
+
+
+class _CustomWorkoutOptional(TypedDict, total=False):
+    total_duration: int
+    total_calories: float
+
+
+class CustomWorkout(_CustomWorkoutOptional):
+    workout_name: str
+    exercises: List[Exercise]
+
+
+class DayPlan(TypedDict):
+    meal_plan: MealPlan
+    workout: WorkoutPlan
+
+
+class _WeeklyPlanOptional(TypedDict, total=False):
+    recommendations: str
+
+
+class WeeklyPlan(_WeeklyPlanOptional):
+    target_calories: float
+    macros: Macros
+    days: List[DayPlan]
+
+
+class _CalorieExplanationOptional(TypedDict, total=False):
+    explanation: str
+    factors: List[str]
+
+
+class CalorieExplanation(_CalorieExplanationOptional):
+    calories_burned: float
+
+
+def is_typed_dict(schema) -> bool:
+    return isinstance(schema, type) and issubclass(schema, dict) and hasattr(schema, '__annotations__')
+
+
+def schema_fields(schema):
+    """(key, type, required) for each field of a TypedDict, required fields first"""
+    hints = get_type_hints(schema)
+    # __required_keys__ is missing on Python 3.8, where totality is per class only
+    required = getattr(schema, '__required_keys__', frozenset(hints) if schema.__total__ else frozenset())
+    fields = [(key, field_type, key in required) for key, field_type in hints.items()]
+    return sorted(fields, key=lambda field: not field[2])
+
+
+_JSON_TYPES = {str: 'string', int: 'integer', float: 'number', bool: 'boolean'}
+
+
+def union_types(schema):
+    """Member types of a Union field, or None for any other schema"""
+    return schema.__args__ if getattr(schema, '__origin__', None) is Union else None
+
+
+def response_schema(schema) -> Dict[str, Any]:
+    """Compile a plan definition into the OpenAPI-style schema accepted as a Gemini response_schema"""
+    if union_types(schema):
+        # Response schemas have no unions
+        return response_schema(union_types(schema)[0])
+    if getattr(schema, '__origin__', None) is list:
+        return {'type': 'array', 'items': response_schema(schema.__args__[0])}
+    if is_typed_dict(schema):
+        fields = schema_fields(schema)
+        return {
+            'type': 'object',
+            'properties': {key: response_schema(field_type) for key, field_type, _ in fields},
+            'required': [key for key, _, required in fields if required]
+        }
+    return {'type': _JSON_TYPES[schema]}
+
+
+def _example_value(schema):
+    if union_types(schema):
+        return _example_value(union_types(schema)[0])
+    if getattr(schema, '__origin__', None) is list:
+        return [_example_value(schema.__args__[0])]
+    if is_typed_dict(schema):
+        return {key: _example_value(field_type) for key, field_type, _ in schema_fields(schema)}
+    return 'string' if schema is str else '<number>'
+
+
+def schema_example(schema) -> str:
+    """JSON example of a plan definition for prompts that describe the format in text"""
+    return json.dumps(_example_value(schema), indent=4).replace('"<number>"', 'number')
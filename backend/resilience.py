@@ -0,0 +1,144 @@
+"""
+Failure handling for calls to slow or unreliable providers
+A CircuitBreaker stops calling a provider that keeps failing and probes it
+again after a cool-down; call_with_deadline bounds each call and can hedge it
+with a second attempt when the first is slower than usual
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider while its circuit is open"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call does not finish within its deadline"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+    After failure_threshold failures in a row the circuit opens and calls are
+    rejected for reset_timeout seconds; then one probe call is let through
+    (half-open) and its outcome closes or re-opens the circuit
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._trips = 0
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == 'open' and self._clock() - self._opened_at >= self.reset_timeout:
+                return 'half_open'
+            return self._state
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go ahead now"""
+        with self._lock:
+            if self._state == 'open':
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    self._rejected += 1
+                    raise CircuitOpenError("Circuit open: provider calls are suspended")
+                self._state = 'half_open'
+                self._probe_in_flight = False
+            if self._state == 'half_open':
+                if self._probe_in_flight:
+                    self._rejected += 1
+                    raise CircuitOpenError("Circuit half-open: waiting for the probe call")
+                self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != 'closed':
+                logger.info("✅ Circuit closed: provider recovered")
+            self._state = 'closed'
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def release(self):
+        """Forget a call that ended without an outcome, such as a cancelled stream"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == 'half_open' or (self._state == 'closed' and self._failures >= self.failure_threshold):
+                if self._state == 'closed':
+                    self._trips += 1
+                logger.warning(f"⚠️ Circuit open after {self._failures} consecutive failures")
+                self._state = 'open'
+                self._opened_at = self._clock()
+                self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {
+                'state': state,
+                'open': int(state == 'open'),
+                'consecutive_failures': self._failures,
+                'trips': self._trips,
+                'rejected': self._rejected
+            }
+
+
+def call_with_deadline(fn: Callable[[], Any], executor: Executor, timeout: Optional[float] = None,
+                       hedge_after: Optional[float] = None,
+                       hedge: Optional[Callable[[], Optional[Callable[[], Any]]]] = None) -> Tuple[Any, int]:
+    """
+    Run fn() on the executor and return (result, attempts started)
+    Raises DeadlineExceeded after timeout seconds; the abandoned attempt keeps its
+    thread until it returns. With hedge_after, a second attempt is started if the
+    first has not finished by then and the earliest successful result wins. An
+    attempt that fails is only retried through a hedge that is already running.
+    `hedge`, when given, is called at that point and returns the function to run
+    as the second attempt, or None to skip hedging, e.g. when no capacity is free
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    pending = {executor.submit(fn)}
+    attempts = 1
+    error = None
+
+    def remaining():
+        return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+    if hedge_after is not None and (timeout is None or hedge_after < timeout):
+        done, pending = wait(pending, timeout=hedge_after)
+        if not done:
+            hedge_fn = fn if hedge is None else hedge()
+            if hedge_fn is not None:
+                pending.add(executor.submit(hedge_fn))
+                attempts += 1
+        else:
+            pending = done
+
+    while pending:
+        done, pending = wait(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+        if not done:
+            raise DeadlineExceeded(f"No response within {timeout:g}s")
+        for future in done:
+            if future.exception() is None:
+                return future.result(), attempts
+            error = future.exception()
+    raise error
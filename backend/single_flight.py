@@ -0,0 +1,171 @@
+"""
+Single-flight coalescing for plan generation
+Concurrent callers asking for the same key share one in-flight call. Within a
+process, followers wait on the leader's future. Across worker processes on one
+host, the leader holds a leased row in a SQLite lock table (kept in the plan
+cache database); workers that find the row taken wait for it to go away and
+then read the plan the leader cached instead of generating it again
+"""
+
+import copy
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Runs fn() once per key at a time and hands its result to every concurrent caller
+    The leader renews its lease while fn() runs, so a slow call keeps the lock and
+    a lock held by a worker that died is taken over after lease_seconds
+    """
+
+    def __init__(self, lock_path: Optional[str] = None, lease_seconds: float = 120.0, poll_interval: float = 0.25):
+        self.lock_path = lock_path
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = {
+            'leaders': 0,
+            'coalesced': 0,
+            'peer_waits': 0,
+            'peer_results': 0
+        }
+
+        if self.lock_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS plan_locks (
+                        key TEXT PRIMARY KEY,
+                        owner TEXT NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                ''')
+
+    def _connect(self):
+        """One SQLite connection per thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.lock_path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def do(self, key: str, fn: Callable[[], Any], lookup: Optional[Callable[[], Any]] = None):
+        """
+        Return fn()'s result, sharing one call among concurrent callers with the same key
+        lookup() is tried after waiting for another process to finish the key; a non-None
+        value is returned instead of calling fn. Every caller receives its own deep copy
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self._counters['leaders'] += 1
+            else:
+                self._counters['coalesced'] += 1
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            result = self._run_locked(key, fn, lookup)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return copy.deepcopy(result)
+
+    def _run_locked(self, key, fn, lookup):
+        if not self.lock_path:
+            return fn()
+        owner = uuid.uuid4().hex
+        if not self._try_acquire(key, owner):
+            self._count('peer_waits')
+            logger.info(f"⏳ Waiting for another worker generating {key[:12]}")
+            # The row disappears when the other worker finishes or its lease runs out
+            while not self._try_acquire(key, owner):
+                time.sleep(self.poll_interval)
+            if lookup is not None:
+                result = lookup()
+                if result is not None:
+                    self._release(key, owner)
+                    self._count('peer_results')
+                    return result
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._renew_lease, args=(key, owner, stop),
+                                     name=f'plan-lock-{key[:12]}', daemon=True)
+        heartbeat.start()
+        try:
+            return fn()
+        finally:
+            stop.set()
+            heartbeat.join()
+            self._release(key, owner)
+
+    def _renew_lease(self, key, owner, stop):
+        """Push the lease expiry forward every third of a lease until stop is set"""
+        try:
+            while not stop.wait(self.lease_seconds / 3):
+                try:
+                    with self._connect() as conn:
+                        cursor = conn.execute(
+                            'UPDATE plan_locks SET expires_at = ? WHERE key = ? AND owner = ?',
+                            (time.time() + self.lease_seconds, key, owner)
+                        )
+                    if cursor.rowcount == 0:
+                        logger.warning(f"⚠️ Plan lock for {key[:12]} was lost; another worker may generate it too")
+                        return
+                except sqlite3.Error as e:
+                    logger.warning(f"Plan lock renewal failed: {e}")
+        finally:
+            conn = getattr(self._local, 'conn', None)
+            if conn is not None:
+                conn.close()
+
+    def _try_acquire(self, key, owner) -> bool:
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM plan_locks WHERE key = ? AND expires_at <= ?', (key, now))
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO plan_locks (key, owner, expires_at) VALUES (?, ?, ?)',
+                    (key, owner, now + self.lease_seconds)
+                )
+                return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            # Without the lock table, duplicate work is preferable to a stuck request
+            logger.warning(f"Plan lock unavailable: {e}")
+            return True
+
+    def _release(self, key, owner):
+        try:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM plan_locks WHERE key = ? AND owner = ?', (key, owner))
+        except sqlite3.Error as e:
+            logger.warning(f"Plan lock release failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'in_flight': len(self._calls), **self._counters}
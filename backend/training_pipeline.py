@@ -0,0 +1,269 @@
+"""
+Training pipeline for the AI Diet and Workout System
+Trains independent models in parallel worker processes, skips models whose
+data and hyperparameter fingerprint is unchanged, and publishes versioned
+artifacts atomically: every model is trained into its own version directory
+and the manifest, which ModelStore resolves, is switched to them in one write
+
+Usage: python backend/training_pipeline.py [--models diet calorie] [--force] [--n-jobs N]
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+import sklearn
+
+from backend.config import get_config
+from backend.ml_models import DietRecommendationSystem, WorkoutRecommendationSystem, CalorieBurnPredictor
+from backend.model_store import MANIFEST_FILE, VERSIONS_DIR
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PIPELINE_MODELS = ('diet', 'calorie')
+
+# Config attributes forwarded to worker processes
+TRAINING_SETTINGS = (
+    'MODELS_PATH', 'TRAINING_DIET_SAMPLES', 'TRAINING_CALORIE_SAMPLES', 'TRAINING_SEED'
+)
+
+
+def model_artifacts(name):
+    """Files written by a model's trainer"""
+    if name == 'diet':
+        return list(DietRecommendationSystem.MODEL_FILES.values())
+    return [CalorieBurnPredictor.SKLEARN_MODEL_FILE] + list(CalorieBurnPredictor.MODEL_FILES.values())
+
+
+def _worker_config(settings):
+    """Config class for a worker process built from plain (picklable) settings"""
+    return type('TrainingConfig', (get_config(),), dict(settings))
+
+
+def model_fingerprint(name, settings):
+    """
+    Hash of everything that determines a trained model: data settings and code
+    The hyperparameters are set in __init__, so its source covers them without building the model
+    """
+    if name == 'diet':
+        code = [DietRecommendationSystem.__init__, DietRecommendationSystem.prepare_sample_data,
+                DietRecommendationSystem.train_models]
+        n_samples = settings['TRAINING_DIET_SAMPLES']
+    else:
+        code = [CalorieBurnPredictor.__init__, CalorieBurnPredictor.prepare_training_data,
+                CalorieBurnPredictor.train_model]
+        n_samples = settings['TRAINING_CALORIE_SAMPLES']
+
+    payload = {
+        'model': name,
+        'n_samples': n_samples,
+        'seed': settings['TRAINING_SEED'],
+        'code': hashlib.sha256(''.join(inspect.getsource(fn) for fn in code).encode()).hexdigest(),
+        'sklearn': sklearn.__version__
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=repr).encode()).hexdigest()
+
+
+def _train_model(name, settings, output_dir, n_jobs):
+    """Train one model into output_dir (runs in a worker process)"""
+    config = _worker_config({**settings, 'MODELS_PATH': str(output_dir)})
+    start = time.perf_counter()
+    if name == 'diet':
+        DietRecommendationSystem(config).train_models()
+        score = None
+    else:
+        score = float(CalorieBurnPredictor(config).train_model(n_jobs=n_jobs))
+    return {'score': score, 'duration': time.perf_counter() - start}
+
+
+def _atomic_write_json(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _prune_versions(models_path, name, keep, current):
+    """Remove all but the newest `keep` versions of a model, never the published one"""
+    versions = sorted((models_path / VERSIONS_DIR / name).iterdir())
+    for old in versions[:-keep] if keep > 0 else versions:
+        if old.name != current:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+class TrainingPipeline:
+    """
+    Trains the requested models, in parallel when more than one needs training
+    """
+
+    def __init__(self, config=None, workers=None, n_jobs=None, keep_versions=None):
+        self.config = config or get_config()
+        self.settings = {key: getattr(self.config, key) for key in TRAINING_SETTINGS}
+        self.models_path = Path(self.config.MODELS_PATH)
+        self.workers = workers
+        self.n_jobs = self.config.TRAINING_RF_N_JOBS if n_jobs is None else n_jobs
+        self.keep_versions = self.config.TRAINING_KEEP_VERSIONS if keep_versions is None else keep_versions
+
+    @property
+    def manifest_path(self):
+        return self.models_path / MANIFEST_FILE
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def is_current(self, name, fingerprint, manifest):
+        """True when the published artifacts were built from the same fingerprint"""
+        entry = manifest.get(name)
+        if entry is None or entry.get('fingerprint') != fingerprint:
+            return False
+        version_dir = self.models_path / VERSIONS_DIR / name / entry['version']
+        return all((version_dir / f).exists() for f in model_artifacts(name))
+
+    def run(self, models=PIPELINE_MODELS, force=False):
+        """Train stale models and return a result per model"""
+        self.models_path.mkdir(parents=True, exist_ok=True)
+        manifest = self.load_manifest()
+        results = {}
+        pending = {}
+        for name in models:
+            fingerprint = model_fingerprint(name, self.settings)
+            if not force and self.is_current(name, fingerprint, manifest):
+                logger.info(f"⏭️ {name} model unchanged (fingerprint {fingerprint[:12]}), skipping")
+                results[name] = {'status': 'skipped', **manifest[name]}
+                continue
+            version = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{fingerprint[:12]}"
+            version_dir = self.models_path / VERSIONS_DIR / name / version
+            version_dir.mkdir(parents=True, exist_ok=True)
+            pending[name] = (fingerprint, version, version_dir)
+
+        if pending:
+            workers = self.workers or len(pending)
+            start = time.perf_counter()
+            if workers > 1 and len(pending) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = {
+                        name: pool.submit(_train_model, name, self.settings, version_dir, self.n_jobs)
+                        for name, (_, _, version_dir) in pending.items()
+                    }
+                    outcomes = {name: future.result() for name, future in futures.items()}
+            else:
+                outcomes = {
+                    name: _train_model(name, self.settings, version_dir, self.n_jobs)
+                    for name, (_, _, version_dir) in pending.items()
+                }
+            logger.info(f"Trained {len(pending)} model(s) in {time.perf_counter() - start:.1f}s")
+
+            # Publish only after every trainer succeeded: one manifest write switches all new versions in
+            for name, (fingerprint, version, version_dir) in pending.items():
+                manifest[name] = {
+                    'fingerprint': fingerprint,
+                    'version': version,
+                    'trained_at': datetime.now().isoformat(),
+                    'files': model_artifacts(name),
+                    **outcomes[name]
+                }
+                results[name] = {'status': 'trained', **manifest[name]}
+            _atomic_write_json(self.manifest_path, manifest)
+            for name, (_, version, _) in pending.items():
+                _prune_versions(self.models_path, name, self.keep_versions, version)
+
+        return results
+
+
+def smoke_test(config, include_gemini=False):
+    """Score a sample user with the published models (Gemini plans only when requested)"""
+    sample_user = {
+        'age': 28,
+        'weight': 70,
+        'height': 175,
+        'gender': 'male',
+        'activity_level': 'moderate',
+        'goal': 'weight-loss',
+        'diet_preference': 'non-vegan',
+        'workout_time': '30-45'
+    }
+    calorie_predictor = CalorieBurnPredictor(config)
+    calorie_predictor.load_model()
+    workout_data = {'type': 'mixed', 'intensity': 'moderate', 'duration': 37}
+    print(f"Predicted Calorie Burn: {calorie_predictor.predict_calories(sample_user, workout_data)} calories")
+
+    if include_gemini:
+        diet_plan = DietRecommendationSystem(config).predict_diet_plan(sample_user)
+        print(f"Sample Diet Plan - Target Calories: {diet_plan['target_calories']:.0f}")
+        print(f"Macros - Protein: {diet_plan['macros']['protein']}g, Carbs: {diet_plan['macros']['carbs']}g, Fat: {diet_plan['macros']['fat']}g")
+        workout_plan = WorkoutRecommendationSystem(config).generate_workout_plan(sample_user)
+        print(f"Sample Workout: {workout_plan['name']} - {workout_plan['duration']} minutes")
+        print(f"Estimated Calories: {workout_plan['estimated_calories']}")
+
+    return calorie_predictor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the diet and calorie models")
+    parser.add_argument('--models', nargs='+', choices=PIPELINE_MODELS, default=list(PIPELINE_MODELS))
+    parser.add_argument('--force', action='store_true', help='retrain even when the fingerprint is unchanged')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per model)')
+    parser.add_argument('--n-jobs', type=int, help='Random Forest n_jobs (default: TRAINING_RF_N_JOBS)')
+    parser.add_argument('--models-path', help='output directory (default: MODELS_PATH)')
+    parser.add_argument('--diet-samples', type=int)
+    parser.add_argument('--calorie-samples', type=int)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--keep-versions', type=int, help='versions kept per model (default: TRAINING_KEEP_VERSIONS)')
+    parser.add_argument('--benchmark', action='store_true', help='compare calorie prediction modes afterwards')
+    parser.add_argument('--with-gemini', action='store_true', help='also generate sample plans with Gemini (live API calls)')
+    args = parser.parse_args(argv)
+
+    overrides = {
+        'MODELS_PATH': args.models_path,
+        'TRAINING_DIET_SAMPLES': args.diet_samples,
+        'TRAINING_CALORIE_SAMPLES': args.calorie_samples,
+        'TRAINING_SEED': args.seed
+    }
+    config = type('TrainingConfig', (get_config(),), {k: v for k, v in overrides.items() if v is not None})
+
+    print("=== AI-Powered Diet and Workout Recommendation System ===")
+    print("Training Machine Learning Models...\n")
+
+    start = time.perf_counter()
+    pipeline = TrainingPipeline(config, workers=args.workers, n_jobs=args.n_jobs, keep_versions=args.keep_versions)
+    results = pipeline.run(models=args.models, force=args.force)
+    for name, result in results.items():
+        score = f", R² {result['score']:.3f}" if result.get('score') is not None else ''
+        print(f"{'✓' if result['status'] == 'trained' else '⏭'} {name}: {result['status']} "
+              f"(version {result['version']}, {result['duration']:.1f}s{score})")
+    print(f"Total wall-clock time: {time.perf_counter() - start:.1f}s\n")
+
+    print("Testing published models with a sample user...")
+    calorie_predictor = smoke_test(config, include_gemini=args.with_gemini)
+    if args.benchmark:
+        print("\nBenchmarking calorie prediction modes...")
+        for mode, result in calorie_predictor.benchmark_modes().items():
+            print(f"{mode}: MAE {result['mae']:.1f} kcal, "
+                  f"{result['single_row_latency_us']:.0f} µs/row single, "
+                  f"{result['batch_rows_per_sec']:.0f} rows/s batched")
+
+    print(f"\nModels location: {config.MODELS_PATH}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -126,7 +126,8 @@ export default function WorkoutPlan() {
   const generateCustomWorkout = async () => {
     setCustomizing(true)
     try {
-      const res = await fetch("/api/workout-plan", {
+      // Exercises arrive one Server-Sent Event at a time while Gemini is still generating
+      const res = await fetch("/api/workout-plan/stream", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -140,18 +141,46 @@ export default function WorkoutPlan() {
           workout_type: customization.workoutType
         })
       })
-      
-      const data = await res.json()
-      if (!data.success) throw new Error(data.message || "Failed to generate custom workout")
-      
-      setWorkoutPlan({
-        name: data.workout.name,
-        duration: data.workout.total_duration,
-        estimatedCalories: data.workout.total_calories,
-        difficulty: customization.difficulty,
-        exercises: data.workout.exercises,
-      })
-      
+      if (!res.ok || !res.body) {
+        const data = await res.json()
+        throw new Error(data.message || "Failed to generate custom workout")
+      }
+
+      const exercises: any[] = []
+      const showWorkout = (workout: any) => {
+        setWorkoutPlan({
+          name: workout.workout_name || "Custom Workout",
+          duration: workout.total_duration || customization.duration,
+          estimatedCalories: workout.total_calories,
+          difficulty: customization.difficulty,
+          exercises: workout.exercises,
+        })
+      }
+
+      const reader = res.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ""
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const events = buffer.split("\n\n")
+        buffer = events.pop() || ""
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1]
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || "null")
+          if (event === "exercise") {
+            exercises.push(data)
+            showWorkout({ exercises: [...exercises] })
+            setShowCustomizeModal(false)
+          } else if (event === "done") {
+            showWorkout(data.workout)
+          } else if (event === "error") {
+            throw new Error(data.message || "Failed to generate custom workout")
+          }
+        }
+      }
+
       setShowCustomizeModal(false)
     } catch (err: any) {
       setError(err.message)
@@ -0,0 +1,72 @@
+"""
+Shared test helpers: puts the repository root on the import path and provides
+stand-ins for the Gemini SDK so service tests run without an API key
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+from backend.config import TestingConfig
+from backend.gemini_service import GeminiRecommendationService, LLMConcurrencyLimiter
+from backend.plan_cache import PlanCache
+from backend.resilience import CircuitBreaker
+
+SAMPLE_USER = {
+    'age': 28,
+    'weight': 70,
+    'height': 175,
+    'gender': 'male',
+    'activity_level': 'moderate',
+    'goal': 'weight-loss',
+    'diet_preference': 'non-vegan',
+    'workout_time': '30-45'
+}
+MEAL = {'name': 'Oats', 'calories': 500, 'protein': 30, 'carbs': 60, 'fat': 15}
+DIET_PLAN = {
+    'target_calories': 1800,
+    'macros': {'protein': 120, 'carbs': 200, 'fat': 60},
+    'meal_plan': {'breakfast': MEAL, 'lunch': MEAL, 'dinner': MEAL}
+}
+
+
+class FakeResponse:
+    """A generate_content response (or one streamed chunk of it)"""
+
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel: answers every call with `text` and records the requests"""
+
+    def __init__(self, text='', name=None):
+        self.text = text
+        self.name = name
+        self.calls = 0
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def record(self, prompt, generation_config=None):
+        with self._lock:
+            self.calls += 1
+            self.requests.append({'prompt': prompt, 'generation_config': generation_config})
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        self.record(prompt, generation_config)
+        return FakeResponse(self.text)
+
+
+def make_service(model, breaker=None, **settings):
+    """Recommendation service around `model` with its own limiter, plan cache and circuit breaker"""
+    config = type('Config', (TestingConfig,), settings)
+    service = GeminiRecommendationService(
+        config, limiter=LLMConcurrencyLimiter(4), plan_cache=PlanCache(),
+        breaker=breaker or CircuitBreaker(config.LLM_BREAKER_FAILURE_THRESHOLD, config.LLM_BREAKER_RESET_TIMEOUT)
+    )
+    service.model = model
+    return service
@@ -22,6 +22,29 @@ interface AuthContextType {
 
 const AuthContext = createContext<AuthContextType | undefined>(undefined)
 
+const JOB_POLL_INTERVAL_MS = 1000
+const JOB_POLL_TIMEOUT_MS = 120000
+
+// Poll a background job until it finishes; resolves to the job's result or an error response
+async function waitForJob(statusUrl: string): Promise<any> {
+  const deadline = Date.now() + JOB_POLL_TIMEOUT_MS
+  while (Date.now() < deadline) {
+    const response = await fetch(statusUrl, { credentials: 'include' })
+    const data = await response.json()
+    if (!data.success) {
+      return data
+    }
+    if (data.job.status === 'succeeded') {
+      return data.job.result
+    }
+    if (data.job.status === 'failed') {
+      return { success: false, message: data.job.error || 'Plan generation failed' }
+    }
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS))
+  }
+  return { success: false, message: 'Plan generation is taking longer than expected' }
+}
+
 export function AuthProvider({ children }: { children: ReactNode }) {
   const [user, setUser] = useState<User | null>(null)
   const [isLoading, setIsLoading] = useState(true)
@@ -165,7 +188,10 @@ export function AuthProvider({ children }: { children: ReactNode }) {
         body: JSON.stringify(profileData),
       })
 
-      const data = await response.json()
+      let data = await response.json()
+      if (data.success && data.status_url) {
+        data = await waitForJob(data.status_url)
+      }
       
       if (data.success) {
         if (user) {
@@ -136,6 +136,19 @@ class DatabaseManager:
             )
         ''')
         
+        # One profile per user and one log per user and day, required by the UPSERTs below.
+        # Older duplicates are dropped first so existing databases can take the unique indexes.
+        cursor.execute('''
+            DELETE FROM user_profiles
+            WHERE id NOT IN (SELECT MAX(id) FROM user_profiles GROUP BY user_id)
+        ''')
+        cursor.execute('''
+            DELETE FROM daily_logs
+            WHERE id NOT IN (SELECT MAX(id) FROM daily_logs GROUP BY user_id, date)
+        ''')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_user_profiles_user_id ON user_profiles (user_id)')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_daily_logs_user_date ON daily_logs (user_id, date)')
+        
         conn.commit()
         conn.close()
         print("Database initialized successfully!")
@@ -187,37 +200,23 @@ class DatabaseManager:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        # Check if profile exists
-        cursor.execute('SELECT id FROM user_profiles WHERE user_id = ?', (user_id,))
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Update existing profile
-            cursor.execute('''
-                UPDATE user_profiles SET
-                age = ?, gender = ?, height = ?, weight = ?, goal = ?,
-                diet_preference = ?, activity_level = ?, workout_time = ?,
-                target_calories = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            ''', (
-                profile_data['age'], profile_data['gender'], profile_data['height'],
-                profile_data['weight'], profile_data['goal'], profile_data['diet_preference'],
-                profile_data['activity_level'], profile_data['workout_time'],
-                profile_data.get('target_calories'), user_id
-            ))
-        else:
-            # Create new profile
-            cursor.execute('''
-                INSERT INTO user_profiles 
-                (user_id, age, gender, height, weight, goal, diet_preference, 
-                 activity_level, workout_time, target_calories)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                user_id, profile_data['age'], profile_data['gender'], profile_data['height'],
-                profile_data['weight'], profile_data['goal'], profile_data['diet_preference'],
-                profile_data['activity_level'], profile_data['workout_time'],
-                profile_data.get('target_calories')
-            ))
+        cursor.execute('''
+            INSERT INTO user_profiles 
+            (user_id, age, gender, height, weight, goal, diet_preference, 
+             activity_level, workout_time, target_calories)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET
+            age = excluded.age, gender = excluded.gender, height = excluded.height,
+            weight = excluded.weight, goal = excluded.goal,
+            diet_preference = excluded.diet_preference, activity_level = excluded.activity_level,
+            workout_time = excluded.workout_time, target_calories = excluded.target_calories,
+            updated_at = CURRENT_TIMESTAMP
+        ''', (
+            user_id, profile_data['age'], profile_data['gender'], profile_data['height'],
+            profile_data['weight'], profile_data['goal'], profile_data['diet_preference'],
+            profile_data['activity_level'], profile_data['workout_time'],
+            profile_data.get('target_calories')
+        ))
         
         conn.commit()
         conn.close()
@@ -312,28 +311,17 @@ class DatabaseManager:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        # Check if log exists for the date
-        cursor.execute('SELECT id FROM daily_logs WHERE user_id = ? AND date = ?', (user_id, date))
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Update existing log
-            cursor.execute('''
-                UPDATE daily_logs SET
-                weight = COALESCE(?, weight),
-                calories_consumed = COALESCE(?, calories_consumed),
-                calories_burned = COALESCE(?, calories_burned),
-                workouts_completed = COALESCE(?, workouts_completed),
-                notes = COALESCE(?, notes)
-                WHERE user_id = ? AND date = ?
-            ''', (weight, calories_consumed, calories_burned, workouts_completed, notes, user_id, date))
-        else:
-            # Create new log
-            cursor.execute('''
-                INSERT INTO daily_logs 
-                (user_id, date, weight, calories_consumed, calories_burned, workouts_completed, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (user_id, date, weight, calories_consumed, calories_burned, workouts_completed, notes))
+        cursor.execute('''
+            INSERT INTO daily_logs 
+            (user_id, date, weight, calories_consumed, calories_burned, workouts_completed, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (user_id, date) DO UPDATE SET
+            weight = COALESCE(excluded.weight, weight),
+            calories_consumed = COALESCE(excluded.calories_consumed, calories_consumed),
+            calories_burned = COALESCE(excluded.calories_burned, calories_burned),
+            workouts_completed = COALESCE(excluded.workouts_completed, workouts_completed),
+            notes = COALESCE(excluded.notes, notes)
+        ''', (user_id, date, weight, calories_consumed, calories_burned, workouts_completed, notes))
         
         conn.commit()
         conn.close()
@@ -0,0 +1,158 @@
+"""
+Tests for the vectorized MET calorie engine and the batch calorie prediction endpoint
+Endpoint tests need TEST_DATABASE_URL to point at a disposable PostgreSQL database
+"""
+
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pytest
+from psycopg2.extensions import make_dsn
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+from backend.api_server import create_app
+from backend.calorie_engine import (
+    FEMALE_MULTIPLIER, INTENSITIES, MALE_MULTIPLIER, MET_TABLE, MIN_CALORIES, WORKOUT_TYPES, CalorieEngine
+)
+from backend.config import TestingConfig
+from backend.database_setup import DatabaseManager
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+requires_db = pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL is not set')
+
+PROFILE = {
+    'age': 28,
+    'weight': 70,
+    'height': 175,
+    'gender': 'male',
+    'activity_level': 'moderate',
+    'goal': 'weight-loss',
+    'diet_preference': 'non-vegan',
+    'workout_time': '30-45'
+}
+
+
+def scalar_formula(weight, gender, workout_type, intensity, duration):
+    """The MET formula written out for one workout"""
+    try:
+        met = MET_TABLE[WORKOUT_TYPES.index(workout_type), INTENSITIES.index(intensity)]
+    except ValueError:
+        met = 5.0
+    calories = met * weight * (duration / 60)
+    calories *= MALE_MULTIPLIER if gender == 'male' else FEMALE_MULTIPLIER
+    return max(int(calories), MIN_CALORIES)
+
+
+def test_vectorized_engine_matches_the_scalar_formula():
+    rng = np.random.default_rng(7)
+    n = 2000
+    weights = rng.uniform(40, 140, n)
+    genders = rng.choice(['male', 'female'], n)
+    # Unknown labels fall back to the default MET
+    workout_types = rng.choice(list(WORKOUT_TYPES) + ['yoga'], n)
+    intensities = rng.choice(list(INTENSITIES) + ['extreme'], n)
+    durations = rng.integers(1, 180, n)
+
+    engine = CalorieEngine()
+    batch = engine.predict_batch(weights, genders, workout_types, intensities, durations)
+    for row in zip(weights, genders, workout_types, intensities, durations):
+        expected = scalar_formula(float(row[0]), row[1], row[2], row[3], int(row[4]))
+        assert engine.predict({'weight': row[0], 'gender': row[1]},
+                              {'type': row[2], 'intensity': row[3], 'duration': row[4]}) == expected
+    assert batch.tolist() == [
+        scalar_formula(float(w), g, t, i, int(d))
+        for w, g, t, i, d in zip(weights, genders, workout_types, intensities, durations)
+    ]
+    # Very short workouts are floored
+    assert engine.predict_batch([50], ['female'], ['strength'], ['low'], [1]).tolist() == [MIN_CALORIES]
+
+
+@pytest.fixture
+def client(tmp_path):
+    """Test client of an app on a fresh schema, signed in as a user with a profile"""
+    schema = f'test_{uuid.uuid4().hex[:12]}'
+    admin = DatabaseManager(TEST_DATABASE_URL)
+    with admin.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f'CREATE SCHEMA {schema}')
+    schema_url = make_dsn(TEST_DATABASE_URL, options=f'-csearch_path={schema}')
+    db = DatabaseManager(schema_url)
+    db.create_tables()
+    db.migrate()
+    user_id = db.create_user('batch@example.com', 'secret', 'Batch User')
+    db.save_user_profile(user_id, PROFILE)
+    db.close()
+
+    config = type('Config', (TestingConfig,), {
+        'DATABASE_URL': schema_url,
+        'MODELS_PATH': str(tmp_path),
+        'CALORIE_PREDICTION_MODE': 'formula',
+        'CALORIE_BATCH_MAX_SIZE': 3,
+        'PLAN_JOBS_ENABLED': False,
+        'PLAN_CACHE_ENABLED': False
+    })
+    client = create_app(config).test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    yield client
+
+    with admin.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f'DROP SCHEMA {schema} CASCADE')
+    admin.close()
+
+
+def post_batch(client, workouts):
+    return client.post('/api/predict-calories/batch', json={'workouts': workouts})
+
+
+@requires_db
+def test_batch_endpoint_scores_every_workout(client):
+    workouts = [
+        {'workout_type': 'cardio', 'intensity': 'high', 'duration': 30},
+        {'workout_type': 'strength', 'intensity': 'low', 'duration': 10.5},
+        {'workout_type': 'pilates', 'intensity': 'low', 'duration': 60}
+    ]
+    response = post_batch(client, workouts)
+    assert response.status_code == 200
+    expected = [scalar_formula(70, 'male', w['workout_type'], w['intensity'], w['duration']) for w in workouts]
+    assert response.json['predicted_calories'] == expected
+    assert response.json['total_calories'] == sum(expected)
+
+
+@requires_db
+def test_batch_endpoint_rejects_invalid_requests(client):
+    workout = {'workout_type': 'cardio', 'intensity': 'high', 'duration': 30}
+    for body in ({}, {'workouts': []}, {'workouts': workout}):
+        response = client.post('/api/predict-calories/batch', json=body)
+        assert response.status_code == 400
+        assert 'workouts' in response.json['message']
+
+    # Positions of every malformed workout are reported
+    response = post_batch(client, [{'workout_type': 'cardio', 'intensity': 'high'}, workout,
+                                   dict(workout, duration='30')])
+    assert response.status_code == 400
+    assert '[0, 2]' in response.json['message']
+    assert '[1]' in post_batch(client, [workout, dict(workout, duration=True)]).json['message']
+
+    # CALORIE_BATCH_MAX_SIZE caps the batch before anything is scored
+    response = post_batch(client, [workout] * 4)
+    assert response.status_code == 400
+    assert 'at most 3' in response.json['message']
+    assert post_batch(client, [workout] * 3).status_code == 200
+
+
+@requires_db
+def test_batch_endpoint_requires_a_session(client):
+    with client.session_transaction() as session:
+        session.clear()
+    assert post_batch(client, [{'workout_type': 'cardio', 'intensity': 'high', 'duration': 30}]).status_code == 401
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,131 @@
+"""
+Tests for the bounded PostgreSQL connection pool: exhaustion, timeouts and health checks
+Runs only when TEST_DATABASE_URL points at a disposable PostgreSQL database
+"""
+
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import psycopg2
+import pytest
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+from backend.database_setup import ConnectionPool, PoolTimeoutError
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL is not set')
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**settings):
+        pool = ConnectionPool(TEST_DATABASE_URL, **{'min_size': 0, 'max_size': 2, 'timeout': 0.2, **settings})
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def terminate(pid):
+    """Kill a backend from another session, as a server restart or idle timeout would"""
+    admin = psycopg2.connect(TEST_DATABASE_URL)
+    try:
+        with admin.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', (pid,))
+        admin.commit()
+    finally:
+        admin.close()
+
+
+def test_exhausted_pool_times_out_then_recovers(make_pool):
+    pool = make_pool()
+    with pool.connection(), pool.connection():
+        start = time.perf_counter()
+        with pytest.raises(PoolTimeoutError):
+            with pool.connection():
+                pass
+        assert 0.15 < time.perf_counter() - start < 2
+        assert pool.stats()['in_use'] == 2
+
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            assert cursor.fetchone() == (1,)
+    stats = pool.stats()
+    assert (stats['timeouts'], stats['checkouts'], stats['in_use'], stats['waiting']) == (1, 3, 0, 0)
+
+
+def test_waiting_caller_gets_the_released_connection(make_pool):
+    pool = make_pool(max_size=1, timeout=5)
+    got = threading.Event()
+
+    def borrow():
+        with pool.connection():
+            got.set()
+
+    with pool.connection():
+        thread = threading.Thread(target=borrow)
+        thread.start()
+        time.sleep(0.1)
+        assert pool.stats()['waiting'] == 1 and not got.is_set()
+    thread.join(5)
+    assert got.is_set()
+    assert pool.stats()['max_wait_time'] >= 0.1
+
+
+def test_dead_connection_is_replaced_on_checkout(make_pool):
+    pool = make_pool(min_size=1, max_size=1, health_check_interval=0)
+    with pool.connection() as conn:
+        first, pid = conn, conn.get_backend_pid()
+    terminate(pid)
+
+    with pool.connection() as conn:
+        assert conn is not first
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    assert pool.stats()['health_check_failures'] == 1
+    # Only live connections keep a last-used timestamp
+    assert list(pool._last_used.keys()) == [conn]
+
+
+def test_recently_used_connection_skips_the_ping(make_pool):
+    pool = make_pool(min_size=1, max_size=1, health_check_interval=60)
+    with pool.connection() as conn:
+        first, pid = conn, conn.get_backend_pid()
+    terminate(pid)
+
+    # Within the interval the connection is trusted; the broken one is discarded when it fails
+    with pytest.raises(psycopg2.OperationalError):
+        with pool.connection() as conn:
+            assert conn is first
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+    with pool.connection() as conn:
+        assert conn is not first
+    assert pool.stats()['health_check_failures'] == 0
+
+
+def test_failed_block_is_rolled_back(make_pool):
+    pool = make_pool(max_size=1)
+    with pytest.raises(ZeroDivisionError):
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('CREATE TEMP TABLE pool_rollback (id INT)')
+            1 / 0
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('pg_temp.pool_rollback')")
+            assert cursor.fetchone() == (None,)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
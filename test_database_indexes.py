@@ -0,0 +1,93 @@
+"""
+EXPLAIN-based regression tests for the hot per-user queries
+Runs only when TEST_DATABASE_URL points at a disposable PostgreSQL database
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+from backend.database_setup import (
+    DatabaseManager, MIGRATIONS, DASHBOARD_STATS_SQL, DASHBOARD_SUMMARY_SQL, REFRESH_DAILY_SUMMARIES_SQL
+)
+from backend.job_queue import CLAIM_JOB_SQL, REQUEUE_STALE_SQL
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL is not set')
+
+HOT_TABLES = {'diet_plans', 'workout_plans', 'daily_logs', 'user_profiles', 'daily_summaries', 'jobs'}
+PARAMS = {'user_id': 1, 'date': '2024-01-01', 'max_attempts': 3, 'stale_after': 600}
+
+# Queries issued on every dashboard, plan or profile request
+HOT_QUERIES = {
+    'dashboard_stats': DASHBOARD_STATS_SQL,
+    'dashboard_summary': DASHBOARD_SUMMARY_SQL,
+    'refresh_daily_summary': REFRESH_DAILY_SUMMARIES_SQL.replace('%s', '(%(user_id)s, %(date)s)'),
+    'diet_plan': '''
+        SELECT meal_type, food_item, calories, protein, carbs, fat
+        FROM diet_plans WHERE user_id = %(user_id)s AND date = %(date)s ORDER BY meal_type, id
+    ''',
+    'workout_plan': '''
+        SELECT workout_name, exercise_name, sets, reps, duration, calories_burned, completed
+        FROM workout_plans WHERE user_id = %(user_id)s AND date = %(date)s ORDER BY id
+    ''',
+    'user_profile': '''
+        SELECT age, gender, height, weight, goal, diet_preference, activity_level, workout_time, target_calories
+        FROM user_profiles WHERE user_id = %(user_id)s
+    ''',
+    'progress_data': '''
+        SELECT date, weight, calories_consumed, calories_burned, workouts_completed
+        FROM daily_logs WHERE user_id = %(user_id)s AND date >= %(date)s::date - INTERVAL '30 days'
+        ORDER BY date DESC
+    ''',
+    'claim_job': CLAIM_JOB_SQL,
+    'requeue_stale_jobs': REQUEUE_STALE_SQL,
+}
+
+
+@pytest.fixture(scope='module')
+def db():
+    manager = DatabaseManager(TEST_DATABASE_URL, daily_summaries=True)
+    manager.create_tables()
+    manager.migrate()
+    yield manager
+    manager.close()
+
+
+def seq_scans(plan):
+    """Hot tables read with a sequential scan anywhere in a JSON plan"""
+    found = set()
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') in HOT_TABLES:
+        found.add(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        found |= seq_scans(child)
+    return found
+
+
+def test_migrations_are_recorded_and_idempotent(db):
+    assert db.schema_version() == max(version for version, _, _ in MIGRATIONS)
+    assert db.migrate() == []
+
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_hot_query_uses_an_index(db, name):
+    with db.connection() as conn:
+        with conn.cursor() as cursor:
+            # Make a sequential scan the planner's last resort so only a missing index produces one
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + HOT_QUERIES[name], PARAMS)
+            plan = cursor.fetchone()[0]
+        conn.rollback()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    assert not seq_scans(plan[0]['Plan']), f"{name} scans {seq_scans(plan[0]['Plan'])} sequentially"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
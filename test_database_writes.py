@@ -0,0 +1,209 @@
+"""
+Tests for the profile, progress and plan write paths and the daily summaries they maintain
+Runs only when TEST_DATABASE_URL points at a disposable PostgreSQL database; every test
+gets its own schema, built the way a deployment gets it: create_tables() then migrate()
+"""
+
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+from psycopg2.extensions import make_dsn
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+from backend import database_setup
+from backend.database_setup import SCHEMA_VERSION, DatabaseManager, SchemaOutdatedError
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL is not set')
+
+DATE = '2024-03-01'
+PROFILE = {
+    'age': 28,
+    'weight': 70,
+    'height': 175,
+    'gender': 'male',
+    'activity_level': 'moderate',
+    'goal': 'weight-loss',
+    'diet_preference': 'non-vegan',
+    'workout_time': '30-45'
+}
+MEAL = {'name': 'Oats', 'calories': 500, 'protein': 30, 'carbs': 60, 'fat': 15}
+MEAL_PLAN = {'breakfast': MEAL, 'lunch': [MEAL, dict(MEAL, name='Apple', calories=80)], 'dinner': MEAL}
+WORKOUT = {'name': 'Full Body', 'exercises': [
+    {'name': 'Squats', 'sets': 3, 'reps': 12, 'duration': 10, 'calories': 80},
+    {'name': 'Plank', 'sets': 3, 'reps': '45s', 'duration': 5, 'calories': 30}
+]}
+
+
+@pytest.fixture
+def schema_url():
+    """Connection string whose search_path is a fresh schema, dropped afterwards"""
+    schema = f'test_{uuid.uuid4().hex[:12]}'
+    admin = DatabaseManager(TEST_DATABASE_URL)
+    with admin.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f'CREATE SCHEMA {schema}')
+        conn.commit()
+    yield make_dsn(TEST_DATABASE_URL, options=f'-csearch_path={schema}')
+    with admin.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f'DROP SCHEMA {schema} CASCADE')
+        conn.commit()
+    admin.close()
+
+
+@pytest.fixture
+def db(schema_url):
+    manager = DatabaseManager(schema_url, daily_summaries=True)
+    manager.create_tables()
+    manager.migrate()
+    yield manager
+    manager.close()
+
+
+def fetch(db, sql, params=()):
+    with db.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        conn.rollback()
+    return rows
+
+
+def test_daily_summaries_table_comes_from_a_migration(schema_url):
+    manager = DatabaseManager(schema_url)
+    manager.create_tables()
+    assert fetch(manager, "SELECT to_regclass('daily_summaries')") == [(None,)]
+    manager.migrate()
+    assert fetch(manager, "SELECT to_regclass('daily_summaries')")[0][0] is not None
+    manager.close()
+
+
+def test_dashboard_stats_match_with_and_without_summaries(db, schema_url):
+    user_id = db.create_user('summary@example.com', 'secret', 'Summary User')
+    db.save_user_profile(user_id, dict(PROFILE, target_calories=1900))
+    db.save_diet_plan(user_id, DATE, MEAL_PLAN)
+    db.save_workout_plan(user_id, DATE, WORKOUT)
+    assert db.complete_exercise(user_id, DATE, 'Squats') == 1
+    db.log_daily_progress(user_id, DATE, weight=70, calories_consumed=1700)
+
+    summary = fetch(db, '''
+        SELECT calories_planned, calories_workout, workouts_planned, workouts_completed
+        FROM daily_summaries WHERE user_id = %s AND date = %s
+    ''', (user_id, DATE))
+    assert summary == [(1580, 110, 2, 1)]
+
+    plain = DatabaseManager(schema_url, daily_summaries=False)
+    expected = plain.get_dashboard_stats(user_id, DATE)
+    plain.close()
+    assert expected['calories_planned'] == 1580 and expected['workouts_completed'] == 1
+    assert expected['log_calories_consumed'] == 1700 and expected['target_calories'] == 1900
+    assert db.get_dashboard_stats(user_id, DATE) == expected
+
+    # A day without a summary row is built on first read
+    db.save_plans_bulk(diet_plans=[(user_id, '2024-03-02', MEAL_PLAN)])
+    with db.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('DELETE FROM daily_summaries WHERE user_id = %s', (user_id,))
+        conn.commit()
+    assert db.get_dashboard_stats(user_id, '2024-03-02')['calories_planned'] == 1580
+    assert fetch(db, 'SELECT COUNT(*) FROM daily_summaries WHERE user_id = %s', (user_id,)) == [(1,)]
+
+
+def test_summaries_left_stale_while_disabled_are_rebuilt(db, schema_url):
+    user_id = db.create_user('stale@example.com', 'secret', 'Stale User')
+    db.save_diet_plan(user_id, DATE, MEAL_PLAN)
+    db.save_workout_plan(user_id, DATE, WORKOUT)
+
+    # Writes made with the flag off leave the summary row behind
+    plain = DatabaseManager(schema_url, daily_summaries=False)
+    plain.save_diet_plan(user_id, DATE, {'breakfast': MEAL_PLAN['breakfast']})
+    plain.complete_exercise(user_id, DATE, 'Squats')
+    expected = plain.get_dashboard_stats(user_id, DATE)
+    plain.close()
+    assert db.get_dashboard_stats(user_id, DATE) != expected
+
+    assert db.rebuild_daily_summaries() >= 1
+    assert db.get_dashboard_stats(user_id, DATE) == expected
+
+
+def test_unmigrated_schema_is_refused(schema_url):
+    manager = DatabaseManager(schema_url)
+    manager.create_tables()
+    with pytest.raises(SchemaOutdatedError):
+        manager.check_schema()
+    manager.migrate()
+    assert manager.check_schema() == SCHEMA_VERSION
+    manager.close()
+
+
+def test_repeated_profile_save_updates_the_one_row(db):
+    user_id = db.create_user('profile@example.com', 'secret', 'Profile User')
+    db.save_user_profile(user_id, dict(PROFILE, target_calories=1900))
+    db.save_user_profile(user_id, dict(PROFILE, weight=68, goal='maintenance', target_calories=2100))
+
+    assert fetch(db, 'SELECT COUNT(*) FROM user_profiles WHERE user_id = %s', (user_id,)) == [(1,)]
+    profile = db.get_user_profile(user_id)
+    assert (profile['weight'], profile['goal'], profile['target_calories']) == (68, 'maintenance', 2100)
+
+
+def test_daily_log_merges_fields_left_empty(db):
+    user_id = db.create_user('log@example.com', 'secret', 'Log User')
+    db.log_daily_progress(user_id, DATE, weight=70, calories_consumed=1700)
+    db.log_daily_progress(user_id, DATE, calories_consumed=1850, notes='late snack')
+
+    rows = fetch(db, '''
+        SELECT weight, calories_consumed, notes FROM daily_logs WHERE user_id = %s AND date = %s
+    ''', (user_id, DATE))
+    assert rows == [(70, 1850, 'late snack')]
+
+
+def plan_counts(db, table):
+    return dict(((user_id, str(date)), count) for user_id, date, count in fetch(
+        db, f'SELECT user_id, date, COUNT(*) FROM {table} GROUP BY user_id, date'
+    ))
+
+
+def test_bulk_save_replaces_only_the_given_days(db, monkeypatch):
+    # Small pages so the multi-row INSERTs span several statements
+    monkeypatch.setattr(database_setup, 'BULK_PAGE_SIZE', 3)
+    first = db.create_user('bulk1@example.com', 'secret', 'Bulk One')
+    second = db.create_user('bulk2@example.com', 'secret', 'Bulk Two')
+    next_day = '2024-03-02'
+
+    replaced = db.save_plans_bulk(
+        diet_plans=[(first, DATE, MEAL_PLAN), (first, next_day, MEAL_PLAN), (second, DATE, MEAL_PLAN)],
+        workout_plans=[(first, DATE, WORKOUT), (second, DATE, WORKOUT)]
+    )
+    assert replaced == 3
+    assert plan_counts(db, 'diet_plans') == {(first, DATE): 4, (first, next_day): 4, (second, DATE): 4}
+    assert plan_counts(db, 'workout_plans') == {(first, DATE): 2, (second, DATE): 2}
+
+    # Saving one day again replaces that day's rows and leaves the others alone
+    smaller_workout = dict(WORKOUT, exercises=WORKOUT['exercises'][:1])
+    assert db.save_plans_bulk(diet_plans=[(first, DATE, {'breakfast': MEAL})],
+                              workout_plans=[(first, DATE, smaller_workout)]) == 1
+    assert plan_counts(db, 'diet_plans') == {(first, DATE): 1, (first, next_day): 4, (second, DATE): 4}
+    assert plan_counts(db, 'workout_plans') == {(first, DATE): 1, (second, DATE): 2}
+    assert fetch(db, 'SELECT food_item FROM diet_plans WHERE user_id = %s AND date = %s', (first, DATE)) == [('Oats',)]
+
+
+def test_failed_bulk_save_keeps_the_previous_plans(db):
+    user_id = db.create_user('rollback@example.com', 'secret', 'Rollback User')
+    db.save_plans_bulk(diet_plans=[(user_id, DATE, MEAL_PLAN)], workout_plans=[(user_id, DATE, WORKOUT)])
+
+    # The diet rows are already replaced when the malformed workout fails; the transaction undoes it
+    with pytest.raises(KeyError):
+        db.save_plans_bulk(diet_plans=[(user_id, DATE, {'breakfast': MEAL})],
+                           workout_plans=[(user_id, DATE, {'name': 'Broken'})])
+    assert plan_counts(db, 'diet_plans') == {(user_id, DATE): 4}
+    assert plan_counts(db, 'workout_plans') == {(user_id, DATE): 2}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
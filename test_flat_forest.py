@@ -0,0 +1,158 @@
+"""
+Parity tests for the flattened Random Forest evaluator
+"""
+
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+from backend.calorie_engine import INTENSITIES, WORKOUT_TYPES
+from backend.config import TestingConfig
+from backend.flat_forest import FlatForest
+from backend.ml_models import CALORIE_FEATURE_COLUMNS, CalorieBurnPredictor
+
+
+def fitted_forest(n_estimators=25):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 5))
+    y = X[:, 0] * 3 + np.sin(X[:, 1]) + rng.normal(scale=0.1, size=600)
+    return RandomForestRegressor(n_estimators=n_estimators, random_state=0).fit(X, y), rng
+
+
+def test_flat_forest_matches_sklearn_predict():
+    forest, rng = fitted_forest()
+    flat = FlatForest.from_sklearn(forest)
+    X = rng.normal(size=(3000, 5))
+
+    expected = forest.predict(X)
+    np.testing.assert_allclose(flat.predict(X), expected, rtol=1e-12, atol=1e-9)
+    np.testing.assert_allclose(flat.predict(X, chunk_size=256), expected, rtol=1e-12, atol=1e-9)
+    np.testing.assert_allclose(flat.predict(X[7]), expected[7:8], rtol=1e-12, atol=1e-9)
+
+
+def test_flat_forest_round_trips_through_arrays():
+    forest, rng = fitted_forest(n_estimators=5)
+    flat = FlatForest.from_arrays(FlatForest.from_sklearn(forest).to_arrays())
+    X = rng.normal(size=(100, 5))
+    np.testing.assert_allclose(flat.predict(X), forest.predict(X), rtol=1e-12, atol=1e-9)
+
+
+def test_calorie_predictor_serves_exported_forest(tmp_path):
+    class Config(TestingConfig):
+        MODELS_PATH = str(tmp_path)
+        CALORIE_PREDICTION_MODE = 'random_forest'
+
+    trained = CalorieBurnPredictor(Config)
+    trained.model.set_params(n_estimators=10)
+    trained.train_model()
+
+    loaded = CalorieBurnPredictor(Config)
+    assert loaded.load_model()
+    assert loaded.flat_model is not None
+    assert not hasattr(loaded.model, 'estimators_')
+
+    user = {'age': 35, 'weight': 82, 'gender': 'female'}
+    workout = {'type': 'cardio', 'intensity': 'high', 'duration': 40}
+    features = np.array([[35, 82, 40,
+                          trained.label_encoders['gender'].transform(['female'])[0],
+                          trained.label_encoders['workout_type'].transform(['cardio'])[0],
+                          trained.label_encoders['intensity'].transform(['high'])[0]]], dtype=float)
+    scaled = (features - trained.scaler.mean_) / trained.scaler.scale_
+    expected = max(int(trained.model.predict(scaled)[0]), 10)
+    assert loaded.predict_calories(user, workout) == expected
+
+
+def random_rows(n, seed=1):
+    rng = np.random.default_rng(seed)
+    return [
+        ({'age': int(rng.integers(18, 65)), 'weight': float(rng.uniform(45, 120)),
+          'gender': str(rng.choice(['male', 'female']))},
+         {'type': str(rng.choice(WORKOUT_TYPES)), 'intensity': str(rng.choice(INTENSITIES)),
+          'duration': int(rng.integers(10, 90))})
+        for _ in range(n)
+    ]
+
+
+def sklearn_prediction(predictor, user, workout):
+    """Reference path: sklearn encoders, scaler and forest"""
+    encoders = predictor.label_encoders
+    features = pd.DataFrame([[user['age'], user['weight'], workout['duration'],
+                              encoders['gender'].transform([user['gender']])[0],
+                              encoders['workout_type'].transform([workout['type']])[0],
+                              encoders['intensity'].transform([workout['intensity']])[0]]],
+                            columns=CALORIE_FEATURE_COLUMNS, dtype=float)
+    return max(int(predictor.model.predict(predictor.scaler.transform(features))[0]), 10)
+
+
+def test_random_forest_mode_matches_sklearn_and_switches_modes(tmp_path):
+    config = type('Config', (TestingConfig,), {
+        'MODELS_PATH': str(tmp_path), 'CALORIE_PREDICTION_MODE': 'random_forest', 'TRAINING_CALORIE_SAMPLES': 400
+    })
+    predictor = CalorieBurnPredictor(config)
+    # Untrained, the random_forest mode serves the formula
+    user, workout = random_rows(1)[0]
+    assert predictor.predict_calories(user, workout) == predictor.engine.predict(user, workout)
+    assert predictor.latency['formula'].snapshot()['count'] == 1
+
+    predictor.model.set_params(n_estimators=10)
+    predictor.train_model()
+    rows = random_rows(200)
+    expected = [sklearn_prediction(predictor, user, workout) for user, workout in rows]
+    assert [predictor.predict_calories(user, workout) for user, workout in rows] == expected
+    assert predictor.latency['random_forest'].snapshot()['count'] == len(rows)
+
+    # Labels the encoders never saw fall back to the formula
+    unseen = dict(workout, type='yoga')
+    assert predictor.predict_calories(user, unseen) == predictor.engine.predict(user, unseen)
+
+    predictor.prediction_mode = 'formula'
+    assert [predictor.predict_calories(user, workout) for user, workout in rows] == \
+        [predictor.engine.predict(user, workout) for user, workout in rows]
+    predictor.prediction_mode = 'random_forest'
+    assert predictor.predict_calories(*rows[0]) == expected[0]
+
+
+def test_concurrent_callers_use_their_own_feature_buffers(tmp_path):
+    config = type('Config', (TestingConfig,), {
+        'MODELS_PATH': str(tmp_path), 'CALORIE_PREDICTION_MODE': 'random_forest', 'TRAINING_CALORIE_SAMPLES': 400
+    })
+    trained = CalorieBurnPredictor(config)
+    trained.model.set_params(n_estimators=10)
+    trained.train_model()
+    rows = random_rows(300, seed=2)
+    expected = [sklearn_prediction(trained, user, workout) for user, workout in rows]
+
+    predictor = CalorieBurnPredictor(config)
+    assert predictor.load_model()
+    buffers = set()
+    start = threading.Barrier(8)
+
+    def score(offset):
+        start.wait()
+        results = [predictor.predict_calories(*rows[(offset + i) % len(rows)]) for i in range(len(rows))]
+        buffers.add(id(predictor._buffers.features))
+        return offset, results
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for offset, results in pool.map(score, range(0, 240, 30)):
+            assert results == [expected[(offset + i) % len(rows)] for i in range(len(rows))]
+    assert len(buffers) == 8
+
+
+if __name__ == "__main__":
+    import tempfile
+    test_flat_forest_matches_sklearn_predict()
+    test_flat_forest_round_trips_through_arrays()
+    for test in (test_random_forest_mode_matches_sklearn_and_switches_modes,
+                 test_concurrent_callers_use_their_own_feature_buffers):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Flat forest parity tests passed!")
@@ -0,0 +1,67 @@
+"""
+Tests for the process-wide Gemini client and shared recommendation service
+The SDK is replaced with counting stand-ins, so no API key is needed
+"""
+
+import sys
+
+import pytest
+
+from backend import gemini_service
+from backend.config import TestingConfig
+from backend.gemini_service import GeminiClientRegistry, get_gemini_service, set_gemini_client
+from backend.ml_models import CalorieBurnPredictor, DietRecommendationSystem, WorkoutRecommendationSystem
+from conftest import FakeModel
+
+
+@pytest.fixture
+def fake_client():
+    created = []
+
+    def factory(name):
+        created.append(name)
+        return FakeModel(name=name)
+
+    client = GeminiClientRegistry(model_factory=factory)
+    set_gemini_client(client)
+    yield client, created
+    set_gemini_client(None)
+
+
+def test_sdk_is_configured_once_and_model_handles_are_reused(monkeypatch):
+    configured = []
+    monkeypatch.setattr(gemini_service.genai, 'configure', lambda **kwargs: configured.append(kwargs))
+    monkeypatch.setattr(gemini_service.genai, 'GenerativeModel', lambda name: FakeModel(name=name))
+    client = GeminiClientRegistry(api_key='test-key')
+
+    first = client.model('gemini-test')
+    assert client.model('gemini-test') is first
+    assert client.model('gemini-other') is not first
+    assert configured == [{'api_key': 'test-key'}]
+    assert client.stats() == {'configured': True, 'models': ['gemini-other', 'gemini-test']}
+
+
+def test_without_an_api_key_there_is_no_model():
+    client = GeminiClientRegistry(api_key=None)
+    assert client.model('gemini-test') is None
+    assert client.stats()['configured'] is False
+
+
+def test_components_share_one_service_and_model(fake_client):
+    client, created = fake_client
+    config = type('Config', (TestingConfig,), {'GEMINI_MODEL': 'gemini-test'})
+
+    services = {
+        id(DietRecommendationSystem(config).gemini_service),
+        id(WorkoutRecommendationSystem(config).gemini_service),
+        id(CalorieBurnPredictor(config).gemini_service),
+        id(get_gemini_service(config))
+    }
+    assert len(services) == 1
+    assert get_gemini_service().client is client
+    assert get_gemini_service().model.name == 'gemini-test'
+    assert created == ['gemini-test']
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
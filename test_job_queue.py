@@ -0,0 +1,167 @@
+"""
+Tests for the PostgreSQL-backed background job queue
+Runs only when TEST_DATABASE_URL points at a disposable PostgreSQL database
+"""
+
+import os
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+from backend.database_setup import DatabaseManager
+from backend.job_queue import JobQueue, PermanentJobError
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL is not set')
+
+
+@pytest.fixture(scope='module')
+def db():
+    manager = DatabaseManager(TEST_DATABASE_URL)
+    manager.create_tables()
+    manager.migrate()
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def queue(db):
+    with db.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('DELETE FROM jobs')
+        conn.commit()
+    queue = JobQueue(db, workers=0, poll_interval=0.05, stale_after=60, max_attempts=2)
+    yield queue
+    queue.stop(timeout=5)
+
+
+def test_jobs_run_to_completion_and_record_their_outcome(queue):
+    def echo(payload, job):
+        job['progress']('halfway')
+        return {'doubled': payload['value'] * 2}
+
+    def explode(payload, job):
+        raise RuntimeError('model unavailable')
+
+    queue.register('echo', echo)
+    queue.register('explode', explode)
+    ok_id = queue.enqueue('echo', {'value': 21})
+    failed_id = queue.enqueue('explode', {})
+    assert queue.get(ok_id)['status'] == 'queued'
+
+    # Jobs are claimed oldest first; a failed job is requeued until max_attempts
+    assert queue.run_next() == ok_id
+    assert queue.run_next() == failed_id
+    assert queue.get(failed_id)['status'] == 'queued'
+    assert queue.run_next() == failed_id
+    assert queue.run_next() is None
+
+    job = queue.get(ok_id)
+    assert (job['status'], job['result'], job['progress'], job['attempts']) == ('succeeded', {'doubled': 42}, 'halfway', 1)
+    assert job['finished_at'] is not None
+    job = queue.get(failed_id)
+    assert (job['status'], job['error'], job['attempts']) == ('failed', 'model unavailable', 2)
+    stats = queue.stats()
+    assert (stats['succeeded'], stats['retried'], stats['failed']) == (1, 1, 1)
+
+
+def test_permanent_errors_are_not_retried(queue):
+    def reject(payload, job):
+        raise PermanentJobError('profile is incomplete')
+
+    queue.register('reject', reject)
+    job_id = queue.enqueue('reject', {})
+    assert queue.run_next() == job_id
+    job = queue.get(job_id)
+    assert (job['status'], job['error'], job['attempts']) == ('failed', 'profile is incomplete', 1)
+
+
+def test_late_result_does_not_overwrite_a_reclaimed_job(queue, db):
+    def slow(payload, job):
+        # While this attempt runs, the job goes stale and another worker claims it again
+        with db.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("UPDATE jobs SET updated_at = updated_at - INTERVAL '1 hour' WHERE id = %s",
+                               (job['id'],))
+            conn.commit()
+        assert queue.requeue_stale() == 1
+        assert queue._claim()['attempts'] == 2
+        job['progress']('late progress')
+        return {'from': 'first attempt'}
+
+    queue.register('slow', slow)
+    job_id = queue.enqueue('slow', {})
+    assert queue.run_next() == job_id
+    job = queue.get(job_id)
+    assert (job['status'], job['attempts'], job['result'], job['progress']) == ('running', 2, None, None)
+    assert queue.stats()['superseded'] == 1
+
+
+def test_running_jobs_heartbeat_so_they_are_not_requeued(db, queue):
+    fast_stale = JobQueue(db, workers=0, stale_after=0.3, max_attempts=2)
+
+    def long_running(payload, job):
+        time.sleep(0.6)
+        return {'requeued': fast_stale.requeue_stale()}
+
+    fast_stale.register('long', long_running)
+    job_id = fast_stale.enqueue('long', {})
+    assert fast_stale.run_next() == job_id
+    job = fast_stale.get(job_id)
+    assert (job['status'], job['result'], job['attempts']) == ('succeeded', {'requeued': 0}, 1)
+
+
+def test_workers_claim_each_job_exactly_once(queue, db):
+    seen = []
+    lock = threading.Lock()
+
+    def record(payload, job):
+        with lock:
+            seen.append(payload['n'])
+        return None
+
+    queue.register('record', record)
+    job_ids = [queue.enqueue('record', {'n': n}) for n in range(20)]
+    queue.workers = 4
+    queue.start()
+    for _ in range(200):
+        if all(queue.get(job_id)['status'] == 'succeeded' for job_id in job_ids):
+            break
+        threading.Event().wait(0.05)
+    assert sorted(seen) == list(range(20))
+
+
+def test_jobs_are_private_to_their_user(queue, db):
+    queue.register('echo', lambda payload, job: payload)
+    user_id = db.create_user(f'jobs-{uuid.uuid4().hex}@example.com', 'password123', 'Job Tester')
+    job_id = queue.enqueue('echo', {}, user_id=user_id)
+    assert queue.get(job_id, user_id=user_id)['user_id'] == user_id
+    assert queue.get(job_id, user_id=user_id + 1) is None
+    with pytest.raises(ValueError):
+        queue.enqueue('unknown', {})
+
+
+def test_stale_running_jobs_are_retried_then_failed(queue, db):
+    queue.register('echo', lambda payload, job: payload)
+    job_id = queue.enqueue('echo', {})
+    for expected in ('queued', 'failed'):
+        # Simulate a worker that claimed the job and then died
+        queue._claim()
+        with db.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("UPDATE jobs SET updated_at = updated_at - INTERVAL '1 hour' WHERE id = %s", (job_id,))
+            conn.commit()
+        assert queue.requeue_stale() == 1
+        assert queue.get(job_id)['status'] == expected
+    assert queue.get(job_id)['error'] == 'Worker stopped responding'
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
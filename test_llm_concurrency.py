@@ -0,0 +1,112 @@
+"""
+Tests for the async Gemini generation path and the LLM concurrency limiter
+Uses a local fake model that sleeps instead of calling the Gemini API
+"""
+
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+from backend.gemini_service import GeminiRecommendationService, LLMConcurrencyLimiter, submit_llm_task
+from backend.plan_cache import PlanCache
+
+SAMPLE_USER = {
+    'age': 28,
+    'weight': 70,
+    'height': 175,
+    'gender': 'male',
+    'activity_level': 'moderate',
+    'goal': 'weight-loss',
+    'diet_preference': 'non-vegan',
+    'workout_time': '30-45'
+}
+
+
+MEAL = {'name': 'Fake Meal', 'calories': 600, 'protein': 40, 'carbs': 60, 'fat': 20}
+FAKE_DIET_PLAN = {
+    'target_calories': 2000,
+    'macros': {'protein': 150, 'carbs': 200, 'fat': 70},
+    'meal_plan': {'breakfast': MEAL, 'lunch': MEAL, 'dinner': MEAL}
+}
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class SleepingModel:
+    """Stands in for genai.GenerativeModel and records peak concurrency"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+        finally:
+            with self._lock:
+                self.active -= 1
+        if 'workout plan' in prompt:
+            return FakeResponse(json.dumps({'name': 'Fake Workout', 'exercises': [{'name': 'Squats'}]}))
+        return FakeResponse(json.dumps(FAKE_DIET_PLAN))
+
+
+def make_service(model, max_concurrency):
+    service = GeminiRecommendationService(
+        limiter=LLMConcurrencyLimiter(max_concurrency),
+        plan_cache=PlanCache()
+    )
+    service.model = model
+    return service
+
+
+def test_diet_and_workout_generate_concurrently():
+    delay = 0.3
+    service = make_service(SleepingModel(delay), max_concurrency=2)
+
+    start = time.perf_counter()
+    diet_future = service.generate_diet_plan_async(SAMPLE_USER)
+    workout_future = service.generate_workout_plan_async(SAMPLE_USER)
+    diet_plan = diet_future.result(timeout=5)
+    workout_plan = workout_future.result(timeout=5)
+    elapsed = time.perf_counter() - start
+
+    assert diet_plan['target_calories'] == 2000
+    assert workout_plan['name'] == 'Fake Workout'
+    assert elapsed < 2 * delay
+    assert service.model.peak == 2
+
+
+def test_limiter_caps_in_flight_calls():
+    model = SleepingModel(0.05)
+    service = make_service(model, max_concurrency=2)
+
+    futures = [submit_llm_task(service._generate_content, 'diet') for _ in range(6)]
+    for future in futures:
+        future.result(timeout=5)
+
+    stats = service.limiter.stats()
+    assert model.peak <= 2
+    assert stats['calls'] == 6
+    assert stats['in_flight'] == 0
+    assert stats['waiting'] == 0
+    assert stats['max_waiting'] >= 1
+    assert stats['max_wait_time'] > 0
+
+
+if __name__ == "__main__":
+    test_diet_and_workout_generate_concurrently()
+    test_limiter_caps_in_flight_calls()
+    print("✅ LLM concurrency tests passed!")
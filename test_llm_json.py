@@ -0,0 +1,127 @@
+"""
+Tests for LLM response JSON extraction, repair and schema conformance
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+from backend.gemini_service import GeminiRecommendationService, LLMConcurrencyLimiter, llm_stats
+from backend.llm_json import SchemaError, conform, extract_json, parse_llm_json
+from backend.plan_cache import PlanCache
+from backend.plan_schemas import CustomWorkout, DietPlan, WorkoutPlan
+
+MEAL = {'name': 'Oats', 'calories': 500, 'protein': 30, 'carbs': 60, 'fat': 15}
+DIET_PLAN = {
+    'target_calories': 1800,
+    'macros': {'protein': 120, 'carbs': 200, 'fat': 60},
+    'meal_plan': {'breakfast': MEAL, 'lunch': MEAL, 'dinner': MEAL}
+}
+
+
+def test_json_is_found_inside_prose_and_fences():
+    text = 'Sure {as requested}! Here you go:\n```json\n' + json.dumps(DIET_PLAN) + '\n```\nEnjoy {and hydrate}.'
+    assert extract_json(text) == (DIET_PLAN, [])
+
+
+def test_trailing_commas_are_removed_but_not_inside_strings():
+    value, repairs = extract_json('{"tips": "a, }", "list": [1, 2,],}')
+    assert value == {'tips': 'a, }', 'list': [1, 2]}
+    assert repairs == ['removed trailing commas']
+
+
+def test_truncated_output_keeps_every_complete_value():
+    text = json.dumps({'workout_name': 'W', 'exercises': [{'name': 'Squats'}, {'name': 'Lunges'}, {'name': 'Plank'}]})
+    value, repairs = extract_json(text[:text.index('Plank') + 2])
+    assert value['exercises'][:2] == [{'name': 'Squats'}, {'name': 'Lunges'}]
+    assert repairs[0].startswith('closed truncated JSON')
+
+
+def test_unusable_responses_raise():
+    for text in ('no json here', '{"a": }', ''):
+        with pytest.raises(ValueError):
+            extract_json(text)
+
+
+def test_near_misses_are_coerced_and_reported():
+    plan = json.loads(json.dumps(DIET_PLAN))
+    plan['target_calories'] = '1,800 kcal'
+    plan['meal_plan']['lunch']['protein'] = '35g'
+    plan['meal_plan']['dinner']['time'] = 19
+    value, repairs = parse_llm_json(json.dumps(plan), DietPlan)
+    assert value['target_calories'] == 1800
+    assert value['meal_plan']['lunch']['protein'] == 35
+    assert value['meal_plan']['dinner']['time'] == '19'
+    assert "target_calories: coerced '1,800 kcal' to 1800" in repairs
+    assert len(repairs) == 3
+
+
+def test_invalid_list_items_and_optional_fields_are_dropped():
+    workout = {'exercises': [{'name': 'Squats', 'sets': 'three'}, {'reps': '10'}, {'name': 'Plank', 'sets': 2.0}]}
+    repairs = []
+    value = conform(workout, WorkoutPlan, repairs=repairs)
+    assert value['exercises'] == [{'name': 'Squats'}, {'name': 'Plank', 'sets': 2}]
+    assert repairs == [
+        "dropped exercises[0].sets (exercises[0].sets: expected a number, got 'three')",
+        'dropped exercises[1] (exercises[1].name: missing)'
+    ]
+
+
+def test_reps_may_be_a_count_or_a_description():
+    workout = {'exercises': [{'name': 'Squats', 'reps': 12}, {'name': 'Plank', 'reps': '30 seconds'},
+                             {'name': 'Lunges', 'reps': 10.5}, {'name': 'Burpees', 'reps': ['10']}]}
+    repairs = []
+    value = conform(workout, WorkoutPlan, repairs=repairs)
+    assert [exercise.get('reps') for exercise in value['exercises']] == [12, '30 seconds', '10.5', None]
+    assert repairs == [
+        "exercises[2].reps: coerced 10.5 to text",
+        "dropped exercises[3].reps (exercises[3].reps: expected str or int, got list)"
+    ]
+
+
+def test_missing_required_fields_raise():
+    with pytest.raises(SchemaError, match='meal_plan.dinner'):
+        conform({**DIET_PLAN, 'meal_plan': {'breakfast': MEAL, 'lunch': MEAL}}, DietPlan)
+    with pytest.raises(SchemaError, match='expected an object'):
+        conform([], CustomWorkout)
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class CannedModel:
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, prompt, generation_config=None):
+        self.calls += 1
+        return FakeResponse(self.text)
+
+
+def test_mostly_usable_responses_do_not_fall_back():
+    plan = json.loads(json.dumps(DIET_PLAN))
+    plan['meal_plan']['lunch']['calories'] = '650 kcal'
+    text = '```json\n' + json.dumps(plan, indent=2)[:-1] + ',\n}\n```'
+    service = GeminiRecommendationService(limiter=LLMConcurrencyLimiter(1), plan_cache=PlanCache())
+    service.model = CannedModel(text)
+
+    before = llm_stats()['responses']['repaired']
+    diet_plan = service.generate_diet_plan({'age': 30, 'gender': 'female', 'height': 165, 'weight': 60,
+                                            'goal': 'maintenance', 'diet_preference': 'vegan',
+                                            'activity_level': 'light'})
+    assert diet_plan['target_calories'] == 1800
+    assert diet_plan['meal_plan']['lunch']['calories'] == 650
+    assert service.model.calls == 1
+    assert llm_stats()['responses']['repaired'] == before + 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
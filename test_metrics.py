@@ -0,0 +1,140 @@
+"""
+Tests for the metrics registry and the instrumentation around Gemini calls
+Uses local fake models, so no API key is needed
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+from backend.config import TestingConfig
+from backend.gemini_service import GeminiRecommendationService, LLMConcurrencyLimiter
+from backend.metrics import MetricsRegistry, get_metrics_registry
+from backend.plan_cache import PlanCache
+
+SAMPLE_USER = {
+    'age': 28,
+    'weight': 70,
+    'height': 175,
+    'gender': 'male',
+    'activity_level': 'moderate',
+    'goal': 'weight-loss',
+    'diet_preference': 'non-vegan',
+    'workout_time': '30-45'
+}
+MEAL = {'name': 'Oats', 'calories': 500, 'protein': 30, 'carbs': 60, 'fat': 15}
+DIET_PLAN = {
+    'target_calories': 1800,
+    'macros': {'protein': 120, 'carbs': 200, 'fat': 60},
+    'meal_plan': {'breakfast': MEAL, 'lunch': MEAL, 'dinner': MEAL}
+}
+WORKOUT = {'type': 'running', 'intensity': 'moderate', 'duration': 30}
+
+
+class UsageMetadata:
+    prompt_token_count = 1000
+    candidates_token_count = 200
+    # Includes 100 thinking tokens
+    total_token_count = 1300
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = UsageMetadata()
+
+
+class FakeModel:
+    def __init__(self, text=None, error=None):
+        self.text = text
+        self.error = error
+
+    def generate_content(self, prompt, generation_config=None):
+        if self.error:
+            raise self.error
+        return FakeResponse(self.text)
+
+
+def make_service(model, **settings):
+    config = type('Config', (TestingConfig,), settings)
+    service = GeminiRecommendationService(config, limiter=LLMConcurrencyLimiter(1), plan_cache=PlanCache())
+    service.model = model
+    return service
+
+
+def metric(name):
+    return get_metrics_registry()._metrics[f'fitsense_{name}']
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry('test')
+    calls = registry.counter('calls_total', 'Calls', ('method',))
+    calls.inc(method='diet')
+    calls.inc(2, method='say "hi"')
+    latency = registry.histogram('latency_seconds', 'Latency', ('method',), buckets=(0.1, 1.0))
+    latency.observe(0.5, method='diet')
+    registry.register_gauges('pool', lambda: {'size': 3, 'ready': True, 'nested': {'a': 1}, 'hit_rate': 0.25})
+    registry.register_gauges('broken', lambda: 1 / 0)
+
+    text = registry.render()
+    assert '# TYPE test_calls_total counter' in text
+    assert 'test_calls_total{method="diet"} 1' in text
+    assert 'test_calls_total{method="say \\"hi\\""} 2' in text
+    assert 'test_latency_seconds_bucket{method="diet",le="0.1"} 0' in text
+    assert 'test_latency_seconds_bucket{method="diet",le="+Inf"} 1' in text
+    assert 'test_latency_seconds_count{method="diet"} 1' in text
+    assert 'test_pool_size 3' in text and 'test_pool_hit_rate 0.25' in text
+    assert 'ready' not in text and 'nested' not in text and 'broken' not in text
+
+    assert registry.counter('calls_total', 'Calls', ('method',)) is calls
+    with pytest.raises(ValueError):
+        calls.inc(kind='diet')
+
+
+def test_successful_call_records_latency_tokens_cost_and_cache_lookups():
+    service = make_service(FakeModel(json.dumps(DIET_PLAN)), LLM_PROMPT_COST_PER_MTOK=1.0, LLM_OUTPUT_COST_PER_MTOK=10.0)
+    calls = metric('llm_requests_total').value(method='diet', outcome='success')
+    latency = metric('llm_request_duration_seconds').labels(method='diet').snapshot()['count']
+    prompt_tokens = metric('llm_tokens_total').value(method='diet', type='prompt')
+    cost = metric('llm_cost_usd_total').value(method='diet')
+    clean = metric('llm_responses_total').value(method='diet', outcome='clean')
+    hits = metric('plan_cache_lookups_total').value(method='diet', result='hit')
+
+    service.generate_diet_plan(SAMPLE_USER)
+    service.generate_diet_plan(SAMPLE_USER)
+
+    assert metric('llm_requests_total').value(method='diet', outcome='success') == calls + 1
+    assert metric('llm_request_duration_seconds').labels(method='diet').snapshot()['count'] == latency + 1
+    assert metric('llm_tokens_total').value(method='diet', type='prompt') == prompt_tokens + 1000
+    # 1000 prompt tokens at $1/M plus 300 billed output tokens (incl. thinking) at $10/M
+    assert metric('llm_cost_usd_total').value(method='diet') == pytest.approx(cost + 0.004)
+    assert metric('llm_responses_total').value(method='diet', outcome='clean') == clean + 1
+    assert metric('plan_cache_lookups_total').value(method='diet', result='hit') == hits + 1
+
+    text = get_metrics_registry().render()
+    assert 'fitsense_llm_request_duration_seconds_bucket{method="diet",le="+Inf"}' in text
+
+
+def test_errors_and_unusable_responses_count_fallbacks():
+    fallbacks = metric('llm_fallbacks_total')
+    errors = metric('llm_requests_total').value(method='calories', outcome='error')
+    error_fallbacks = fallbacks.value(method='calories', reason='error')
+    unusable = fallbacks.value(method='calories', reason='unusable')
+    failed = metric('llm_responses_total').value(method='calories', outcome='failed')
+
+    make_service(FakeModel(error=RuntimeError('quota exceeded'))).explain_calories_burned(SAMPLE_USER, WORKOUT)
+    assert metric('llm_requests_total').value(method='calories', outcome='error') == errors + 1
+    assert fallbacks.value(method='calories', reason='error') == error_fallbacks + 1
+
+    make_service(FakeModel('no json here')).explain_calories_burned(SAMPLE_USER, WORKOUT)
+    assert metric('llm_responses_total').value(method='calories', outcome='failed') == failed + 1
+    assert fallbacks.value(method='calories', reason='unusable') == unusable + 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
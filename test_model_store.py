@@ -0,0 +1,126 @@
+"""
+Tests for the model store: atomic saves, memory-mapped lazy loading and legacy model upgrades
+"""
+
+import json
+import pickle
+import sys
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pytest
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+from backend.config import TestingConfig
+from backend.ml_models import CalorieBurnPredictor
+from backend.model_store import MANIFEST_FILE, VERSIONS_DIR, LazyModelMixin, ModelStore, get_model_store
+
+
+class Model:
+    def __init__(self, weights):
+        self.weights = weights
+
+
+class LazySystem(LazyModelMixin):
+    MODEL_FILES = {'model': 'model.pkl', 'offsets': 'offsets.pkl'}
+
+    def _resolve_model(self, name, obj):
+        return obj + 1 if name == 'offsets' else obj
+
+
+def test_save_replaces_the_file_atomically(tmp_path):
+    store = ModelStore(tmp_path)
+    store.save('model.pkl', Model(np.arange(10.0)))
+    assert store.get('model.pkl').weights[3] == 3.0
+
+    # A failed dump leaves the previous file and no temporary files behind
+    with pytest.raises(pickle.PicklingError):
+        store.save('model.pkl', Model(lambda: None))
+    assert [path.name for path in tmp_path.iterdir()] == ['model.pkl']
+    assert ModelStore(tmp_path).get('model.pkl').weights[3] == 3.0
+
+    # A successful save drops the loaded copy so the next get reads the new file
+    store.save('model.pkl', Model(np.ones(10)))
+    assert store.get('model.pkl').weights[3] == 1.0
+
+
+def test_save_never_writes_into_a_published_version(tmp_path):
+    version_dir = tmp_path / VERSIONS_DIR / 'diet' / 'v1'
+    ModelStore(version_dir).save('model.pkl', Model(np.zeros(3)))
+    (tmp_path / MANIFEST_FILE).write_text(json.dumps({'diet': {'version': 'v1', 'files': ['model.pkl']}}))
+
+    store = ModelStore(tmp_path)
+    assert store.path('model.pkl') == version_dir / 'model.pkl'
+    store.save('model.pkl', Model(np.ones(3)))
+    assert ModelStore(version_dir).get('model.pkl').weights.tolist() == [0.0, 0.0, 0.0]
+    assert ModelStore(tmp_path, mmap_mode=None).get('model.pkl').weights.tolist() == [0.0, 0.0, 0.0]
+    assert joblib.load(tmp_path / 'model.pkl').weights.tolist() == [1.0, 1.0, 1.0]
+
+
+def test_arrays_are_memory_mapped_and_loaded_once(tmp_path):
+    store = ModelStore(tmp_path)
+    store.save('model.pkl', Model(np.random.default_rng(0).normal(size=(500, 100))))
+    assert not store.is_loaded('model.pkl')
+
+    model = store.get('model.pkl')
+    assert store.get('model.pkl') is model
+    assert isinstance(model.weights, np.memmap)
+    stats = store.stats()['model.pkl']
+    assert stats['mapped_bytes'] == 500 * 100 * 8 and stats['private_bytes'] == 0
+    assert stats['file_bytes'] >= stats['mapped_bytes']
+
+    in_memory = ModelStore(tmp_path, mmap_mode=None)
+    assert not isinstance(in_memory.get('model.pkl').weights, np.memmap)
+    assert in_memory.stats()['model.pkl']['private_bytes'] == 500 * 100 * 8
+
+
+def test_lazy_attributes_resolve_from_the_store_on_first_access(tmp_path):
+    store = get_model_store(tmp_path)
+    assert get_model_store(str(tmp_path)) is store
+    system = LazySystem()
+    with pytest.raises(FileNotFoundError):
+        system.bind_model_store(store)
+
+    store.save('model.pkl', Model(np.zeros(3)))
+    store.save('offsets.pkl', np.arange(3))
+    system.model = 'stale'
+    system.bind_model_store(store)
+    assert 'model' not in vars(system) and not store.is_loaded('model.pkl')
+
+    assert system.model.weights.tolist() == [0.0, 0.0, 0.0]
+    assert system.offsets.tolist() == [1, 2, 3]
+    assert vars(system)['model'] is store.get('model.pkl')
+    with pytest.raises(AttributeError):
+        system.missing
+
+
+def test_legacy_pickle_is_flattened_once(tmp_path):
+    config = type('Config', (TestingConfig,), {
+        'MODELS_PATH': str(tmp_path), 'CALORIE_PREDICTION_MODE': 'random_forest', 'TRAINING_CALORIE_SAMPLES': 300
+    })
+    trained = CalorieBurnPredictor(config)
+    trained.model.set_params(n_estimators=5)
+    trained.train_model()
+    flat_file = tmp_path / CalorieBurnPredictor.MODEL_FILES['flat_model']
+    # Models saved before the flat forest existed only have the sklearn pickle
+    flat_file.unlink()
+
+    user = {'age': 35, 'weight': 82, 'gender': 'female'}
+    workout = {'type': 'cardio', 'intensity': 'high', 'duration': 40}
+    first = CalorieBurnPredictor(config)
+    assert first.load_model()
+    assert flat_file.exists()
+    flattened_at = flat_file.stat().st_mtime_ns
+
+    second = CalorieBurnPredictor(config)
+    assert second.load_model()
+    assert flat_file.stat().st_mtime_ns == flattened_at
+    assert first.predict_calories(user, workout) == second.predict_calories(user, workout) == \
+        trained.predict_calories(user, workout)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
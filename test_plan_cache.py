@@ -0,0 +1,108 @@
+"""
+Tests for the two-tier plan cache and the bucketed profile fingerprint it is keyed on
+"""
+
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+from backend.plan_cache import PlanCache, profile_fingerprint
+
+SAMPLE_USER = {
+    'age': 28,
+    'weight': 70,
+    'height': 175,
+    'gender': 'male',
+    'activity_level': 'moderate',
+    'goal': 'weight-loss',
+    'diet_preference': 'non-vegan',
+    'workout_time': '30-45'
+}
+PLAN = {'target_calories': 1800, 'meal_plan': {'breakfast': {'name': 'Oats', 'calories': 500}}}
+
+
+def fingerprint(**changes):
+    return profile_fingerprint('diet', dict(SAMPLE_USER, **changes), 'v1')
+
+
+def test_fingerprint_buckets_age_height_and_weight():
+    base = fingerprint()
+    # Age and height round to 5 (years, cm), weight to 2 kg
+    assert fingerprint(age=29, height=176, weight=70.9) == base
+    assert fingerprint(age=31, height=173, weight=69.1) == base
+    assert fingerprint(age=33) != base
+    assert fingerprint(height=178) != base
+    assert fingerprint(weight=71.2) != base
+
+    # Text fields are normalized; fields the prompt does not use are ignored
+    assert fingerprint(gender=' Male ', goal='WEIGHT-LOSS') == base
+    assert fingerprint(workout_time='60+') == base
+    workout = profile_fingerprint('workout', SAMPLE_USER, 'v1')
+    assert profile_fingerprint('workout', dict(SAMPLE_USER, workout_time='60+'), 'v1') != workout
+    assert profile_fingerprint('diet', SAMPLE_USER, 'v2') != base
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = PlanCache(max_entries=2)
+    cache.set('a', 'diet', PLAN)
+    cache.set('b', 'diet', PLAN)
+    assert cache.get('a') == PLAN
+    cache.set('c', 'diet', PLAN)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == PLAN and cache.get('c') == PLAN
+    stats = cache.stats()
+    assert (stats['evictions'], stats['memory_entries'], stats['memory_hits'], stats['misses']) == (1, 2, 3, 1)
+
+    # Callers get copies, so mutating a returned plan does not change the cache
+    cache.get('a')['target_calories'] = 0
+    assert cache.get('a') == PLAN
+
+
+def test_expired_entries_are_dropped_from_both_tiers(tmp_path):
+    cache = PlanCache(str(tmp_path / 'plan_cache.db'), ttl_seconds=0.05)
+    cache.set('a', 'diet', PLAN)
+    assert cache.get('a') == PLAN
+    time.sleep(0.1)
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 2
+
+    with sqlite3.connect(str(tmp_path / 'plan_cache.db')) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM plan_cache').fetchone() == (0,)
+
+
+def test_persistent_tier_evicts_by_size_and_survives_a_restart(tmp_path):
+    db_path = str(tmp_path / 'plan_cache.db')
+    cache = PlanCache(db_path, max_entries=1, persistent_max_entries=2)
+    for key in ('a', 'b'):
+        cache.set(key, 'diet', dict(PLAN, key=key))
+        time.sleep(0.01)
+    # Reading 'a' from disk refreshes it, so 'b' is the least recently used when 'c' arrives
+    assert cache.get('a')['key'] == 'a'
+    assert cache.stats()['persistent_hits'] == 1
+    time.sleep(0.01)
+    cache.set('c', 'diet', dict(PLAN, key='c'))
+
+    restarted = PlanCache(db_path, max_entries=10, persistent_max_entries=2)
+    assert restarted.get('b') is None
+    assert restarted.get('a')['key'] == 'a' and restarted.get('c')['key'] == 'c'
+    assert restarted.stats()['persistent_hits'] == 2
+
+    # The plan is promoted to the memory tier on its first read
+    assert restarted.get('a')['key'] == 'a'
+    assert restarted.stats()['memory_hits'] == 1
+
+
+if __name__ == "__main__":
+    import tempfile
+    test_fingerprint_buckets_age_height_and_weight()
+    test_memory_tier_evicts_least_recently_used()
+    for test in (test_expired_entries_are_dropped_from_both_tiers,
+                 test_persistent_tier_evicts_by_size_and_survives_a_restart):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Plan cache tests passed!")
@@ -0,0 +1,145 @@
+"""
+Tests for the cluster-level diet plan library
+A fake Gemini service stands in for the API when building the library
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+from backend.config import TestingConfig
+from backend.ml_models import (
+    DIET_CLUSTER_FEATURES, DIET_PREFERENCES, GOALS, DietRecommendationSystem, calculate_target_calories
+)
+from backend.plan_library import LIBRARY_FILE, PlanLibrary, build_plan_library, scale_plan
+
+SAMPLE_USER = {
+    'age': 28,
+    'weight': 70,
+    'height': 175,
+    'gender': 'male',
+    'activity_level': 'moderate',
+    'goal': 'weight-loss',
+    'diet_preference': 'non-vegan',
+    'workout_time': '30-45'
+}
+MEAL = {'name': 'Lentil bowl', 'calories': 600, 'protein': 30, 'carbs': 80, 'fat': 15}
+LIBRARY_PLAN = {
+    'target_calories': 1800,
+    'macros': {'protein': 120, 'carbs': 200, 'fat': 60},
+    'meal_plan': {'breakfast': MEAL, 'lunch': MEAL, 'dinner': MEAL},
+    'recommendations': 'Drink water'
+}
+
+
+class FakeGeminiService:
+    """Counts calls; fails the library plan of one segment"""
+
+    template_version = 'test-v1'
+
+    def __init__(self, failing_goal=None):
+        self.failing_goal = failing_goal
+        self.library_calls = 0
+        self.diet_calls = 0
+
+    def generate_library_diet_plan(self, profile):
+        self.library_calls += 1
+        if profile['goal'] == self.failing_goal and profile['diet_preference'] == 'vegan':
+            raise ValueError('unusable response')
+        return dict(LIBRARY_PLAN)
+
+    def generate_diet_plan(self, user_data, fallback=True):
+        self.diet_calls += 1
+        return dict(LIBRARY_PLAN, target_calories=2222)
+
+
+def make_diet_system(models_path, **overrides):
+    config = type('Config', (TestingConfig,), {'MODELS_PATH': str(models_path), 'TRAINING_DIET_SAMPLES': 300, **overrides})
+    diet_system = DietRecommendationSystem(config)
+    diet_system.gemini_service = FakeGeminiService()
+    return diet_system
+
+
+def test_assign_cluster_matches_kmeans_predict(tmp_path):
+    trainer = make_diet_system(tmp_path)
+    df = trainer.train_models()
+
+    diet_system = make_diet_system(tmp_path)
+    assert diet_system.load_models()
+    expected = diet_system.kmeans.predict(diet_system.scaler.transform(df[DIET_CLUSTER_FEATURES].head(50)))
+    for (_, row), cluster in zip(df.head(50).iterrows(), expected):
+        user = {feature: row[feature] for feature in ('age', 'weight', 'height', 'gender', 'activity_level', 'goal',
+                                                      'diet_preference')}
+        assert diet_system.assign_cluster(user) == cluster
+    assert diet_system.assign_cluster(dict(SAMPLE_USER, goal='bulking')) is None
+
+
+def test_library_serves_scaled_plans_without_calling_gemini(tmp_path):
+    make_diet_system(tmp_path).train_models()
+    builder = make_diet_system(tmp_path)
+    builder.load_models()
+    service = FakeGeminiService(failing_goal='maintenance')
+    library = build_plan_library(builder, service)
+
+    segments = builder.kmeans.n_clusters * len(DIET_PREFERENCES) * len(GOALS)
+    assert service.library_calls == segments
+    assert len(library) == segments - builder.kmeans.n_clusters
+    assert len(library.metadata['failed']) == builder.kmeans.n_clusters
+    assert library.metadata['prompt_version'] == 'test-v1'
+
+    diet_system = make_diet_system(tmp_path)
+    assert diet_system.load_models() and len(diet_system.plan_library) == len(library)
+    # Loading the library leaves the KMeans model to be loaded on first use
+    assert 'kmeans' not in vars(diet_system)
+    plan = diet_system.predict_diet_plan(SAMPLE_USER)
+    assert diet_system.gemini_service.diet_calls == 0
+    assert plan['source'] == 'library'
+    assert plan['cluster'] == diet_system.assign_cluster(SAMPLE_USER)
+    assert plan['target_calories'] == calculate_target_calories(SAMPLE_USER)
+    assert plan['meal_plan']['lunch']['name'] == 'Lentil bowl'
+
+    # Personalized plans, and segments missing from the library, go to Gemini
+    assert diet_system.predict_diet_plan(SAMPLE_USER, personalize=True)['target_calories'] == 2222
+    assert diet_system.predict_diet_plan(dict(SAMPLE_USER, goal='maintenance', diet_preference='vegan'))['target_calories'] == 2222
+    assert diet_system.gemini_service.diet_calls == 2
+    assert diet_system.library_diet_plan(SAMPLE_USER)['source'] == 'library'
+    assert diet_system.library_diet_plan(dict(SAMPLE_USER, goal='maintenance', diet_preference='vegan')) is None
+    assert diet_system.gemini_service.diet_calls == 2
+
+
+def test_library_of_other_models_is_ignored(tmp_path):
+    make_diet_system(tmp_path).train_models()
+    path = tmp_path / LIBRARY_FILE
+    PlanLibrary({'0:non-vegan:weight-loss': LIBRARY_PLAN}, 'stale-fingerprint').save(path)
+    assert PlanLibrary.load(path).kmeans_fingerprint == 'stale-fingerprint'
+
+    diet_system = make_diet_system(tmp_path)
+    assert diet_system.load_models()
+    diet_system.predict_diet_plan(SAMPLE_USER)
+    assert diet_system.gemini_service.diet_calls == 1
+    assert diet_system.plan_library is None
+
+    path.write_text('{not json')
+    assert PlanLibrary.load(path) is None
+
+
+def test_scale_plan():
+    scaled = scale_plan(LIBRARY_PLAN, 2700)
+    assert scaled['target_calories'] == 2700
+    assert scaled['meal_plan']['breakfast'] == {'name': 'Lentil bowl', 'calories': 900, 'protein': 45, 'carbs': 120,
+                                                'fat': 22}
+    assert scaled['macros'] == {'protein': 180, 'carbs': 300, 'fat': 90}
+    assert json.loads(json.dumps(scaled)) == scaled
+
+
+if __name__ == "__main__":
+    import tempfile
+    for test in (test_assign_cluster_matches_kmeans_predict, test_library_serves_scaled_plans_without_calling_gemini,
+                 test_library_of_other_models_is_ignored):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    test_scale_plan()
+    print("✅ Plan library tests passed!")
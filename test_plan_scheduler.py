@@ -0,0 +1,246 @@
+"""
+Tests for the off-peak next-day plan scheduler
+Scheduler runs use fake recommendation systems and need TEST_DATABASE_URL to point
+at a disposable PostgreSQL database; they are dated in 2099 to stay clear of other data
+"""
+
+import os
+import sys
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+from backend.config import TestingConfig
+from backend.database_setup import DatabaseManager
+from backend.gemini_service import LLMRateLimiter
+from backend.ml_models import DietRecommendationSystem, WorkoutRecommendationSystem
+from backend.plan_scheduler import PlanScheduler, in_window, parse_window
+from backend.resilience import CircuitBreaker
+from conftest import FakeModel, make_service
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+requires_db = pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL is not set')
+
+RUN_AT = datetime(2099, 1, 1, 2, 0)
+PLAN_DATE = date(2099, 1, 2)
+EMAIL_PREFIX = 'plan-scheduler-test-'
+PROFILE = {
+    'age': 28,
+    'weight': 70,
+    'height': 175,
+    'gender': 'male',
+    'activity_level': 'moderate',
+    'goal': 'weight-loss',
+    'diet_preference': 'non-vegan',
+    'workout_time': '30-45'
+}
+MEAL = {'name': 'Oats', 'calories': 500, 'protein': 30, 'carbs': 60, 'fat': 15}
+WORKOUT = {'name': 'Full Body', 'exercises': [{'name': 'Squats', 'sets': 3, 'reps': 12, 'duration': 10, 'calories': 80}]}
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeService:
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        self.rate_limiter = None
+
+
+class FakeDietSystem:
+    """Records the users it plans for; fails users aged 99"""
+
+    def __init__(self, on_call=None):
+        self.gemini_service = FakeService()
+        self.ages = []
+        self.on_call = on_call
+
+    def predict_diet_plan(self, profile, fallback=True):
+        self.ages.append(profile['age'])
+        if self.on_call:
+            self.on_call()
+        if profile['age'] == 99:
+            raise RuntimeError('generation failed')
+        return {'target_calories': 1500, 'meal_plan': {'breakfast': MEAL, 'lunch': MEAL, 'dinner': MEAL}}
+
+
+class FakeWorkoutSystem:
+    def generate_workout_plan(self, profile, fallback=True):
+        return WORKOUT
+
+
+class UnavailableModel(FakeModel):
+    """Fails every call like a Gemini outage"""
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        self.record(prompt, generation_config)
+        raise RuntimeError('503 Service Unavailable')
+
+
+def delete_test_users(db):
+    with db.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT id FROM users WHERE email LIKE %s', (EMAIL_PREFIX + '%',))
+            user_ids = [row[0] for row in cursor.fetchall()]
+            if user_ids:
+                for table in ('diet_plans', 'workout_plans', 'daily_summaries', 'daily_logs', 'user_profiles'):
+                    cursor.execute(f'DELETE FROM {table} WHERE user_id = ANY(%s)', (user_ids,))
+                cursor.execute('DELETE FROM users WHERE id = ANY(%s)', (user_ids,))
+        conn.commit()
+
+
+@pytest.fixture
+def db():
+    manager = DatabaseManager(TEST_DATABASE_URL)
+    manager.create_tables()
+    manager.migrate()
+    delete_test_users(manager)
+    yield manager
+    delete_test_users(manager)
+    manager.close()
+
+
+def add_user(db, age, profile_updated_at, logged_on=None):
+    user_id = db.create_user(f'{EMAIL_PREFIX}{uuid.uuid4().hex}@example.com', 'secret', 'Test User')
+    db.save_user_profile(user_id, dict(PROFILE, age=age))
+    with db.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('UPDATE user_profiles SET updated_at = %s WHERE user_id = %s', (profile_updated_at, user_id))
+        conn.commit()
+    if logged_on:
+        db.log_daily_progress(user_id, logged_on, weight=70)
+    return user_id
+
+
+def count_plans(db, user_ids):
+    with db.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT (SELECT COUNT(*) FROM diet_plans WHERE user_id = ANY(%s)), '
+                           '(SELECT COUNT(*) FROM workout_plans WHERE user_id = ANY(%s))', (user_ids, user_ids))
+            return cursor.fetchone()
+
+
+def make_scheduler(db, diet_system, clock, **settings):
+    config = type('Config', (TestingConfig,), {'PLAN_SCHEDULER_WINDOW': '01:00-05:00', **settings})
+    return PlanScheduler(db, diet_system, FakeWorkoutSystem(), config, workers=2, rate_limit=0, batch_size=2,
+                         clock=clock)
+
+
+def test_rate_limiter_spaces_calls_after_the_burst():
+    clock = FakeClock(0.0)
+    sleeps = []
+    limiter = LLMRateLimiter(rate=2, burst=2, clock=clock, sleep=sleeps.append)
+    waits = [limiter.acquire() for _ in range(4)]
+    assert waits == [0.0, 0.0, 0.5, 1.0]
+    assert sleeps == [0.5, 1.0]
+
+    # Idle time refills the bucket up to the burst size
+    clock.now = 10.0
+    assert limiter.acquire() == 0.0
+    assert limiter.stats()['calls'] == 5
+
+
+def test_off_peak_window_may_wrap_past_midnight():
+    night = parse_window('23:00-04:30')
+    assert in_window(datetime(2099, 1, 1, 23, 30), night)
+    assert in_window(datetime(2099, 1, 1, 4, 0), night)
+    assert not in_window(datetime(2099, 1, 1, 12, 0), night)
+    assert in_window(datetime(2099, 1, 1, 2, 0), parse_window('01:00-05:00'))
+    with pytest.raises(ValueError):
+        parse_window('1am-5am')
+
+
+@requires_db
+def test_next_day_plans_are_generated_for_active_users_missing_them(db):
+    profile_active = add_user(db, 30, RUN_AT - timedelta(days=1))
+    logging_active = add_user(db, 31, RUN_AT - timedelta(days=90), logged_on='2098-12-30')
+    add_user(db, 32, RUN_AT - timedelta(days=90))
+    add_user(db, 99, RUN_AT - timedelta(days=1))
+    planned = add_user(db, 33, RUN_AT - timedelta(days=1))
+    db.save_plans_bulk(diet_plans=[(planned, PLAN_DATE, {'breakfast': MEAL})],
+                       workout_plans=[(planned, PLAN_DATE, WORKOUT)])
+
+    diet_system = FakeDietSystem()
+    stats = make_scheduler(db, diet_system, FakeClock(RUN_AT)).run()
+    assert sorted(diet_system.ages) == [30, 31, 99]
+    assert (stats['status'], stats['date'], stats['users'], stats['saved'], stats['failed'], stats['batches']) == \
+        ('completed', '2099-01-02', 3, 2, 1, 2)
+
+    for user_id in (profile_active, logging_active):
+        with db.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM diet_plans WHERE user_id = %s AND date = %s', (user_id, PLAN_DATE))
+                assert cursor.fetchone()[0] == 3
+                cursor.execute('SELECT exercise_name FROM workout_plans WHERE user_id = %s AND date = %s',
+                               (user_id, PLAN_DATE))
+                assert cursor.fetchall() == [('Squats',)]
+
+    # A second run only retries the user whose generation failed; force redoes everyone active
+    diet_system.ages.clear()
+    make_scheduler(db, diet_system, FakeClock(RUN_AT)).run()
+    assert diet_system.ages == [99]
+    diet_system.ages.clear()
+    make_scheduler(db, diet_system, FakeClock(RUN_AT)).run(force=True)
+    assert sorted(diet_system.ages) == [30, 31, 33, 99]
+
+
+@requires_db
+def test_scheduler_stays_inside_the_off_peak_window(db):
+    for age in (40, 41, 42):
+        add_user(db, age, RUN_AT - timedelta(days=1))
+
+    clock = FakeClock(RUN_AT.replace(hour=12))
+    diet_system = FakeDietSystem()
+    assert make_scheduler(db, diet_system, clock).run()['status'] == 'outside_window'
+    assert diet_system.ages == []
+
+    # The page in progress when the window closes is finished and saved, then the run stops
+    clock.now = RUN_AT.replace(hour=4, minute=59)
+
+    def close_window():
+        clock.now = RUN_AT.replace(hour=5, minute=1)
+
+    diet_system = FakeDietSystem(on_call=close_window)
+    stats = make_scheduler(db, diet_system, clock).run(plan_date=PLAN_DATE)
+    assert (stats['status'], stats['saved'], stats['batches']) == ('window_closed', 2, 1)
+
+
+@requires_db
+def test_fallback_plans_are_not_saved_during_an_outage(db, tmp_path):
+    user_ids = [add_user(db, age, RUN_AT - timedelta(days=1)) for age in (50, 55, 60, 65)]
+    model = UnavailableModel()
+    service = make_service(model, LLM_BREAKER_FAILURE_THRESHOLD=2, LLM_BREAKER_RESET_TIMEOUT=60)
+    config = type('Config', (TestingConfig,), {'MODELS_PATH': str(tmp_path), 'PLAN_SCHEDULER_WINDOW': '01:00-05:00'})
+    diet_system = DietRecommendationSystem(config)
+    workout_system = WorkoutRecommendationSystem(config)
+    diet_system.gemini_service = workout_system.gemini_service = service
+
+    scheduler = PlanScheduler(db, diet_system, workout_system, config, workers=1, rate_limit=6000, batch_size=4,
+                              clock=FakeClock(RUN_AT))
+    stats = scheduler.run()
+    # Two failures open the breaker; the rest of the page is skipped user by user without calling Gemini
+    assert (stats['status'], stats['users'], stats['saved'], stats['failed']) == ('circuit_open', 4, 0, 4)
+    assert model.calls == 2
+    assert count_plans(db, user_ids) == (0, 0)
+
+    # The scheduler's budget is spent by its own calls and never installed on the shared service
+    assert stats['rate_limiter']['calls'] == 2
+    assert service.rate_limiter is None
+
+    # Once Gemini is back, the next run still finds these users without plans
+    pending = db.get_active_profiles(RUN_AT - timedelta(days=7), PLAN_DATE, missing_only=True)
+    assert set(user_ids) <= {user_id for user_id, _ in pending}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,176 @@
+"""
+Tests for the circuit breaker, call deadlines and hedged requests
+A fake model injects latency and errors in place of the Gemini API
+"""
+
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.gemini_service import LLMConcurrencyLimiter, LLMRateLimiter
+from backend.metrics import get_metrics_registry
+from backend.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, call_with_deadline
+from conftest import SAMPLE_USER, FakeModel, make_service
+
+WORKOUT = {'type': 'running', 'intensity': 'moderate', 'duration': 30}
+
+
+class FaultInjectingModel(FakeModel):
+    """Answers after `latency` seconds, or raises `error`; counts calls"""
+
+    def __init__(self, latency=0.0, error=None):
+        super().__init__(json.dumps({'calories_burned': 321}))
+        self.latency = latency
+        self.error = error
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        response = super().generate_content(prompt, generation_config)
+        time.sleep(self.latency)
+        if self.error:
+            raise self.error
+        return response
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fallbacks(reason):
+    return get_metrics_registry()._metrics['fitsense_llm_fallbacks_total'].value(method='calories', reason=reason)
+
+
+def test_breaker_opens_then_half_opens_for_a_single_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=clock)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now = 10
+    assert breaker.state == 'half_open'
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    clock.now = 20
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.stats()['trips'] == 1 and breaker.stats()['rejected'] == 2
+
+
+def test_slow_provider_is_cut_off_at_the_deadline():
+    timeouts = fallbacks('timeout')
+    service = make_service(FaultInjectingModel(latency=1.0), LLM_CALL_TIMEOUT=0.1)
+
+    start = time.perf_counter()
+    result = service.explain_calories_burned(SAMPLE_USER, WORKOUT)
+    assert time.perf_counter() - start < 0.5
+    assert 'explanation' in result  # the MET-formula fallback
+    assert fallbacks('timeout') == timeouts + 1
+
+
+def test_failing_provider_trips_the_breaker_and_stops_being_called():
+    model = FaultInjectingModel(latency=0.05, error=RuntimeError('503 Service Unavailable'))
+    service = make_service(model, LLM_BREAKER_FAILURE_THRESHOLD=2, LLM_BREAKER_RESET_TIMEOUT=60)
+    rejected = fallbacks('circuit_open')
+
+    for _ in range(2):
+        service.explain_calories_burned(SAMPLE_USER, WORKOUT)
+    start = time.perf_counter()
+    for _ in range(5):
+        service.explain_calories_burned(SAMPLE_USER, WORKOUT)
+
+    assert model.calls == 2
+    assert time.perf_counter() - start < 0.05
+    assert fallbacks('circuit_open') == rejected + 5
+    assert service.breaker.stats()['open'] == 1
+
+
+def test_recovered_provider_closes_the_breaker():
+    clock = FakeClock()
+    model = FaultInjectingModel(error=RuntimeError('boom'))
+    service = make_service(model, breaker=CircuitBreaker(1, reset_timeout=5, clock=clock))
+    service.explain_calories_burned(SAMPLE_USER, WORKOUT)
+    assert service.breaker.state == 'open'
+
+    model.error = None
+    clock.now = 5
+    assert service.explain_calories_burned(SAMPLE_USER, WORKOUT)['calories_burned'] == 321
+    assert service.breaker.state == 'closed'
+
+
+def test_hedged_attempt_wins_when_the_first_is_slow():
+    delays = iter([1.0, 0.0])
+    executor = ThreadPoolExecutor(max_workers=2)
+
+    def call():
+        delay = next(delays)
+        time.sleep(delay)
+        return delay
+
+    start = time.perf_counter()
+    result, attempts = call_with_deadline(call, executor, timeout=2, hedge_after=0.05)
+    assert (result, attempts) == (0.0, 2)
+    assert time.perf_counter() - start < 0.5
+
+    with pytest.raises(DeadlineExceeded):
+        call_with_deadline(lambda: time.sleep(0.5), executor, timeout=0.05)
+    executor.shutdown(wait=True)
+
+
+def test_service_hedges_slow_calls():
+    slow_first = FaultInjectingModel()
+    original = slow_first.generate_content
+    calls = []
+
+    def generate_content(prompt, generation_config=None):
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(1.0)
+        return original(prompt, generation_config)
+
+    slow_first.generate_content = generate_content
+    service = make_service(slow_first, LLM_HEDGE_ENABLED=True, LLM_HEDGE_MIN_SAMPLES=0, LLM_CALL_TIMEOUT=2)
+    assert service._hedge_delay('calories') is not None
+    # Pin the delay instead of relying on latencies recorded by other tests
+    service._hedge_delay = lambda kind: 0.05
+
+    start = time.perf_counter()
+    assert service.explain_calories_burned(SAMPLE_USER, WORKOUT)['calories_burned'] == 321
+    assert time.perf_counter() - start < 0.9
+    assert len(calls) == 2
+    assert service.limiter.stats()['calls'] == 2
+    assert service.limiter.stats()['in_flight'] == 0
+
+
+def test_hedge_is_skipped_without_a_free_slot_or_rate_token():
+    model = FaultInjectingModel(latency=0.3)
+    service = make_service(model, LLM_HEDGE_ENABLED=True, LLM_CALL_TIMEOUT=2)
+    service.limiter = LLMConcurrencyLimiter(1)
+    service._hedge_delay = lambda kind: 0.05
+    assert service.explain_calories_burned(SAMPLE_USER, WORKOUT)['calories_burned'] == 321
+    assert model.calls == 1
+
+    # A free slot is not enough when the rate limiter has no token to spare
+    service.limiter = LLMConcurrencyLimiter(2)
+    service.rate_limiter = LLMRateLimiter(rate=0.01, burst=1)
+    assert service.explain_calories_burned(SAMPLE_USER, WORKOUT)['calories_burned'] == 321
+    assert model.calls == 2
+    assert service.limiter.stats()['in_flight'] == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
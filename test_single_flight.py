@@ -0,0 +1,132 @@
+"""
+Tests for single-flight coalescing of identical concurrent plan generations
+Cross-worker coalescing is exercised with two SingleFlight instances sharing one lock file
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+
+from backend.single_flight import SingleFlight
+from conftest import DIET_PLAN, SAMPLE_USER, FakeModel, make_service
+
+
+class SlowModel(FakeModel):
+    """Holds every call until released so duplicate requests overlap"""
+
+    def __init__(self):
+        super().__init__(json.dumps(DIET_PLAN))
+        self.release = threading.Event()
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        response = super().generate_content(prompt, generation_config)
+        self.release.wait(5)
+        return response
+
+
+def run_threads(target, count):
+    results = [None] * count
+
+    def run(index):
+        results[index] = target()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_duplicate_requests_share_one_generation():
+    model = SlowModel()
+    service = make_service(model)
+
+    threads, results = run_threads(lambda: service.generate_diet_plan(SAMPLE_USER), 5)
+    time.sleep(0.2)
+    model.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert model.calls == 1
+    assert all(result == DIET_PLAN for result in results)
+    assert len({id(result) for result in results}) == 5
+    assert service.single_flight.stats()['coalesced'] == 4
+
+
+def test_workers_sharing_a_lock_file_reuse_the_leaders_plan(tmp_path):
+    lock_path = str(tmp_path / 'plan_cache.db')
+    worker_a = SingleFlight(lock_path, poll_interval=0.01)
+    worker_b = SingleFlight(lock_path, poll_interval=0.01)
+    cache = {}
+    release = threading.Event()
+    b_calls = []
+
+    def generate_a():
+        release.wait(5)
+        cache['key'] = {'plan': 'from a'}
+        return cache['key']
+
+    def generate_b():
+        b_calls.append(1)
+        return {'plan': 'from b'}
+
+    threads_a, results_a = run_threads(lambda: worker_a.do('key', generate_a, lookup=lambda: cache.get('key')), 1)
+    time.sleep(0.1)
+    threads_b, results_b = run_threads(lambda: worker_b.do('key', generate_b, lookup=lambda: cache.get('key')), 1)
+    time.sleep(0.1)
+    assert worker_b.stats()['peer_waits'] == 1
+    release.set()
+    for thread in threads_a + threads_b:
+        thread.join()
+
+    assert results_a == results_b == [{'plan': 'from a'}]
+    assert b_calls == []
+    assert worker_b.stats()['peer_results'] == 1
+
+
+def test_expired_lock_of_a_dead_worker_is_taken_over(tmp_path):
+    lock_path = str(tmp_path / 'plan_cache.db')
+    dead = SingleFlight(lock_path, lease_seconds=0.05)
+    assert dead._try_acquire('key', 'dead-worker')
+
+    start = time.monotonic()
+    result = SingleFlight(lock_path, poll_interval=0.01).do('key', lambda: 'generated')
+    assert result == 'generated'
+    assert time.monotonic() - start < 2
+
+
+def test_lease_is_renewed_while_the_leader_is_still_generating(tmp_path):
+    lock_path = str(tmp_path / 'plan_cache.db')
+    leader = SingleFlight(lock_path, lease_seconds=0.1, poll_interval=0.01)
+    peer = SingleFlight(lock_path, lease_seconds=0.1, poll_interval=0.01)
+    cache = {}
+    peer_calls = []
+
+    def generate_slowly():
+        # Outlives several leases; without renewal the peer would take the lock over
+        time.sleep(0.5)
+        cache['key'] = 'from leader'
+        return cache['key']
+
+    def generate_peer():
+        peer_calls.append(1)
+        return 'from peer'
+
+    threads, results = run_threads(lambda: leader.do('key', generate_slowly), 1)
+    time.sleep(0.05)
+    assert peer.do('key', generate_peer, lookup=lambda: cache.get('key')) == 'from leader'
+    for thread in threads:
+        thread.join()
+    assert results == ['from leader'] and peer_calls == []
+
+
+if __name__ == "__main__":
+    import tempfile
+    test_duplicate_requests_share_one_generation()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_workers_sharing_a_lock_file_reuse_the_leaders_plan(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_expired_lock_of_a_dead_worker_is_taken_over(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_lease_is_renewed_while_the_leader_is_still_generating(Path(tmp))
+    print("✅ Single-flight tests passed!")
@@ -0,0 +1,103 @@
+"""
+Tests for Gemini structured output: compiled response schemas, shorter prompts and token accounting
+Uses a local fake model that records the generation config it receives
+"""
+
+import json
+import sys
+
+import pytest
+from google.generativeai.types.generation_types import to_generation_config_dict
+
+from backend.gemini_service import PROMPT_TEMPLATE_VERSION, llm_stats
+from backend.plan_schemas import DietPlan, WeeklyPlan, response_schema, schema_example
+from conftest import DIET_PLAN, SAMPLE_USER, FakeModel, FakeResponse, make_service
+
+
+class UsageMetadata:
+    def __init__(self, prompt, output):
+        self.prompt_token_count = prompt
+        self.candidates_token_count = output
+        self.total_token_count = prompt + output
+
+
+class StructuredModel(FakeModel):
+    """Reports token usage like the real API, on the last chunk when streaming"""
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        self.record(prompt, generation_config)
+        if not stream:
+            return FakeResponse(self.text, UsageMetadata(len(prompt.split()), 50))
+        middle = len(self.text) // 2
+        return iter([FakeResponse(self.text[:middle]), FakeResponse(self.text[middle:], UsageMetadata(10, 20))])
+
+
+def test_response_schema_is_compiled_from_the_plan_definitions():
+    schema = response_schema(DietPlan)
+    assert schema['required'] == ['target_calories', 'macros', 'meal_plan']
+    breakfast = schema['properties']['meal_plan']['properties']['breakfast']
+    assert breakfast['required'] == ['name', 'calories', 'protein', 'carbs', 'fat']
+    assert breakfast['properties']['time'] == {'type': 'string'}
+    days = response_schema(WeeklyPlan)['properties']['days']
+    assert days['type'] == 'array' and days['items']['required'] == ['meal_plan', 'workout']
+    # The SDK accepts the compiled schema as-is
+    assert to_generation_config_dict({'response_schema': response_schema(WeeklyPlan)})['response_schema']
+
+
+def test_structured_calls_send_the_schema_instead_of_an_example():
+    model = StructuredModel(json.dumps(DIET_PLAN))
+    service = make_service(model, LLM_STRUCTURED_OUTPUT=True)
+    before = llm_stats()['tokens'].get('diet', {'calls': 0, 'output_tokens': 0})
+
+    assert service.generate_diet_plan(SAMPLE_USER)['target_calories'] == 1800
+    call = model.requests[0]
+    assert call['generation_config'] == {
+        'response_mime_type': 'application/json',
+        'response_schema': response_schema(DietPlan)
+    }
+    assert 'Format the response' not in call['prompt']
+    assert '"target_calories"' not in call['prompt']
+
+    usage = llm_stats()['tokens']['diet']
+    assert usage['calls'] == before['calls'] + 1
+    assert usage['output_tokens'] == before['output_tokens'] + 50
+
+
+def test_output_mode_is_part_of_the_plan_cache_key():
+    structured = make_service(StructuredModel(json.dumps(DIET_PLAN)), LLM_STRUCTURED_OUTPUT=True)
+    free_text = make_service(StructuredModel(json.dumps(DIET_PLAN)), LLM_STRUCTURED_OUTPUT=False)
+    assert structured.template_version.startswith(PROMPT_TEMPLATE_VERSION)
+    structured_key, _ = structured._cached_plan('diet', SAMPLE_USER)
+    free_text_key, _ = free_text._cached_plan('diet', SAMPLE_USER)
+    assert structured_key != free_text_key
+
+
+def test_free_text_mode_keeps_the_json_example_in_the_prompt():
+    model = StructuredModel(json.dumps(DIET_PLAN))
+    service = make_service(model, LLM_STRUCTURED_OUTPUT=False)
+    service.generate_diet_plan(SAMPLE_USER)
+    call = model.requests[0]
+    assert call['generation_config'] is None
+    assert schema_example(DietPlan) in call['prompt']
+
+    structured = StructuredModel(json.dumps(DIET_PLAN))
+    make_service(structured, LLM_STRUCTURED_OUTPUT=True).generate_diet_plan(SAMPLE_USER)
+    assert len(structured.requests[0]['prompt']) < len(call['prompt']) * 0.7
+
+
+def test_streaming_calls_use_the_schema_and_record_tokens_from_the_last_chunk():
+    workout = {'workout_name': 'W', 'exercises': [{'name': 'Squats'}, {'name': 'Plank'}]}
+    model = StructuredModel(json.dumps(workout))
+    before = llm_stats()['tokens'].get('custom_workout', {'calls': 0, 'total_tokens': 0})
+
+    events = list(make_service(model, LLM_STRUCTURED_OUTPUT=True).stream_workout_plan_from_prompt('custom'))
+    assert events[-1] == ('plan', workout)
+    assert model.requests[0]['generation_config']['response_mime_type'] == 'application/json'
+
+    usage = llm_stats()['tokens']['custom_workout']
+    assert usage['calls'] == before['calls'] + 1
+    assert usage['total_tokens'] == before['total_tokens'] + 30
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,58 @@
+"""
+Tests for the incremental training pipeline
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+from backend.config import TestingConfig
+from backend.model_store import ModelStore
+from backend.training_pipeline import TrainingPipeline, model_artifacts, MANIFEST_FILE, VERSIONS_DIR
+
+
+def make_config(models_path, **overrides):
+    settings = {
+        'MODELS_PATH': str(models_path),
+        'TRAINING_DIET_SAMPLES': 300,
+        'TRAINING_CALORIE_SAMPLES': 300,
+        **overrides
+    }
+    return type('Config', (TestingConfig,), settings)
+
+
+def test_pipeline_trains_in_parallel_then_skips_unchanged_models(tmp_path):
+    pipeline = TrainingPipeline(make_config(tmp_path), workers=2, n_jobs=1)
+    first = pipeline.run()
+    assert {name: result['status'] for name, result in first.items()} == {'diet': 'trained', 'calorie': 'trained'}
+    store = ModelStore(tmp_path)
+    for name in first:
+        version_dir = tmp_path / VERSIONS_DIR / name / first[name]['version']
+        assert list((tmp_path / VERSIONS_DIR / name).iterdir()) == [version_dir]
+        # Artifacts stay in their version directory; the store resolves them through the manifest
+        assert all(store.path(f) == version_dir / f and not (tmp_path / f).exists() for f in model_artifacts(name))
+    assert not list(tmp_path.glob('.*.tmp'))
+
+    manifest = json.loads((tmp_path / MANIFEST_FILE).read_text())
+    assert manifest['calorie']['fingerprint'] == first['calorie']['fingerprint']
+
+    second = pipeline.run()
+    assert {result['status'] for result in second.values()} == {'skipped'}
+
+    # Changing the data settings of one model only retrains that model
+    third = TrainingPipeline(make_config(tmp_path, TRAINING_CALORIE_SAMPLES=400), workers=2, n_jobs=1).run()
+    assert third['diet']['status'] == 'skipped'
+    assert third['calorie']['status'] == 'trained'
+    assert third['calorie']['fingerprint'] != first['calorie']['fingerprint']
+    assert store.path('calorie_burn_scaler.pkl').parent.name == third['calorie']['version']
+    assert store.path('diet_scaler.pkl').parent.name == first['diet']['version']
+
+
+if __name__ == "__main__":
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        test_pipeline_trains_in_parallel_then_skips_unchanged_models(Path(tmp))
+    print("✅ Training pipeline tests passed!")
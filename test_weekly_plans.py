@@ -0,0 +1,78 @@
+"""
+Tests for multi-day plan generation in a single Gemini call
+Uses a local fake model instead of calling the Gemini API
+"""
+
+import json
+import sys
+
+import pytest
+
+from backend.gemini_service import validate_weekly_plan
+from conftest import SAMPLE_USER, FakeModel, make_service
+
+
+def make_day(index):
+    meal = {'calories': 600, 'protein': 40, 'carbs': 60, 'fat': 20}
+    return {
+        'meal_plan': {
+            'breakfast': {'name': f'Oats {index}', **meal},
+            'lunch': {'name': f'Chicken Bowl {index}', **meal},
+            'dinner': {'name': f'Salmon {index}', **meal}
+        },
+        'workout': {'name': f'Day {index}', 'exercises': [{'name': 'Squats', 'sets': 3, 'reps': 12, 'duration': 5}]}
+    }
+
+
+def make_plan(days):
+    return {
+        'target_calories': 1800,
+        'macros': {'protein': 120, 'carbs': 180, 'fat': 60},
+        'recommendations': 'Drink water',
+        'days': [make_day(index) for index in range(1, days + 1)]
+    }
+
+
+def test_seven_days_come_from_one_call_and_are_cached():
+    model = FakeModel('Here is your plan:\n' + json.dumps(make_plan(7)))
+    service = make_service(model)
+
+    plan = service.generate_weekly_plan(SAMPLE_USER, days=7)
+    assert model.calls == 1
+    assert plan['target_calories'] == 1800
+    assert [day['day'] for day in plan['days']] == list(range(1, 8))
+    assert plan['days'][6]['meal_plan']['dinner']['name'] == 'Salmon 7'
+    assert plan['days'][0]['workout']['exercises'][0]['name'] == 'Squats'
+
+    assert service.generate_weekly_plan(SAMPLE_USER, days=7) == plan
+    assert model.calls == 1
+
+
+def test_invalid_response_falls_back_for_every_day():
+    broken = make_plan(7)
+    del broken['days'][3]['meal_plan']['lunch']['protein']
+    for text in (json.dumps(make_plan(6)), json.dumps(broken), 'not json'):
+        service = make_service(FakeModel(text))
+        plan = service.generate_weekly_plan(SAMPLE_USER, days=7)
+        assert len(plan['days']) == 7
+        assert plan['days'][0]['workout']['name'] == 'Basic Full Body Workout'
+        # Fallback plans are not cached
+        assert service.plan_cache.stats()['memory_entries'] == 0
+
+
+@pytest.mark.parametrize('mutate, message', [
+    (lambda plan: plan['days'].pop(), 'expected 7 days'),
+    (lambda plan: plan['days'][2]['meal_plan'].pop('dinner'), 'day 3 dinner'),
+    (lambda plan: plan['days'][1]['meal_plan']['lunch'].update(calories='lots'), 'day 2 lunch calories'),
+    (lambda plan: plan['days'][4]['workout'].update(exercises=[]), 'day 5 has no workout'),
+    (lambda plan: plan.update(target_calories=None), 'target_calories'),
+])
+def test_validation_reports_the_first_problem(mutate, message):
+    plan = make_plan(7)
+    mutate(plan)
+    with pytest.raises(ValueError, match=message):
+        validate_weekly_plan(plan, 7)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
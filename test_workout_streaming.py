@@ -0,0 +1,91 @@
+"""
+Tests for incremental JSON parsing and streamed workout generation
+Uses a local fake model that streams a canned response in small chunks
+"""
+
+import json
+import sys
+
+import pytest
+
+from backend.llm_json import JsonArrayStreamParser
+from conftest import FakeModel, FakeResponse, make_service
+
+WORKOUT = {
+    'workout_name': 'Leg Day {hard} [v2]',
+    'exercises': [
+        {'name': 'Squats', 'sets': 3, 'reps': '10-12', 'muscle_groups': ['Legs', 'Glutes']},
+        {'name': 'Lunges "walking" }', 'sets': 3, 'reps': '12', 'notes': {'tempo': [3, 1, 1]}},
+        {'name': 'Plank', 'sets': 2, 'reps': '45 seconds'}
+    ],
+    'total_duration': 30
+}
+RESPONSE = 'Here is your workout:\n```json\n' + json.dumps(WORKOUT, indent=2) + '\n```'
+
+
+def chunks(text, size=7):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class StreamingModel(FakeModel):
+    """Streams the response in small chunks; records how many chunks were sent"""
+
+    def __init__(self, text, fail_after=None):
+        super().__init__(text)
+        self.fail_after = fail_after
+        self.sent = 0
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        assert stream
+        self.record(prompt, generation_config)
+        for index, part in enumerate(chunks(self.text)):
+            if self.fail_after is not None and index == self.fail_after:
+                raise ConnectionError('stream interrupted')
+            self.sent += 1
+            yield FakeResponse(part)
+
+
+def test_parser_emits_each_item_once_it_is_complete():
+    parser = JsonArrayStreamParser('exercises')
+    emitted = []
+    for part in chunks(RESPONSE, size=3):
+        emitted.extend(parser.feed(part))
+    assert emitted == WORKOUT['exercises']
+    assert parser.document() == WORKOUT
+
+    # Nested arrays and other keys are not mistaken for the target array
+    parser = JsonArrayStreamParser('exercises')
+    assert parser.feed('{"tips": ["exercises"], "meta": {"exercises": [{"x": 1}]}, "exercises": [{"a": 1') == []
+    assert parser.feed('}, {"b": 2}]}') == [{'a': 1}, {'b': 2}]
+
+
+def test_first_exercise_streams_before_the_response_finishes():
+    model = StreamingModel(RESPONSE)
+    stream = make_service(model).stream_workout_plan_from_prompt('custom workout')
+
+    kind, exercise = next(stream)
+    assert (kind, exercise) == ('exercise', WORKOUT['exercises'][0])
+    assert model.sent < len(chunks(RESPONSE)) / 2
+
+    events = list(stream)
+    assert [payload for kind, payload in events if kind == 'exercise'] == WORKOUT['exercises'][1:]
+    assert events[-1] == ('plan', WORKOUT)
+
+
+def test_interrupted_stream_keeps_the_exercises_received():
+    cut = RESPONSE.index('Plank') // 7
+    events = list(make_service(StreamingModel(RESPONSE, fail_after=cut)).stream_workout_plan_from_prompt('x'))
+    kind, plan = events[-1]
+    assert kind == 'plan'
+    assert plan['exercises'] == WORKOUT['exercises'][:2]
+
+
+def test_without_a_model_the_fallback_plan_is_streamed():
+    events = list(make_service(None).stream_workout_plan_from_prompt('x'))
+    kind, plan = events[-1]
+    assert kind == 'plan' and plan['workout_name'] == 'Basic Full Body Workout'
+    assert [payload for kind, payload in events[:-1]] == plan['exercises']
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))